@@ -0,0 +1,4 @@
+"""
+Headless HTTP API for ingest and question answering
+Run: python -m api.server  (or: uvicorn api.server:app --workers 4)
+"""
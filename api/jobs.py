@@ -0,0 +1,62 @@
+import os
+import json
+import uuid
+from datetime import datetime
+from typing import Optional
+import config
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobStore:
+    """Ingest job status as small JSON files, so any API worker can answer a status poll"""
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or config.JOB_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def create(self, user_id: int, filename: str) -> dict:
+        """Register a new pending job"""
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'status': PENDING,
+            'user_id': user_id,
+            'filename': filename,
+            'pdf_id': None,
+            'error': None,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'finished_at': None
+        }
+        self._write(job)
+        return job
+
+    def update(self, job_id: str, **fields) -> dict:
+        job = self.get(job_id)
+        job.update(fields)
+        if fields.get('status') in (DONE, FAILED):
+            job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+        self._write(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        # Job ids are uuid hex strings, anything else cannot name a job file
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._path(job_id), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, job: dict):
+        path = self._path(job['job_id'])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
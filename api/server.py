@@ -0,0 +1,205 @@
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import uvicorn
+from fastapi import Depends, FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import BaseModel
+
+import config
+from database_dummy import db
+from services.user_service import UserService
+from services.qa_service import QAService
+from services.ingest_service import IngestService
+from services.metrics import metrics
+from services.model_migration import model_migration
+from services.upload_spool import SpooledUpload, UploadRejected, upload_spool
+from api.jobs import JobStore, RUNNING, DONE, FAILED
+
+
+class Credentials(BaseModel):
+    username: str
+    password: str
+
+
+class AskRequest(BaseModel):
+    question: str
+    pdf_id: Optional[int] = None
+
+
+class MigrationRequest(BaseModel):
+    model: str
+
+
+class BatchAskRequest(BaseModel):
+    questions: List[str]
+    pdf_id: Optional[int] = None
+
+
+def sync_db():
+    """Pick up users, PDFs and chunks written by other workers"""
+    db.sync()
+
+
+bearer = HTTPBearer(auto_error=False)
+
+
+def current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer),
+                 _synced: None = Depends(sync_db)) -> int:
+    """user_id of the session token sent as 'Authorization: Bearer <token>' (issued by POST /auth)"""
+    user_id = UserService.get_session_user(credentials.credentials) if credentials else None
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Nicht angemeldet", headers={'WWW-Authenticate': 'Bearer'})
+    return user_id
+
+
+def admin_user(user_id: int = Depends(current_user)) -> int:
+    """Logged-in user listed in ADMIN_USERS, 403 for everyone else"""
+    user = db.get_user(user_id)
+    if not UserService.is_admin(user['username'] if user else None):
+        raise HTTPException(status_code=403, detail="Nur für Administratoren")
+    return user_id
+
+
+def check_pdf_owner(pdf_id: Optional[int], user_id: int):
+    """404 for a PDF of another user, the same answer as for a missing one"""
+    if pdf_id is None:
+        return
+    pdf = db.get_pdf(pdf_id)
+    if pdf is None or pdf['user_id'] != user_id:
+        raise HTTPException(status_code=404, detail="PDF nicht gefunden")
+
+
+# One model instance per worker process, indices are shared on disk
+qa_service = QAService()
+ingest_service = IngestService(qa_service.embedding_manager)
+job_store = JobStore()
+# Ingest is serialized per worker (and across workers by the database transaction)
+ingest_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest')
+ask_executor = ThreadPoolExecutor(max_workers=config.API_BATCH_CONCURRENCY, thread_name_prefix='ask')
+
+app = FastAPI(title="PDF FAQ Bot API", dependencies=[Depends(sync_db)])
+
+
+def _run_ingest(job_id: str, upload: SpooledUpload, filename: str, user_id: int):
+    job_store.update(job_id, status=RUNNING)
+    try:
+        with upload, upload.open() as pdf_file:
+            pdf_id = ingest_service.process_pdf(pdf_file, filename, user_id)
+        job_store.update(job_id, status=DONE, pdf_id=pdf_id)
+    except Exception as e:
+        db.log_error(str(e), traceback.format_exc())
+        job_store.update(job_id, status=FAILED, error=str(e))
+
+
+@app.get("/health")
+def health():
+    return {'status': 'ok'}
+
+
+@app.get("/users")
+def user_exists(username: str):
+    return {'exists': UserService.user_exists(username)}
+
+
+@app.post("/users", status_code=201)
+def create_user(credentials: Credentials):
+    user_id = UserService.create_user(credentials.username, credentials.password)
+    if user_id is None:
+        raise HTTPException(status_code=409, detail="Benutzername bereits vergeben")
+    return {'user_id': user_id, 'token': UserService.create_session(user_id)}
+
+
+@app.post("/auth")
+def authenticate(credentials: Credentials):
+    """Log in, the token authenticates all other requests"""
+    user_id = UserService.authenticate_user(credentials.username, credentials.password)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Ungültige Anmeldedaten")
+    return {'user_id': user_id, 'token': UserService.create_session(user_id)}
+
+
+@app.get("/pdfs")
+def list_pdfs(user_id: int = Depends(current_user)):
+    return [
+        {'pdf_id': pdf_id, 'filename': filename, 'upload_date': upload_date}
+        for pdf_id, filename, upload_date in ingest_service.list_pdfs(user_id)
+    ]
+
+
+@app.post("/pdfs", status_code=202)
+def upload_pdf(file: UploadFile = File(...), user_id: int = Depends(current_user)):
+    """Accept a PDF and ingest it in the background, poll /jobs/{job_id} for the result"""
+    # Queued uploads wait on disk, not in memory
+    try:
+        upload = upload_spool.spool(file.file, user_id, size=file.size)
+    except UploadRejected as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    job = job_store.create(user_id, file.filename)
+    ingest_executor.submit(_run_ingest, job['job_id'], upload, file.filename, user_id)
+    return job
+
+
+@app.delete("/pdfs/{pdf_id}", status_code=204)
+def delete_pdf(pdf_id: int, user_id: int = Depends(current_user)):
+    """Delete a PDF of the logged-in user, its vectors are compacted out of the global indices in the background"""
+    if not ingest_service.delete_pdf(pdf_id, user_id):
+        raise HTTPException(status_code=404, detail="PDF nicht gefunden")
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str, user_id: int = Depends(current_user)):
+    job = job_store.get(job_id)
+    if job is None or job['user_id'] != user_id:
+        raise HTTPException(status_code=404, detail="Job nicht gefunden")
+    return job
+
+
+@app.post("/ask")
+def ask(request: AskRequest, user_id: int = Depends(current_user)):
+    check_pdf_owner(request.pdf_id, user_id)
+    return qa_service.ask_question(request.question, user_id, request.pdf_id)
+
+
+@app.post("/ask/batch")
+def ask_batch(request: BatchAskRequest, user_id: int = Depends(current_user)):
+    """Answer several questions concurrently, results keep the order of the questions"""
+    if len(request.questions) > config.API_MAX_BATCH_QUESTIONS:
+        raise HTTPException(status_code=413,
+                            detail=f"Höchstens {config.API_MAX_BATCH_QUESTIONS} Fragen pro Anfrage")
+    check_pdf_owner(request.pdf_id, user_id)
+    results = ask_executor.map(
+        lambda question: qa_service.ask_question(question, user_id, request.pdf_id),
+        request.questions
+    )
+    return {'results': list(results)}
+
+
+@app.get("/models")
+def model_status():
+    """Active embedding model and progress of a running migration"""
+    return model_migration.status()
+
+
+@app.post("/models/migrate", status_code=202)
+def migrate_model(request: MigrationRequest, _admin: int = Depends(admin_user)):
+    """
+    Re-embed all PDFs with another model in the background, the current model keeps serving
+    Admins only: it downloads the model and replaces every user's vectors
+    """
+    if not model_migration.start(request.model):
+        raise HTTPException(status_code=409, detail="Migration läuft bereits")
+    return model_migration.status()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return metrics.to_prometheus()
+
+
+if __name__ == "__main__":
+    if config.API_WORKERS > 1 and not config.DB_SNAPSHOT_PATH:
+        print("Warning: API_WORKERS > 1 without DB_SNAPSHOT_PATH, workers will not share uploaded PDFs")
+    uvicorn.run("api.server:app", host=config.API_HOST, port=config.API_PORT, workers=config.API_WORKERS)
@@ -1,10 +1,13 @@
 import streamlit as st
 import os
 from database_dummy import db
-from models.pdf_processor import PDFProcessor
-from models.embeddings import EmbeddingManager
 from services.user_service import UserService
 from services.qa_service import QAService
+from services.ingest_service import IngestService
+from services.metrics import metrics
+from services.field_extractor import fast_path_stats
+from services.upload_spool import UploadRejected, upload_spool
+import config
 
 # Page config
 st.set_page_config(
@@ -452,16 +455,23 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize services
-user_service = UserService()
-pdf_processor = PDFProcessor()
-embedding_manager = EmbeddingManager()
-qa_service = QAService()
+if config.API_BASE_URL:
+    # Thin client: ingest and answers come from the HTTP API (api/server.py)
+    from services.api_client import ApiClient
+    # The session token of the login authenticates every request of this browser session
+    user_service = qa_service = ingest_service = ApiClient(config.API_BASE_URL, token=st.session_state.get('api_token'))
+else:
+    user_service = UserService()
+    qa_service = QAService()
+    ingest_service = IngestService(qa_service.embedding_manager)
 
 # Session state
 if 'user_id' not in st.session_state:
     st.session_state.user_id = None
 if 'username' not in st.session_state:
     st.session_state.username = None
+if 'uploader_generation' not in st.session_state:
+    st.session_state.uploader_generation = 0
 
 def main():
     if st.session_state.user_id is None:
@@ -492,6 +502,7 @@ def show_login_page():
                     if user_id:
                         st.session_state.user_id = user_id
                         st.session_state.username = username
+                        st.session_state.api_token = getattr(user_service, 'token', None)
                         st.success("Erfolgreich eingeloggt!")
                         st.rerun()
                     else:
@@ -512,10 +523,14 @@ def show_login_page():
                         st.error("Benutzername bereits vergeben!")
                     else:
                         user_id = user_service.create_user(new_username, new_password)
-                        st.session_state.user_id = user_id
-                        st.session_state.username = new_username
-                        st.success("Registrierung erfolgreich!")
-                        st.rerun()
+                        if user_id is None:
+                            st.error("Benutzername bereits vergeben!")
+                        else:
+                            st.session_state.user_id = user_id
+                            st.session_state.username = new_username
+                            st.session_state.api_token = getattr(user_service, 'token', None)
+                            st.success("Registrierung erfolgreich!")
+                            st.rerun()
         
         st.markdown('</div>', unsafe_allow_html=True)
 
@@ -531,13 +546,17 @@ def show_main_app():
         if st.button("Abmelden", use_container_width=True):
             st.session_state.user_id = None
             st.session_state.username = None
+            st.session_state.api_token = None
             st.rerun()
     
     st.sidebar.title(f"Willkommen, {st.session_state.username}")
     st.sidebar.markdown("---")
     
+    if UserService.is_admin(st.session_state.username):
+        show_metrics_panel()
+    
     # Get user's PDFs
-    pdfs = db.get_pdfs_by_user(st.session_state.user_id)
+    pdfs = ingest_service.list_pdfs(st.session_state.user_id)
     
     tab1, tab2 = st.tabs(["PDFs hochladen", "Fragen stellen"])
     
@@ -549,7 +568,8 @@ def show_main_app():
             "Wähle PDF-Dateien aus",
             type=['pdf'],
             accept_multiple_files=True,
-            help="Du kannst mehrere PDFs gleichzeitig hochladen"
+            help=f"Du kannst mehrere PDFs gleichzeitig hochladen (je maximal {config.MAX_UPLOAD_MB:g} MB)",
+            key=f"pdf_uploader_{st.session_state.uploader_generation}"
         )
         
         col1, col2, col3 = st.columns([1, 1, 1])
@@ -567,6 +587,8 @@ def show_main_app():
                     status_text.empty()
                     progress_bar.empty()
                     st.success(f"{len(uploaded_files)} PDF(s) erfolgreich verarbeitet!")
+                    # A new uploader key makes Streamlit drop the uploaded files it holds in memory
+                    st.session_state.uploader_generation += 1
                     st.rerun()
                 else:
                     st.warning("Bitte wähle zuerst PDF-Dateien aus!")
@@ -575,12 +597,19 @@ def show_main_app():
         if pdfs:
             st.subheader("Deine PDFs")
             for idx, (pdf_id, filename, upload_date) in enumerate(pdfs):
-                st.markdown(f"""
-                <div class="pdf-card">
-                    <h4>{filename}</h4>
-                    <p style="color: #718096; margin: 0;">Hochgeladen: {upload_date}</p>
-                </div>
-                """, unsafe_allow_html=True)
+                card_col, delete_col = st.columns([6, 1])
+                with card_col:
+                    st.markdown(f"""
+                    <div class="pdf-card">
+                        <h4>{filename}</h4>
+                        <p style="color: #718096; margin: 0;">Hochgeladen: {upload_date}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                with delete_col:
+                    st.markdown("<br>", unsafe_allow_html=True)
+                    if st.button("Löschen", key=f"delete_pdf_{pdf_id}", use_container_width=True):
+                        ingest_service.delete_pdf(pdf_id, st.session_state.user_id)
+                        st.rerun()
         else:
             st.info("Noch keine PDFs hochgeladen. Lade deine ersten Dokumente hoch!")
     
@@ -667,6 +696,47 @@ def show_main_app():
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+def show_metrics_panel():
+    """Admin panel in the sidebar: latency per pipeline stage and fast path savings"""
+    with st.sidebar.expander("Performance (Admin)"):
+        fast_path = fast_path_stats.snapshot()
+        if fast_path['attempts']:
+            st.caption(
+                f"Schnellpfad: {fast_path['hit_rate']:.0%} ohne OpenAI beantwortet "
+                f"({fast_path['hits']}/{fast_path['attempts']}), ca. "
+                f"{fast_path['latency_saved_ms'] / 1000:.1f} s Wartezeit gespart"
+            )
+        
+        rows = metrics.snapshot()
+        if not rows:
+            st.caption("Noch keine Messwerte.")
+            return
+        
+        st.dataframe(
+            [{
+                'Stufe': row['stage'],
+                'Anzahl': row['count'],
+                'p50 ms': round(row['p50_ms'], 1),
+                'p95 ms': round(row['p95_ms'], 1),
+                'Fehler': row['errors']
+            } for row in rows],
+            hide_index=True,
+            use_container_width=True
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Aktualisieren", use_container_width=True):
+                st.rerun()
+        with col2:
+            st.download_button(
+                "Prometheus",
+                metrics.to_prometheus(),
+                file_name="metrics.prom",
+                mime="text/plain",
+                use_container_width=True
+            )
+
 def _stream_text(text: str):
     """Display text with ChatGPT-like streaming animation"""
     import time
@@ -687,39 +757,11 @@ def _stream_text(text: str):
 def process_pdf(uploaded_file, user_id):
     """Process uploaded PDF: extract, chunk, embed, and save to DB"""
     try:
-        # Save PDF info to DB
-        pdf_id = db.insert_pdf(user_id, uploaded_file.name)
-        
-        if not pdf_id:
-            return
-        
-        # Process PDF
-        uploaded_file.seek(0)
-        chunks = pdf_processor.process_pdf(uploaded_file)
-        
-        # Save chunks and generate embeddings
-        chunk_texts = []
-        chunk_ids = []
-        for chunk in chunks:
-            chunk_id = db.insert_chunk(
-                pdf_id, 
-                chunk['text'], 
-                chunk['chunk_index'], 
-                chunk.get('page_number')
-            )
-            chunk_ids.append(chunk_id)
-            chunk_texts.append(chunk['text'])
-        
-        # Generate and save embeddings
-        embeddings = embedding_manager.generate_embeddings_batch(chunk_texts)
-        for chunk_id, embedding in zip(chunk_ids, embeddings):
-            embedding_manager.save_embedding_to_db(chunk_id, embedding)
-        
-        # Create and save FAISS index
-        index, chunk_ids_list = embedding_manager.create_faiss_index(pdf_id)
-        if index is not None:
-            embedding_manager.save_faiss_index(index, chunk_ids_list, pdf_id)
-        
+        # Size cap and quota are checked before parsing, the parser reads a memory-mapped copy on disk
+        with upload_spool.spool(uploaded_file, user_id, size=uploaded_file.size) as upload, upload.open() as pdf_file:
+            ingest_service.process_pdf(pdf_file, uploaded_file.name, user_id)
+    except UploadRejected as e:
+        st.error(f"{uploaded_file.name} wurde nicht verarbeitet: {str(e)}")
     except Exception as e:
         import traceback
         st.error(f"Fehler beim Verarbeiten von {uploaded_file.name}: {str(e)}")
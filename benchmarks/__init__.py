@@ -0,0 +1,4 @@
+"""
+Offline benchmarks
+Run a benchmark as a module from the repository root, e.g. python -m benchmarks.bench_extractor
+"""
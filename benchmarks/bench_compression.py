@@ -0,0 +1,132 @@
+"""
+Memory vs. recall of compressed vector storage (VECTOR_STORAGE, PCA_DIMENSIONS)
+Embeds a synthetic corpus, then for every storage variant compares database and index
+size per vector and recall@k against exact float32 search. Queries are sentences taken
+from the corpus; ties in the exact ranking count as hits.
+
+Usage: python -m benchmarks.bench_compression [--docs 300] [--queries 200] [--pca-dims 128]
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+
+import numpy as np
+import faiss
+
+import config
+
+
+def build_corpus(docs: int, rng: random.Random) -> list:
+    """Chunk texts of synthetic documents"""
+    from benchmarks.synthetic_pdf import make_document
+    from models.pdf_processor import PDFProcessor
+
+    processor = PDFProcessor()
+    texts = []
+    for _ in range(docs):
+        for page_number, page_text in enumerate(make_document(2, rng), start=1):
+            texts.extend(chunk['text'] for chunk in processor.chunk_text(page_text, page_number))
+    return texts
+
+
+def make_queries(texts: list, count: int, rng: random.Random) -> list:
+    """One sentence of a random chunk per query"""
+    queries = []
+    for text in rng.sample(texts, min(count, len(texts))):
+        sentences = [sentence.strip() for sentence in text.split('. ') if len(sentence.strip()) > 20]
+        queries.append(rng.choice(sentences) if sentences else text[:200])
+    return queries
+
+
+def run(embedding_manager, vectors: np.ndarray, queries: np.ndarray, exact_scores: np.ndarray,
+        storage: str, pca_dims: int, top_k: int) -> dict:
+    """Build one compressed variant and measure its size and recall"""
+    from models.vector_codec import decode_vector, encode_vector
+
+    config.VECTOR_STORAGE = storage
+    config.PCA_DIMENSIONS = pca_dims
+    embedding_manager._pca = None
+    embedding_manager.index_dir = tempfile.mkdtemp(prefix='bench_compression_')
+
+    stored = [encode_vector(vector) for vector in vectors]
+    database_bytes = sum(vector.nbytes for vector in stored)
+    index = embedding_manager.index_from_vectors(np.stack([decode_vector(vector) for vector in stored]))
+    index_bytes = faiss.serialize_index(index).nbytes
+
+    started = time.perf_counter()
+    _, found = index.search(queries, top_k)
+    search_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    # A hit is any result that scores at least as high as the k-th exact result
+    kth_best = np.sort(exact_scores, axis=1)[:, -top_k]
+    found_scores = np.take_along_axis(exact_scores, np.maximum(found, 0), axis=1)
+    hits = (found >= 0) & (found_scores >= kth_best[:, None] - 1e-5)
+    return {
+        'storage': storage,
+        'pca_dims': pca_dims,
+        'db_bytes_per_vector': database_bytes / len(vectors),
+        'index_bytes_per_vector': index_bytes / len(vectors),
+        'recall': float(hits.sum() / (len(queries) * top_k)),
+        'search_ms': search_ms
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=300)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--pca-dims', type=int, default=128)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args()
+
+    config.FAISS_INDEX_DIR = tempfile.mkdtemp(prefix='bench_compression_')
+    from database_dummy import db
+    from models.embeddings import EmbeddingManager
+
+    rng = random.Random(args.seed)
+    embedding_manager = EmbeddingManager()
+    texts = build_corpus(args.docs, rng)
+    vectors = np.ascontiguousarray(embedding_manager.generate_embeddings_batch(texts), dtype='float32')
+    queries = np.ascontiguousarray(
+        embedding_manager.generate_embeddings_batch(make_queries(texts, args.queries, rng)), dtype='float32'
+    )
+    faiss.normalize_L2(queries)
+    exact_scores = queries @ vectors.T
+
+    # The PCA is trained on the corpus in the database, as in production
+    config.VECTOR_STORAGE = 'float32'
+    config.PCA_MIN_TRAINING_VECTORS = min(config.PCA_MIN_TRAINING_VECTORS, len(vectors))
+    for vector in vectors:
+        embedding_manager.save_embedding_to_db(db.insert_chunk(1, '', 0), vector)
+
+    variants = [('float32', 0), ('float16', 0), ('int8', 0)]
+    if 0 < args.pca_dims < embedding_manager.embedding_dim:
+        variants += [('float32', args.pca_dims), ('int8', args.pca_dims)]
+
+    print(f"{len(vectors)} vectors, {embedding_manager.embedding_dim} dims, {len(queries)} queries")
+    print(f"{'storage':<8} {'pca':>5} {'db B/vec':>9} {'index B/vec':>12} {'saved':>7} "
+          f"{'recall@' + str(args.top_k):>9} {'ms/query':>9}")
+    results = []
+    for storage, pca_dims in variants:
+        result = run(embedding_manager, vectors, queries, exact_scores, storage, pca_dims, args.top_k)
+        baseline = results[0] if results else result
+        saved = 1 - ((result['db_bytes_per_vector'] + result['index_bytes_per_vector'])
+                     / (baseline['db_bytes_per_vector'] + baseline['index_bytes_per_vector']))
+        result['memory_saved'] = saved
+        results.append(result)
+        print(f"{storage:<8} {pca_dims or '-':>5} {result['db_bytes_per_vector']:>9.0f} "
+              f"{result['index_bytes_per_vector']:>12.0f} {saved:>7.0%} {result['recall']:>9.2%} "
+              f"{result['search_ms']:>9.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
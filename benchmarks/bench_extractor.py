@@ -0,0 +1,143 @@
+"""
+Benchmark for QAService._extract_relevant_section over long chunks
+Compares the current extractor against the previous per-window substring scan
+and checks that both return identical answers.
+
+Usage: python -m benchmarks.bench_extractor [--repeat 5]
+"""
+import argparse
+import random
+import re
+import time
+
+from services.qa_service import QAService
+
+WORDS = [
+    'vertrag', 'laufzeit', 'kündigung', 'frist', 'monat', 'leistung', 'vergütung', 'zahlung',
+    'rechnung', 'betrag', 'kunde', 'anbieter', 'vereinbarung', 'haftung', 'gewährleistung',
+    'lieferung', 'termin', 'paragraph', 'absatz', 'regelung', 'bestimmung', 'daten', 'schutz',
+]
+
+
+def legacy_extract_relevant_section(qa: QAService, question: str, text: str) -> str:
+    """Previous implementation, kept verbatim as the reference"""
+    question_lower = question.lower()
+
+    if any(word in question_lower for word in ['email', 'e-mail', 'mail', 'e-mail-adresse', 'email-adresse']):
+        email = qa._extract_email(text)
+        if email:
+            return email
+
+    if any(word in question_lower for word in ['adresse', 'wohne', 'wohnort', 'wohnhaft']) and 'email' not in question_lower:
+        address = qa._extract_address(text)
+        if address:
+            return address
+
+    question_keywords = []
+    if any(word in question_lower for word in ['adresse', 'wohne', 'wohnort', 'wohnhaft']):
+        question_keywords = ['straße', 'str.', 'weg', 'platz', 'adresse', 'wohnort', 'wohne', 'wohnhaft', 'straße', 'strasse']
+    elif any(word in question_lower for word in ['email', 'e-mail', 'mail']):
+        question_keywords = ['@', 'email', 'e-mail', 'mail']
+    elif any(word in question_lower for word in ['telefon', 'nummer', 'handy', 'mobil']):
+        question_keywords = ['telefon', 'tel.', 'mobil', 'handy', '+49', '+43', '+41']
+    elif any(word in question_lower for word in ['geburt', 'geboren', 'geburtstag']):
+        question_keywords = ['geboren', 'geburt', 'geburtstag', 'geb.']
+    elif any(word in question_lower for word in ['name', 'heiße', 'heißt']):
+        question_keywords = ['name', 'vorname', 'nachname']
+    elif any(word in question_lower for word in ['beruf', 'arbeit', 'stelle', 'position']):
+        question_keywords = ['beruf', 'arbeit', 'position', 'stelle', 'tätigkeit']
+    else:
+        question_keywords = [w for w in question_lower.split() if len(w) > 3]
+
+    sentences = re.split(r'[.!?]\s+', text)
+    relevant_sentences = []
+    for sentence in sentences:
+        sentence_lower = sentence.lower()
+        if any(keyword in sentence_lower for keyword in question_keywords):
+            relevant_sentences.append(sentence.strip())
+
+    if relevant_sentences:
+        answer = '. '.join(relevant_sentences[:3])
+        if not answer.endswith(('.', '!', '?')):
+            answer += '.'
+        return answer
+
+    words = text.split()
+    best_start = 0
+    best_score = 0
+    for i in range(len(words) - 10):
+        window = ' '.join(words[i:i+20]).lower()
+        score = sum(1 for keyword in question_keywords if keyword in window)
+        if score > best_score:
+            best_score = score
+            best_start = i
+
+    if best_score > 0:
+        extracted = ' '.join(words[best_start:best_start+30])
+        if len(extracted) > 200:
+            extracted = extracted[:200] + '...'
+        return extracted
+
+    if len(text) > 300:
+        return text[:300] + '...'
+    return text
+
+
+def make_text(size: int, rng: random.Random, inserts: list = ()) -> str:
+    """Generate German-like contract text of roughly size characters"""
+    sentences = []
+    length = 0
+    while length < size:
+        sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))).capitalize()
+        if inserts and rng.random() < 0.02:
+            sentence += ' ' + rng.choice(inserts)
+        sentence += '.'
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return ' '.join(sentences)
+
+
+def time_call(func, repeat: int) -> float:
+    """Best wall time of func() in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 500000])
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    # Avoid loading the embedding model, the extractor needs no instance state
+    qa = QAService.__new__(QAService)
+
+    scenarios = [
+        # No sentence matches: the window fallback scans the whole chunk
+        ('general, no match', 'Welche Zinsen gelten für Überweisungen?', []),
+        # Keywords only hidden at sentence ends ("Musterstr."), found by the window fallback
+        ('address, window hit', 'Wo wohne ich?', ['Lindenstr']),
+        ('general, sentence hit', 'Wie lange ist die Kündigungsfrist?', ['kündigungsfrist drei monate']),
+    ]
+
+    print(f"{'scenario':<24} {'chars':>8} {'legacy ms':>10} {'new ms':>10} {'speedup':>8}")
+    for name, question, inserts in scenarios:
+        for size in args.sizes:
+            text = make_text(size, rng, inserts)
+            expected = legacy_extract_relevant_section(qa, question, text)
+            actual = qa._extract_relevant_section(question, text)
+            if expected != actual:
+                raise AssertionError(f"Output differs for {name!r} at {size} chars")
+
+            legacy_ms = time_call(lambda: legacy_extract_relevant_section(qa, question, text), args.repeat)
+            new_ms = time_call(lambda: qa._extract_relevant_section(question, text), args.repeat)
+            print(f"{name:<24} {len(text):>8} {legacy_ms:>10.2f} {new_ms:>10.2f} {legacy_ms / new_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
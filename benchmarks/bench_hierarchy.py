@@ -0,0 +1,145 @@
+"""
+Latency and recall of coarse-to-fine (HIERARCHICAL_SEARCH_ENABLED) vs. flat dense search
+For every corpus size the same chunk vectors are searched exactly (FAISS IndexFlatIP, the
+global index) and through the document/page hierarchy; recall@k is measured against the
+exact results. The default corpus is synthetic topic-clustered vectors, so sizes of
+thousands of documents run in seconds; --corpus text embeds synthetic PDFs with the model.
+
+Usage: python -m benchmarks.bench_hierarchy [--docs 100 1000 5000] [--pages 8] [--queries 200]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+import numpy as np
+import faiss
+
+import config
+from models.hierarchical_index import HierarchicalIndex
+
+
+def vector_corpus(docs: int, pages: int, chunks_per_page: int, dim: int, rng: np.random.Generator):
+    """Unit vectors clustered by document topic and page sub-topic"""
+    topics = rng.normal(size=(docs, 1, 1, dim))
+    subtopics = topics + 0.6 * rng.normal(size=(docs, pages, 1, dim))
+    vectors = subtopics + 0.6 * rng.normal(size=(docs, pages, chunks_per_page, dim))
+    vectors = vectors.reshape(-1, dim).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    pdf_ids = np.repeat(np.arange(1, docs + 1), pages * chunks_per_page)
+    page_numbers = np.tile(np.repeat(np.arange(1, pages + 1), chunks_per_page), docs)
+    return vectors, pdf_ids, page_numbers
+
+
+def vector_queries(vectors: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Noisy copies of random chunks, as a question is close to, but not the same as, its passage"""
+    queries = vectors[rng.choice(len(vectors), count)] + 0.05 * rng.normal(size=(count, vectors.shape[1]))
+    queries = queries.astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def text_corpus(docs: int, pages: int, seed: int):
+    """Embedded chunks of synthetic PDFs, queries are sentences taken from the chunks"""
+    from benchmarks.synthetic_pdf import make_document
+    from models.embeddings import EmbeddingManager
+    from models.pdf_processor import PDFProcessor
+
+    rng = random.Random(seed)
+    processor = PDFProcessor()
+    texts, pdf_ids, page_numbers = [], [], []
+    for pdf_id in range(1, docs + 1):
+        for page_number, page_text in enumerate(make_document(pages, rng), start=1):
+            for chunk in processor.chunk_text(page_text, page_number):
+                texts.append(chunk['text'])
+                pdf_ids.append(pdf_id)
+                page_numbers.append(page_number)
+    embedding_manager = EmbeddingManager()
+    vectors = np.ascontiguousarray(embedding_manager.generate_embeddings_batch(texts), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+
+    def queries(count: int, _rng) -> np.ndarray:
+        sentences = []
+        for text in rng.sample(texts, min(count, len(texts))):
+            parts = [part.strip() for part in text.split('. ') if len(part.strip()) > 20]
+            sentences.append(rng.choice(parts) if parts else text[:200])
+        result = np.ascontiguousarray(embedding_manager.generate_embeddings_batch(sentences), dtype=np.float32)
+        faiss.normalize_L2(result)
+        return result
+
+    return vectors, np.asarray(pdf_ids), np.asarray(page_numbers), queries
+
+
+def run(vectors: np.ndarray, pdf_ids: np.ndarray, page_numbers: np.ndarray, queries: np.ndarray,
+        top_k: int, top_docs: int, top_pages: int) -> dict:
+    chunk_ids = np.arange(len(vectors))
+    flat = faiss.IndexFlatIP(vectors.shape[1])
+    flat.add(vectors)
+    hierarchy = HierarchicalIndex.from_chunks(vectors, chunk_ids, pdf_ids, page_numbers)
+
+    flat_ms, hierarchy_ms, hits = [], [], 0
+    for query in queries:
+        started = time.perf_counter()
+        _, exact = flat.search(query.reshape(1, -1), top_k)
+        flat_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        found = hierarchy.search(query, top_k, top_docs=top_docs, top_pages=top_pages)
+        hierarchy_ms.append((time.perf_counter() - started) * 1000)
+        hits += len(set(exact[0]) & {chunk_id for chunk_id, _ in found})
+
+    pages_per_doc = len(hierarchy.page_numbers) / max(len(hierarchy.doc_ids), 1)
+    chunks_per_page = hierarchy.size / max(len(hierarchy.page_numbers), 1)
+    candidate_pages = min(top_docs, len(hierarchy.doc_ids)) * pages_per_doc
+    return {
+        'documents': len(hierarchy.doc_ids),
+        'chunks': hierarchy.size,
+        'flat_p50_ms': statistics.median(flat_ms),
+        'hierarchy_p50_ms': statistics.median(hierarchy_ms),
+        # Vectors scored per question: all centroids, pages of the top documents, chunks of the top pages
+        'hierarchy_scored': round(len(hierarchy.doc_ids) + candidate_pages
+                                  + min(top_pages, candidate_pages) * chunks_per_page),
+        'recall': hits / (len(queries) * top_k)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', choices=['vectors', 'text'], default='vectors')
+    parser.add_argument('--docs', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--pages', type=int, default=8)
+    parser.add_argument('--chunks-per-page', type=int, default=4)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--top-docs', type=int, default=config.HIERARCHY_TOP_DOCS)
+    parser.add_argument('--top-pages', type=int, default=config.HIERARCHY_TOP_PAGES)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args()
+
+    print(f"top docs {args.top_docs}, top pages {args.top_pages}, recall@{args.top_k} vs. exact flat search")
+    print(f"{'docs':>6} {'chunks':>8} {'flat ms':>8} {'hier ms':>8} {'scored':>8} {'recall':>7}")
+    results = []
+    for docs in args.docs:
+        rng = np.random.default_rng(args.seed)
+        if args.corpus == 'vectors':
+            vectors, pdf_ids, page_numbers = vector_corpus(docs, args.pages, args.chunks_per_page, args.dim, rng)
+            queries = vector_queries(vectors, args.queries, rng)
+        else:
+            vectors, pdf_ids, page_numbers, make_queries = text_corpus(docs, args.pages, args.seed)
+            queries = make_queries(args.queries, rng)
+        result = run(vectors, pdf_ids, page_numbers, queries, args.top_k, args.top_docs, args.top_pages)
+        results.append(result)
+        print(f"{result['documents']:>6} {result['chunks']:>8} {result['flat_p50_ms']:>8.3f} "
+              f"{result['hierarchy_p50_ms']:>8.3f} {result['hierarchy_scored']:>8} {result['recall']:>7.2%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
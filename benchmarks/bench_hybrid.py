@@ -0,0 +1,107 @@
+"""
+Latency and recall comparison of dense-only vs. hybrid (BM25 + dense, RRF) retrieval
+Builds a synthetic corpus of invoices and AGB clauses with exact identifiers
+(invoice numbers, IBANs, clause numbers) and asks for each identifier.
+
+Usage: python -m benchmarks.bench_hybrid [--docs 200] [--queries 100] [--top-k 5]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+import config
+
+FILLER = [
+    'Der Kunde verpflichtet sich zur fristgerechten Zahlung des Rechnungsbetrags.',
+    'Die Lieferung erfolgt innerhalb von vierzehn Tagen nach Auftragsbestätigung.',
+    'Der Anbieter haftet nur für Vorsatz und grobe Fahrlässigkeit.',
+    'Änderungen dieser Bedingungen werden dem Kunden schriftlich mitgeteilt.',
+    'Die Gewährleistungsfrist beträgt zwölf Monate ab Übergabe der Ware.',
+    'Zahlungen sind ohne Abzug auf das angegebene Konto zu leisten.',
+]
+
+
+def make_identifier(kind: str, rng: random.Random) -> str:
+    """Generate an exact-term identifier of the given kind"""
+    if kind == 'invoice':
+        return f"RE-{rng.randint(2019, 2025)}-{rng.randint(0, 99999):05d}"
+    if kind == 'iban':
+        digits = ''.join(str(rng.randint(0, 9)) for _ in range(20))
+        return 'DE' + ' '.join(digits[i:i + 4] for i in range(0, 20, 4))
+    return f"§ {rng.randint(1, 40)}.{rng.randint(1, 9)}.{rng.randint(1, 9)}"
+
+
+def build_corpus(qa, docs: int, rng: random.Random) -> list:
+    """Insert synthetic PDFs into the database and indices, return (question, chunk_id) pairs"""
+    from database_dummy import db
+
+    user_id = db.insert_user('bench', 'bench')
+    targets = []
+    for doc in range(docs):
+        pdf_id = db.insert_pdf(user_id, f"dokument_{doc}.pdf")
+        chunks = []
+        for chunk_index in range(5):
+            kind = rng.choice(['invoice', 'iban', 'clause'])
+            identifier = make_identifier(kind, rng)
+            label = {'invoice': 'Rechnungsnummer', 'iban': 'IBAN', 'clause': 'Klausel'}[kind]
+            text = ' '.join(rng.sample(FILLER, 3)) + f" {label}: {identifier}. " + ' '.join(rng.sample(FILLER, 2))
+            chunk_id = db.insert_chunk(pdf_id, text, chunk_index, 1)
+            chunks.append({'chunk_id': chunk_id, 'text': text})
+            targets.append((f"Was steht zu {label} {identifier}?", chunk_id))
+
+        embeddings = qa.embedding_manager.generate_embeddings_batch([c['text'] for c in chunks])
+        for chunk, embedding in zip(chunks, embeddings):
+            qa.embedding_manager.save_embedding_to_db(chunk['chunk_id'], embedding)
+        qa.lexical_index_manager.add_pdf_chunks(pdf_id, chunks)
+
+    # Global scope indices over the whole corpus
+    index, chunk_ids = qa.embedding_manager.create_faiss_index()
+    qa.embedding_manager.save_faiss_index(index, chunk_ids)
+    return targets
+
+
+def run(qa, targets: list, top_k: int, hybrid: bool) -> dict:
+    """Measure recall@k and latency for one retrieval mode"""
+    config.HYBRID_SEARCH_ENABLED = hybrid
+    latencies = []
+    hits = 0
+    for question, chunk_id in targets:
+        started = time.perf_counter()
+        chunks = qa.find_relevant_chunks(question, None, top_k=top_k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if any(chunk['chunk_id'] == chunk_id for chunk in chunks):
+            hits += 1
+    latencies.sort()
+    return {
+        'recall': hits / len(targets),
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': latencies[int(0.95 * (len(latencies) - 1))]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    config.FAISS_INDEX_DIR = tempfile.mkdtemp(prefix='bench_hybrid_')
+    from services.qa_service import QAService
+
+    rng = random.Random(args.seed)
+    qa = QAService()
+    targets = build_corpus(qa, args.docs, rng)
+    targets = rng.sample(targets, min(args.queries, len(targets)))
+
+    print(f"{'mode':<8} {'recall@' + str(args.top_k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, hybrid in (('dense', False), ('hybrid', True)):
+        result = run(qa, targets, args.top_k, hybrid)
+        print(f"{name:<8} {result['recall']:>10.2%} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
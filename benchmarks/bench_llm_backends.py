@@ -0,0 +1,174 @@
+"""
+Time to first token and generation speed of the answer backends (LLM_BACKEND)
+Sends answer prompts as QAService builds them (fixed system prompt, then the document
+context of a synthetic PDF and the question) as streaming chat completions and measures
+per request the time to the first content token (TTFT) and the generated tokens per second
+after it. The first request of a backend runs with a cold prompt cache, later ones can
+reuse the processed system prompt prefix.
+  openai  the OpenAI API (needs OPENAI_API_KEY)
+  local   an OpenAI-compatible server at LOCAL_LLM_BASE_URL, e.g. llama.cpp:
+          llama-server -m model.gguf --port 8080 --parallel 1
+  fake    benchmarks/fake_openai_server.py simulating a CPU server (no model needed)
+
+Usage: python -m benchmarks.bench_llm_backends [--backends fake local openai] [--requests 10]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from benchmarks.synthetic_pdf import make_document
+from services.llm_gateway import OPENAI_AVAILABLE, LLMBackend, get_llm_backend
+from services.qa_service import ANSWER_SYSTEM_PROMPT
+
+QUESTIONS = [
+    'Wann erfolgt die Lieferung?',
+    'Wie lang ist die Kündigungsfrist?',
+    'Wer haftet bei Schäden?',
+    'Welche Zahlungsbedingungen gelten?',
+    'Fasse die wichtigsten Pflichten des Kunden zusammen.',
+]
+
+
+def make_prompts(count: int, context_tokens: int, seed: int) -> list:
+    """Message lists like QAService sends them, every one with another document context"""
+    rng = random.Random(seed)
+    prompts = []
+    for i in range(count):
+        context = '\n\n'.join(make_document(4, rng))[:context_tokens * 4]
+        prompts.append([
+            {'role': 'system', 'content': ANSWER_SYSTEM_PROMPT},
+            {'role': 'user', 'content': f"Dokumenteninhalt:\n{context}\n\nFrage: {rng.choice(QUESTIONS)}\n\n"
+                                        f"Anweisung: Antworte präzise und kurz."}
+        ])
+    return prompts
+
+
+def measure(client, backend: LLMBackend, messages: list, max_tokens: int) -> dict:
+    """One streamed completion: TTFT, generated tokens and their rate"""
+    params = {'extra_body': backend.extra_body} if backend.extra_body else {}
+    started = time.perf_counter()
+    first = None
+    chunks = 0
+    usage = None
+    stream = client.chat.completions.create(
+        model=backend.model, messages=messages, max_tokens=max_tokens, temperature=0.1,
+        stream=True, stream_options={'include_usage': True}, timeout=backend.timeout, **params
+    )
+    for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage
+        if chunk.choices and chunk.choices[0].delta.content:
+            if first is None:
+                first = time.perf_counter()
+            chunks += 1
+    finished = time.perf_counter()
+    first = first or finished
+
+    # Servers without usage in the stream send about one token per chunk
+    tokens = getattr(usage, 'completion_tokens', None) or chunks
+    details = getattr(usage, 'prompt_tokens_details', None)
+    generation_s = finished - first
+    return {
+        'ttft_ms': (first - started) * 1000,
+        'total_ms': (finished - started) * 1000,
+        'tokens': tokens,
+        # The first token is part of the TTFT
+        'tokens_per_s': (tokens - 1) / generation_s if tokens > 1 and generation_s > 0 else None,
+        'cached_prompt_tokens': getattr(details, 'cached_tokens', None)
+    }
+
+
+def run(backend: LLMBackend, prompts: list, max_tokens: int, concurrency: int) -> dict:
+    client = backend.create_client()
+    # Requests to one backend run with at most its concurrency limit, like behind the gateway
+    workers = min(concurrency, backend.concurrency) if backend.concurrency else concurrency
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(lambda messages: measure(client, backend, messages, max_tokens), prompts))
+    wall_s = time.perf_counter() - started
+
+    ttfts = [result['ttft_ms'] for result in results]
+    rates = [result['tokens_per_s'] for result in results if result['tokens_per_s']]
+    cached = [result['cached_prompt_tokens'] for result in results if result['cached_prompt_tokens'] is not None]
+    return {
+        'backend': backend.name,
+        'model': backend.model,
+        'concurrency': workers,
+        'requests': len(results),
+        'ttft_first_ms': ttfts[0],
+        'ttft_p50_ms': statistics.median(ttfts),
+        'total_p50_ms': statistics.median(result['total_ms'] for result in results),
+        'tokens_per_s_p50': statistics.median(rates) if rates else None,
+        # Generated tokens of all requests over the wall time, what the backend serves in parallel
+        'throughput_tokens_per_s': sum(result['tokens'] for result in results) / wall_s,
+        'cached_prompt_tokens_p50': statistics.median(cached) if cached else None
+    }
+
+
+def fake_backend(args) -> tuple:
+    answer = ('Die Lieferung erfolgt innerhalb von fünf Werktagen nach Vertragsschluss frei Haus an die '
+              'vom Kunden angegebene Adresse, Teillieferungen sind zulässig und werden gesondert berechnet. '
+              'Verzögerungen durch höhere Gewalt verlängern die Frist angemessen.')
+    server = FakeOpenAIServer(latency_ms=20, answer=answer, tps=args.fake_tps, prompt_tps=args.fake_prompt_tps,
+                              seed=args.seed).start()
+    return server, LLMBackend('fake', server.base_url, 'fake', 'fake', concurrency=1, extra_body={'cache_prompt': True})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=['fake', 'local', 'openai'])
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--context-tokens', type=int, default=config.CONTEXT_TOKEN_BUDGET)
+    parser.add_argument('--max-tokens', type=int, default=200)
+    parser.add_argument('--fake-tps', type=float, default=15.0, help='Generation speed of the fake backend')
+    parser.add_argument('--fake-prompt-tps', type=float, default=300.0, help='Prompt processing speed of the fake backend')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args()
+    if not OPENAI_AVAILABLE:
+        parser.error("the openai package is required")
+
+    prompts = make_prompts(args.requests, args.context_tokens, args.seed)
+    print(f"{args.requests} answer prompts, ~{args.context_tokens} context tokens, max {args.max_tokens} tokens")
+    print(f"{'backend':<8} {'model':<16} {'first TTFT':>10} {'TTFT p50':>9} {'total p50':>10} "
+          f"{'tok/s p50':>9} {'tok/s all':>9} {'cached':>7}")
+    results = []
+    for name in args.backends:
+        server = None
+        if name == 'fake':
+            server, backend = fake_backend(args)
+        else:
+            backend = get_llm_backend(name)
+            if not backend.api_key:
+                print(f"{name:<8} skipped, no API key")
+                continue
+        try:
+            result = run(backend, prompts, args.max_tokens, args.concurrency)
+        except Exception as e:
+            print(f"{name:<8} not reachable at {backend.base_url or 'api.openai.com'}: {type(e).__name__}: {e}")
+            continue
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+        results.append(result)
+        rate = f"{result['tokens_per_s_p50']:>9.1f}" if result['tokens_per_s_p50'] else f"{'-':>9}"
+        cached = result['cached_prompt_tokens_p50']
+        print(f"{name:<8} {result['model'][:16]:<16} {result['ttft_first_ms']:>10.0f} {result['ttft_p50_ms']:>9.0f} "
+              f"{result['total_p50_ms']:>10.0f} {rate} {result['throughput_tokens_per_s']:>9.1f} "
+              f"{'-' if cached is None else cached:>7}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
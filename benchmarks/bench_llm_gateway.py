@@ -0,0 +1,113 @@
+"""
+LLM gateway against a local fake OpenAI API (benchmarks/fake_openai_server.py)
+Every scenario sends the same burst of concurrent chat completions once directly through
+the OpenAI client (no retries) and once through services/llm_gateway.py, and reports the
+upstream requests, answered share (the rest falls back to the local extractor) and latency.
+  burst         many users asking the same few questions at once (coalescing)
+  flaky         a share of requests fails with 500 (retries)
+  rate_limited  the API allows --rpm requests per minute (client-side rate limiting)
+  outage        every request fails (circuit breaker)
+
+Usage: python -m benchmarks.bench_llm_gateway [--requests 200] [--concurrency 32] [--latency-ms 300]
+"""
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from benchmarks.fake_openai_server import FakeOpenAIServer
+from services.llm_gateway import LLMGateway, get_llm_backend
+
+try:
+    from openai import OpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+
+def scenarios(args) -> dict:
+    """Fake server settings and number of distinct questions per scenario"""
+    return {
+        'burst': ({}, args.distinct),
+        'flaky': ({'error_rate': args.error_rate}, args.requests),
+        'rate_limited': ({'rpm': args.rpm, 'retry_after': 60 / args.rpm}, args.requests),
+        'outage': ({'error_rate': 1.0}, args.requests),
+    }
+
+
+def run(args, server_settings: dict, distinct: int, use_gateway: bool) -> dict:
+    server = FakeOpenAIServer(latency_ms=args.latency_ms, seed=args.seed, **server_settings).start()
+    client = OpenAI(base_url=server.base_url, api_key='fake', max_retries=0, timeout=config.LLM_TIMEOUT)
+    gateway = LLMGateway(client, get_llm_backend('openai')) if use_gateway else None
+
+    def ask(i: int):
+        messages = [
+            {'role': 'system', 'content': 'Du bist ein präziser Dokumenten-Assistent.'},
+            {'role': 'user', 'content': f"Frage {i % distinct}: Wie lautet die E-Mail-Adresse?"}
+        ]
+        started = time.perf_counter()
+        try:
+            if gateway:
+                gateway.complete(messages, estimated_tokens=250, max_tokens=200)
+            else:
+                client.chat.completions.create(model=config.OPENAI_MODEL, messages=messages, max_tokens=200)
+            answered = True
+        except Exception:
+            answered = False
+        return answered, (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(ask, range(args.requests)))
+    server.shutdown()
+    server.server_close()
+
+    latencies = sorted(ms for _, ms in results)
+    return {
+        'upstream_requests': server.counts['requests'],
+        'answered': sum(answered for answered, _ in results) / len(results),
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': latencies[int(0.95 * (len(latencies) - 1))],
+        'gateway': gateway.snapshot() if gateway else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', default=['burst', 'flaky', 'rate_limited', 'outage'])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--distinct', type=int, default=10, help='Distinct questions in the burst scenario')
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    parser.add_argument('--error-rate', type=float, default=0.2)
+    parser.add_argument('--rpm', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args()
+    if not OPENAI_AVAILABLE:
+        parser.error("the openai package is required")
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, fake API latency {args.latency_ms:g} ms")
+    print(f"{'scenario':<13} {'client':<8} {'upstream':>8} {'answered':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    results = {}
+    configured_rpm = config.LLM_REQUESTS_PER_MINUTE
+    for name in args.scenarios:
+        server_settings, distinct = scenarios(args)[name]
+        # The gateway is configured with the tier limit of the API it talks to
+        config.LLM_REQUESTS_PER_MINUTE = server_settings.get('rpm', configured_rpm)
+        results[name] = {}
+        for label, use_gateway in (('direct', False), ('gateway', True)):
+            result = run(args, server_settings, distinct, use_gateway)
+            results[name][label] = result
+            print(f"{name:<13} {label:<8} {result['upstream_requests']:>8} {result['answered']:>9.1%} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Offline benchmark of cross-encoder re-ranking
+Compares retrieval without re-ranking (top 5 chunks to the LLM) against re-ranking
+(RERANK_CANDIDATES scored, RERANK_TOP_N kept): hit rate of the answer chunk,
+precision@1, retrieval latency and context tokens that would be sent to OpenAI.
+
+Usage: python -m benchmarks.bench_rerank [--docs 30] [--budget-ms 300]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+import config
+
+# (question, passage template) per topic, values are filled in per document
+TOPICS = [
+    ('Wie lang ist die Kündigungsfrist?', 'Der Vertrag kann mit einer Frist von {n} Monaten zum Quartalsende gekündigt werden.'),
+    ('Wie lange gilt die Gewährleistung?', 'Für Mängel der Ware haftet der Verkäufer {n} Monate ab Übergabe.'),
+    ('Wann muss die Rechnung bezahlt werden?', 'Rechnungsbeträge sind innerhalb von {n} Tagen ohne Abzug fällig.'),
+    ('Wie lange dauert die Lieferung?', 'Die Zustellung der bestellten Artikel erfolgt in der Regel binnen {n} Werktagen.'),
+    ('Wie hoch ist die Vertragsstrafe?', 'Bei Verstoß gegen die Geheimhaltung wird eine Pönale von {n}.000 Euro fällig.'),
+    ('Wie lange werden meine Daten gespeichert?', 'Personenbezogene Angaben werden nach {n} Jahren gelöscht.'),
+    ('Kann ich die Ware zurückgeben?', 'Ein Widerruf ist binnen {n} Tagen nach Erhalt ohne Angabe von Gründen möglich.'),
+    ('Wer haftet bei Schäden?', 'Der Anbieter übernimmt Schadensersatz nur bis zur Höhe von {n}.000 Euro.'),
+]
+
+DISTRACTORS = [
+    'Diese Bedingungen gelten für alle Verträge zwischen dem Anbieter und dem Kunden.',
+    'Abweichende Vereinbarungen bedürfen der Schriftform.',
+    'Gerichtsstand ist der Sitz des Anbieters.',
+    'Sollte eine Bestimmung unwirksam sein, bleibt der Vertrag im Übrigen wirksam.',
+    'Der Kunde erhält eine Bestätigung per E-Mail.',
+    'Preise verstehen sich inklusive der gesetzlichen Mehrwertsteuer.',
+]
+
+
+def build_corpus(qa, docs: int, rng: random.Random) -> list:
+    """Insert synthetic AGB documents, return (question, pdf_id, chunk_id) triples"""
+    from database_dummy import db
+
+    user_id = db.insert_user('bench', 'bench')
+    cases = []
+    for doc in range(docs):
+        pdf_id = db.insert_pdf(user_id, f"agb_{doc}.pdf")
+        chunks = []
+        for chunk_index, (question, template) in enumerate(TOPICS):
+            text = ' '.join(rng.sample(DISTRACTORS, 3) + [template.format(n=rng.randint(2, 12))])
+            chunk_id = db.insert_chunk(pdf_id, text, chunk_index, chunk_index + 1)
+            chunks.append({'chunk_id': chunk_id, 'text': text})
+            cases.append((question, pdf_id, chunk_id))
+
+        embeddings = qa.embedding_manager.generate_embeddings_batch([c['text'] for c in chunks])
+        for chunk, embedding in zip(chunks, embeddings):
+            qa.embedding_manager.save_embedding_to_db(chunk['chunk_id'], embedding)
+        index, chunk_ids = qa.embedding_manager.create_faiss_index(pdf_id)
+        qa.embedding_manager.save_faiss_index(index, chunk_ids, pdf_id)
+        qa.lexical_index_manager.add_pdf_chunks(pdf_id, chunks)
+    return cases
+
+
+def run(qa, cases: list, rerank: bool) -> dict:
+    """Measure answer-chunk hit rate, precision@1, latency and context tokens"""
+    config.RERANK_ENABLED = rerank
+    latencies = []
+    tokens = []
+    hits = 0
+    first = 0
+    for question, pdf_id, chunk_id in cases:
+        started = time.perf_counter()
+        chunks = qa.find_relevant_chunks(question, pdf_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+        tokens.append(qa.context_packer.pack(chunks)['tokens'])
+        chunk_ids = [chunk['chunk_id'] for chunk in chunks]
+        hits += chunk_id in chunk_ids
+        first += bool(chunk_ids) and chunk_ids[0] == chunk_id
+    latencies.sort()
+    return {
+        'hit_rate': hits / len(cases),
+        'precision_at_1': first / len(cases),
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': latencies[int(0.95 * (len(latencies) - 1))],
+        'avg_context_tokens': statistics.mean(tokens)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=30)
+    parser.add_argument('--budget-ms', type=float, default=config.RERANK_LATENCY_BUDGET_MS)
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+
+    config.FAISS_INDEX_DIR = tempfile.mkdtemp(prefix='bench_rerank_')
+    config.RERANK_LATENCY_BUDGET_MS = args.budget_ms
+    from services.qa_service import QAService
+    from services.reranker import Reranker
+
+    rng = random.Random(args.seed)
+    qa = QAService()
+    qa.reranker = qa.reranker or Reranker()
+    cases = build_corpus(qa, args.docs, rng)
+
+    # Warm up the cross-encoder so model loading is not measured
+    config.RERANK_ENABLED = True
+    qa.find_relevant_chunks(cases[0][0], cases[0][1])
+
+    print(f"{'mode':<10} {'hit rate':>9} {'p@1':>7} {'p50 ms':>8} {'p95 ms':>8} {'ctx tokens':>11}")
+    for name, rerank in (('baseline', False), ('rerank', True)):
+        result = run(qa, cases, rerank)
+        print(f"{name:<10} {result['hit_rate']:>9.2%} {result['precision_at_1']:>7.2%} "
+              f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['avg_context_tokens']:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
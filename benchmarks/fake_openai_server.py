@@ -0,0 +1,198 @@
+"""
+Local fake of the OpenAI chat completions API for testing the LLM gateway without costs
+POST /v1/chat/completions answers after --latency-ms; a share of requests fails with 500
+(--error-rate) or 429 with Retry-After (--rate-limit-rate), and requests over --rpm are
+answered with 429 like the real tier limit (replenished continuously, not per minute).
+Like a llama.cpp server it can simulate generation speed: prompt tokens are processed at
+--prompt-tps, except the prefix shared with the previous prompt (prompt cache), and the
+answer is generated at --tps, streamed token by token with "stream": true.
+
+Point the app at it: OPENAI_BASE_URL=http://127.0.0.1:8400/v1 OPENAI_API_KEY=fake
+
+Usage: python -m benchmarks.fake_openai_server [--port 8400] [--latency-ms 300] [--error-rate 0.1]
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.llm_gateway import TokenBucket
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency_ms: float = 300.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, rpm: int = 0, retry_after: float = 1.0,
+                 answer: str = "Nicht im Dokument enthalten", tps: float = 0.0, prompt_tps: float = 0.0,
+                 seed: int = None):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.request_bucket = TokenBucket(rpm)
+        self.retry_after = retry_after
+        self.answer = answer
+        self.tps = tps
+        self.prompt_tps = prompt_tps
+        self.last_prompt = ''
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'ok': 0, 'errors': 0, 'rate_limited': 0}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def outcome(self) -> int:
+        """HTTP status of the next request"""
+        with self.lock:
+            self.counts['requests'] += 1
+            over_limit = self.request_bucket.wait_time(1, time.monotonic()) > 0
+            if over_limit or self.rng.random() < self.rate_limit_rate:
+                self.counts['rate_limited'] += 1
+                return 429
+            if self.rng.random() < self.error_rate:
+                self.counts['errors'] += 1
+                return 500
+            self.request_bucket.take(1)
+            self.counts['ok'] += 1
+            return 200
+
+    def cached_prefix(self, prompt: str) -> int:
+        """Characters at the start of prompt shared with the previous one (in the prompt cache)"""
+        with self.lock:
+            cached = len(os.path.commonprefix([self.last_prompt, prompt]))
+            self.last_prompt = prompt
+        return cached
+
+    def answer_tokens(self, max_tokens: int = None) -> list:
+        tokens = [f"{word} " for word in self.answer.split()]
+        tokens[-1] = tokens[-1].rstrip()
+        return tokens[:max_tokens] if max_tokens else tokens
+
+    def start(self) -> "FakeOpenAIServer":
+        """Serve in a background thread"""
+        threading.Thread(target=self.serve_forever, name='fake-openai', daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            self._send_json(404, {'error': {'message': 'not found', 'type': 'invalid_request_error'}})
+            return
+
+        server = self.server
+        status = server.outcome()
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000)
+        if status == 429:
+            self._send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}},
+                            {'Retry-After': f"{server.retry_after:g}"})
+            return
+        if status == 500:
+            self._send_json(500, {'error': {'message': 'The server had an error', 'type': 'server_error'}})
+            return
+
+        prompt = ''.join(f"{message.get('role')}: {message.get('content') or ''}\n"
+                         for message in request.get('messages', []))
+        cached = server.cached_prefix(prompt)
+        if server.prompt_tps:
+            time.sleep((len(prompt) - cached) / 4 / server.prompt_tps)
+        tokens = server.answer_tokens(request.get('max_tokens'))
+        usage = {
+            'prompt_tokens': len(prompt) // 4,
+            'completion_tokens': len(tokens),
+            'total_tokens': len(prompt) // 4 + len(tokens),
+            'prompt_tokens_details': {'cached_tokens': cached // 4}
+        }
+        completion = {
+            'id': f"chatcmpl-fake{server.counts['requests']}",
+            'created': int(time.time()),
+            'model': request.get('model', 'fake')
+        }
+        if request.get('stream'):
+            self._stream(completion, tokens, usage, (request.get('stream_options') or {}).get('include_usage'))
+            return
+
+        if server.tps:
+            time.sleep(len(tokens) / server.tps)
+        self._send_json(200, {
+            **completion,
+            'object': 'chat.completion',
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                'finish_reason': 'stop'
+            }],
+            'usage': usage
+        })
+
+    def _stream(self, completion: dict, tokens: list, usage: dict, include_usage: bool):
+        """Server-sent events, one token per chunk"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def send(choices: list, **extra):
+            chunk = {**completion, 'object': 'chat.completion.chunk', 'choices': choices, **extra}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        send([{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}])
+        for token in tokens:
+            if self.server.tps:
+                time.sleep(1 / self.server.tps)
+            send([{'index': 0, 'delta': {'content': token}, 'finish_reason': None}])
+        send([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+        if include_usage:
+            send([], usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8400)
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of requests answered with 429')
+    parser.add_argument('--rpm', type=int, default=0, help='Requests per minute before 429 (0 = unlimited)')
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--tps', type=float, default=0.0, help='Generated tokens per second (0 = instant)')
+    parser.add_argument('--prompt-tps', type=float, default=0.0, help='Prompt tokens processed per second (0 = free)')
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.port, args.latency_ms, args.error_rate, args.rate_limit_rate,
+                              args.rpm, args.retry_after, tps=args.tps, prompt_tps=args.prompt_tps)
+    print(f"Fake OpenAI API on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
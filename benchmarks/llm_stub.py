@@ -0,0 +1,27 @@
+"""
+Local stand-in for the OpenAI client
+Mimics client.chat.completions.create() with a fixed latency, so query benchmarks
+measure our own pipeline without network calls or API costs.
+"""
+import time
+from types import SimpleNamespace
+
+
+class LocalLLMStub:
+    """Replaces OpenAI(): returns a canned answer after latency_ms"""
+
+    def __init__(self, latency_ms: float = 0.0, answer: str = "Nicht im Dokument enthalten"):
+        self.latency_ms = latency_ms
+        self.answer = answer
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model: str, messages: list, **kwargs):
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        prompt_chars = sum(len(message['content']) for message in messages)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.answer))],
+            usage=SimpleNamespace(prompt_tokens=prompt_chars // 4, completion_tokens=len(self.answer) // 4)
+        )
@@ -0,0 +1,208 @@
+"""
+End-to-end benchmark of the ingest and query paths on a synthetic PDF corpus
+Measures extraction pages/s, chunking MB/s, embedding chunks/s, index build time and
+query p50/p95/p99 latency for per-PDF and all-PDF scope. OpenAI is replaced by a
+local stub. Results are written as JSON for comparison across commits.
+
+Usage: python -m benchmarks.run_benchmarks [--docs 20] [--pages 10] [--queries 100]
+                                           [--llm-latency-ms 0] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import config
+from benchmarks.synthetic_pdf import generate_corpus
+from benchmarks.llm_stub import LocalLLMStub
+
+QUESTIONS = [
+    'Wie lautet meine E-Mail-Adresse?',
+    'Wie ist meine Telefonnummer?',
+    'Was ist meine Adresse?',
+    'Wie lautet die Rechnungsnummer?',
+    'Wie lang ist die Kündigungsfrist?',
+    'Wer haftet bei Fahrlässigkeit?',
+    'Wann müssen Rechnungen bezahlt werden?',
+    'Kann ich die Ware zurückgeben?',
+    'Wo ist der Gerichtsstand?',
+    'Wie lange gilt die Gewährleistung?',
+]
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(latencies: list) -> dict:
+    return {
+        'count': len(latencies),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'mean_ms': sum(latencies) / len(latencies) if latencies else 0.0
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def bench_ingest(ingest_service, paths: list, user_id: int) -> dict:
+    """Run the ingest pipeline stage by stage and time every stage"""
+    from database_dummy import db
+
+    processor = ingest_service.pdf_processor
+    timings = {'extract': 0.0, 'chunk': 0.0, 'store': 0.0, 'embed': 0.0, 'index': 0.0}
+    pages = 0
+    text_bytes = 0
+    chunk_count = 0
+    pdf_ids = []
+
+    for path in paths:
+        with open(path, 'rb') as pdf_file:
+            started = time.perf_counter()
+            page_texts = processor.extract_text_from_pdf(pdf_file)
+            timings['extract'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        chunks = []
+        for page_text, page_number in page_texts:
+            chunks.extend(processor.chunk_text(page_text, page_number))
+        timings['chunk'] += time.perf_counter() - started
+
+        pages += len(page_texts)
+        text_bytes += sum(len(text.encode('utf-8')) for text, _ in page_texts)
+        chunk_count += len(chunks)
+
+        pdf_id = db.insert_pdf(user_id, os.path.basename(path))
+        pdf_ids.append(pdf_id)
+
+        started = time.perf_counter()
+        ingest_service.embed_chunks(chunks)
+        timings['embed'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        ingest_service.store_chunks(pdf_id, chunks)
+        timings['store'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        ingest_service.build_indices(pdf_id, chunks)
+        timings['index'] += time.perf_counter() - started
+
+    # Global ("Alle PDFs") vector index over the whole corpus
+    started = time.perf_counter()
+    index, chunk_ids = ingest_service.embedding_manager.create_faiss_index()
+    if index is not None:
+        ingest_service.embedding_manager.save_faiss_index(index, chunk_ids)
+    global_index_seconds = time.perf_counter() - started
+
+    return {
+        'pdf_ids': pdf_ids,
+        'results': {
+            'documents': len(paths),
+            'pages': pages,
+            'chunks': chunk_count,
+            'text_mb': text_bytes / 1e6,
+            'extraction_pages_per_s': pages / timings['extract'] if timings['extract'] else None,
+            'chunking_mb_per_s': text_bytes / 1e6 / timings['chunk'] if timings['chunk'] else None,
+            'store_seconds': timings['store'],
+            'embedding_chunks_per_s': chunk_count / timings['embed'] if timings['embed'] else None,
+            'per_pdf_index_build_seconds': timings['index'],
+            'global_index_build_seconds': global_index_seconds
+        }
+    }
+
+
+def bench_queries(qa, pdf_ids: list, user_id: int, queries: int, rng: random.Random) -> dict:
+    """Time ask_question for per-PDF and all-PDF scope"""
+    results = {}
+    for scope in ('per_pdf', 'all_pdfs'):
+        latencies = []
+        paths = {}
+        for _ in range(queries):
+            question = rng.choice(QUESTIONS)
+            pdf_id = rng.choice(pdf_ids) if scope == 'per_pdf' else None
+            started = time.perf_counter()
+            result = qa.ask_question(question, user_id, pdf_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+            answer_path = result.get('answer_path') or 'none'
+            paths[answer_path] = paths.get(answer_path, 0) + 1
+        results[scope] = {**latency_summary(latencies), 'answer_paths': paths}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=20, help='Number of synthetic PDFs')
+    parser.add_argument('--pages', type=int, default=10, help='Pages per PDF')
+    parser.add_argument('--queries', type=int, default=100, help='Queries per scope')
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='Latency of the OpenAI stub')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_results.json', help='JSON result file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='pdf_bench_')
+    config.FAISS_INDEX_DIR = os.path.join(workdir, 'indices')
+
+    from database_dummy import db
+    from services.llm_gateway import LLMGateway
+    from services.qa_service import QAService
+    from services.ingest_service import IngestService
+
+    rng = random.Random(args.seed)
+    paths = generate_corpus(os.path.join(workdir, 'pdfs'), args.docs, args.pages, args.seed)
+
+    qa = QAService()
+    qa.openai_client = LocalLLMStub(args.llm_latency_ms)
+    qa.llm_gateway = LLMGateway(qa.openai_client)
+    ingest_service = IngestService(qa.embedding_manager)
+    user_id = db.insert_user('bench', 'bench')
+
+    ingest = bench_ingest(ingest_service, paths, user_id)
+    query_results = bench_queries(qa, ingest['pdf_ids'], user_id, args.queries, rng)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'parameters': {
+            'docs': args.docs,
+            'pages': args.pages,
+            'queries': args.queries,
+            'llm_latency_ms': args.llm_latency_ms,
+            'seed': args.seed,
+            'embedding_model': config.EMBEDDING_MODEL,
+            'hybrid_search': config.HYBRID_SEARCH_ENABLED,
+            'rerank': config.RERANK_ENABLED,
+            'fast_path': config.FAST_PATH_ENABLED
+        },
+        'ingest': ingest['results'],
+        'query': query_results,
+        'llm_stub_calls': qa.openai_client.calls
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps({'ingest': report['ingest'], 'query': report['query']}, indent=2))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Synthetic PDF corpus generator
+Writes minimal text PDFs (Helvetica, WinAnsi encoding) without third-party libraries,
+so benchmarks run locally with nothing but the app's own dependencies.
+"""
+import os
+import random
+import textwrap
+from typing import List
+
+SENTENCES = [
+    'Der Vertrag tritt mit Unterzeichnung durch beide Parteien in Kraft.',
+    'Die Kündigungsfrist beträgt drei Monate zum Ende eines Kalendervierteljahres.',
+    'Rechnungen sind innerhalb von vierzehn Tagen ohne Abzug zu begleichen.',
+    'Der Anbieter haftet nur für Vorsatz und grobe Fahrlässigkeit.',
+    'Die Gewährleistungsfrist beträgt zwölf Monate ab Übergabe der Ware.',
+    'Personenbezogene Daten werden ausschließlich zur Vertragserfüllung verarbeitet.',
+    'Änderungen und Ergänzungen dieses Vertrages bedürfen der Schriftform.',
+    'Die Lieferung erfolgt frei Haus an die vom Kunden angegebene Adresse.',
+    'Gerichtsstand für alle Streitigkeiten ist der Sitz des Anbieters.',
+    'Der Kunde kann die Ware innerhalb von vierzehn Tagen zurückgeben.',
+    'Preise verstehen sich inklusive der gesetzlichen Mehrwertsteuer.',
+    'Sollte eine Bestimmung unwirksam sein, bleibt der Vertrag im Übrigen wirksam.',
+]
+
+FIRST_NAMES = ['Anna', 'Lukas', 'Marie', 'Jonas', 'Sophie', 'Felix', 'Lena', 'Paul']
+LAST_NAMES = ['Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber', 'Becker', 'Wagner', 'Hoffmann']
+STREETS = ['Hauptstraße', 'Lindenweg', 'Schillerplatz', 'Goetheallee', 'Bahnhofstraße']
+CITIES = ['Berlin', 'Hamburg', 'München', 'Köln', 'Leipzig', 'Dresden']
+
+LINE_WIDTH = 90
+LINES_PER_PAGE = 50
+
+
+def _escape(text: str) -> bytes:
+    """Encode text as a PDF string literal body in WinAnsi (cp1252)"""
+    data = text.encode('cp1252', errors='replace')
+    out = bytearray()
+    for byte in data:
+        if byte in (0x28, 0x29, 0x5C):  # ( ) \
+            out += b'\\' + bytes([byte])
+        elif byte < 0x20 or byte > 0x7E:
+            out += b'\\%03o' % byte
+        else:
+            out.append(byte)
+    return bytes(out)
+
+
+def write_pdf(path: str, pages: List[str]):
+    """Write a PDF with one text page per entry in pages"""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+    pages_id = add(b'')  # Filled in once all page ids are known
+    page_ids = []
+    for page_text in pages:
+        lines = []
+        for paragraph in page_text.split('\n'):
+            lines.extend(textwrap.wrap(paragraph, LINE_WIDTH) or [''])
+        stream = bytearray(b'BT /F1 10 Tf 12 TL 50 800 Td\n')
+        for line in lines[:LINES_PER_PAGE]:
+            stream += b'(' + _escape(line) + b") '\n"
+        stream += b'ET'
+        content_id = add(b'<< /Length %d >>\nstream\n' % len(stream) + bytes(stream) + b'\nendstream')
+        page_ids.append(add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] ' % pages_id
+            + b'/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>' % (font_id, content_id)
+        ))
+    kids = b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+    objects[pages_id - 1] = b'<< /Type /Pages /Kids [' + kids + b'] /Count %d >>' % len(page_ids)
+    catalog_id = add(b'<< /Type /Catalog /Pages %d 0 R >>' % pages_id)
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref_offset = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        output += b'%010d 00000 n \n' % offset
+    output += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+        len(objects) + 1, catalog_id, xref_offset
+    )
+
+    with open(path, 'wb') as f:
+        f.write(output)
+
+
+def make_document(page_count: int, rng: random.Random) -> List[str]:
+    """Generate page texts for one contract-like document with a contact block on page 1"""
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    contact = (
+        f"Name: {first} {last}\n"
+        f"{rng.choice(STREETS)} {rng.randint(1, 120)}, {rng.randint(10000, 99999)} {rng.choice(CITIES)}\n"
+        f"E-Mail: {first.lower()}.{last.lower().replace('ü', 'ue')}@example.de\n"
+        f"Telefon: +49 {rng.randint(30, 89)} {rng.randint(1000000, 9999999)}\n"
+        f"Rechnungsnummer: RE-{rng.randint(2019, 2025)}-{rng.randint(0, 99999):05d}\n"
+    )
+    pages = []
+    for page_number in range(page_count):
+        body = ' '.join(rng.choice(SENTENCES) for _ in range(rng.randint(25, 40)))
+        pages.append((contact if page_number == 0 else '') + body)
+    return pages
+
+
+def generate_corpus(directory: str, docs: int, pages: int, seed: int = 0) -> List[str]:
+    """
+    Write docs synthetic PDFs with the given page count into directory
+    Returns: List of file paths
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for doc in range(docs):
+        path = os.path.join(directory, f"synthetic_{doc:05d}.pdf")
+        write_pdf(path, make_document(pages, rng))
+        paths.append(path)
+    return paths
@@ -0,0 +1,327 @@
+"""
+Command-line bulk ingest and batch questions
+
+  python cli.py ingest <directory> --user NAME [--password PW] [--workers 4]
+  python cli.py ask <questions.txt|questions.jsonl> --user NAME [--pdf FILENAME|ID] [--output answers.jsonl]
+  python cli.py migrate-model [MODEL]
+  python cli.py verify-indices
+
+Ingested data is written to the shared catalog snapshot (DB_SNAPSHOT_PATH or --snapshot),
+which the Streamlit app and the HTTP API read as well. Ingest can be interrupted and
+resumed: finished files are recorded in a manifest and skipped on the next run.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+import config
+
+
+def _extract_file(path: str) -> Tuple[str, list, str, str]:
+    """Worker process: extract and chunk one PDF, returns (path, chunks, error, file hash)"""
+    from models.pdf_processor import PDFProcessor
+    from models.text_extraction import file_sha256
+    file_hash = None
+    try:
+        with open(path, 'rb') as pdf_file:
+            file_hash = file_sha256(pdf_file)
+            return path, PDFProcessor().process_pdf(pdf_file, file_hash), None, file_hash
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}", file_hash
+
+
+def _bounded_map(pool, func, items: list, window: int) -> Iterator:
+    """Like pool.map, but keeps at most window tasks in flight so results do not pile up in memory"""
+    pending = []
+    items = iter(items)
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= window:
+            break
+    while pending:
+        result = pending.pop(0).result()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            break
+        yield result
+
+
+def _batches(items: Iterator, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def load_manifest(path: str) -> dict:
+    if not os.path.exists(path):
+        return {'version': 1, 'files': {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: str):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def find_pdfs(directory: str) -> List[str]:
+    """All PDF files below directory, sorted for a stable ingest order"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith('.pdf'):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def resolve_user(username: str, password: str = None) -> int:
+    """user_id of username, the user is created if a password is given"""
+    from database_dummy import db
+    from services.user_service import UserService
+
+    user = db.get_user_by_username(username)
+    if user:
+        return user['user_id']
+    if password is None:
+        sys.exit(f"User '{username}' does not exist (pass --password to create it)")
+    user_id = UserService.create_user(username, password)
+    if user_id is None:
+        # Registered by someone else since the lookup
+        return db.get_user_by_username(username)['user_id']
+    return user_id
+
+
+def cmd_ingest(args):
+    from database_dummy import db
+    from services.ingest_service import IngestService
+
+    db.sync()
+    user_id = resolve_user(args.user, args.password)
+    root = os.path.abspath(args.directory)
+    manifest = load_manifest(args.manifest)
+    existing = {filename for _, filename, _ in db.get_pdfs_by_user(user_id)}
+
+    todo = []
+    skipped = 0
+    for path in find_pdfs(root):
+        stat = os.stat(path)
+        relative = os.path.relpath(path, root)
+        entry = manifest['files'].get(path)
+        unchanged = entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+        if unchanged and entry['status'] == 'done':
+            skipped += 1
+        elif entry is None and relative in existing:
+            # Stored by a run that stopped before its manifest was written
+            manifest['files'][path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                       'status': 'done', 'pdf_id': None, 'chunks': None, 'error': None}
+            skipped += 1
+        else:
+            todo.append(path)
+    print(f"{len(todo)} PDFs to ingest, {skipped} already done")
+
+    ingest_service = IngestService()
+    done = failed = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        extracted = _bounded_map(pool, _extract_file, todo, window=args.workers * 4)
+        for batch in _batches(extracted, args.batch_size):
+            # One embedding call per batch, outside the database write lock
+            ingest_service.embed_chunks([chunk for _, chunks, _, _ in batch for chunk in chunks])
+
+            stored = []
+            with db.transaction():
+                for path, chunks, error, file_hash in batch:
+                    stat = os.stat(path)
+                    entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                             'status': 'failed' if error else 'done', 'pdf_id': None,
+                             'chunks': len(chunks), 'error': error}
+                    if not error:
+                        pdf_id = db.insert_pdf(user_id, os.path.relpath(path, root), stat.st_size, file_hash)
+                        ingest_service.ensure_current_embeddings(chunks)
+                        ingest_service.store_chunks(pdf_id, chunks)
+                        ingest_service.build_indices(pdf_id, chunks, update_global=False)
+                        stored.extend(chunks)
+                        entry['pdf_id'] = pdf_id
+                    manifest['files'][path] = entry
+                    done += not error
+                    failed += bool(error)
+                ingest_service.update_global_indices(stored)
+            save_manifest(manifest, args.manifest)
+
+            elapsed = time.perf_counter() - started
+            print(f"[{done + failed}/{len(todo)}] {done / elapsed:.1f} PDFs/s, {failed} failed")
+
+    for path, entry in manifest['files'].items():
+        if entry['status'] == 'failed':
+            print(f"FAILED {path}: {entry['error']}")
+    print(f"Ingested {done} PDFs, {failed} failed, manifest: {args.manifest}")
+
+
+def read_questions(path: str) -> List[dict]:
+    """Questions from a text file (one per line) or JSONL with a 'question' field"""
+    questions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                item = json.loads(line)
+                questions.append({'id': item.get('id', line_number), 'question': item['question']})
+            else:
+                questions.append({'id': line_number, 'question': line})
+    return questions
+
+
+def cmd_ask(args):
+    from database_dummy import db
+    from services.qa_service import QAService
+
+    db.sync()
+    user_id = resolve_user(args.user)
+    pdf_id = None
+    if args.pdf:
+        pdfs = db.get_pdfs_by_user(user_id)
+        matches = [pid for pid, filename, _ in pdfs if str(pid) == args.pdf or filename == args.pdf]
+        if not matches:
+            sys.exit(f"PDF '{args.pdf}' not found for user '{args.user}'")
+        pdf_id = matches[0]
+
+    qa = QAService()
+    if args.no_llm:
+        qa.openai_client = None
+
+    def answer(item: dict) -> dict:
+        started = time.perf_counter()
+        result = qa.ask_question(item['question'], user_id, pdf_id)
+        return {
+            'id': item['id'],
+            'question': item['question'],
+            'pdf_id': pdf_id,
+            **result,
+            'latency_ms': (time.perf_counter() - started) * 1000,
+            'answered_at': datetime.now().isoformat(timespec='seconds')
+        }
+
+    questions = read_questions(args.questions)
+    latencies = []
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            for result in pool.map(answer, questions):
+                latencies.append(result['latency_ms'])
+                output.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"{len(latencies)} questions, p50 {_percentile(latencies, 0.5):.1f} ms, "
+          f"p95 {_percentile(latencies, 0.95):.1f} ms", file=sys.stderr)
+
+
+def cmd_migrate_model(args):
+    from database_dummy import db
+    from services.model_migration import model_migration
+
+    db.sync()
+    if not args.model:
+        for key, value in model_migration.status().items():
+            print(f"{key}: {value}")
+        return
+
+    started = time.perf_counter()
+
+    def progress(done: int, total: int):
+        print(f"[{done}/{total}] {time.perf_counter() - started:.0f}s")
+
+    print(f"Migrating from {model_migration.status()['active_model']} to {args.model}")
+    try:
+        model_migration.run(args.model, progress)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    print(f"Active model: {model_migration.status()['active_model']}")
+
+
+def cmd_verify_indices(args):
+    from models.index_bundle import list_bundles, migrate_legacy_bundles, read_manifest, verify_bundle
+
+    # One index directory per embedding model
+    root = config.FAISS_INDEX_DIR
+    migrate_legacy_bundles(root)
+    index_dirs = [os.path.join(root, name) for name in sorted(os.listdir(root))
+                  if os.path.isdir(os.path.join(root, name))] if os.path.isdir(root) else []
+    checked = broken = 0
+    for index_dir in index_dirs:
+        for name in list_bundles(index_dir):
+            problem = verify_bundle(index_dir, name)
+            manifest = read_manifest(index_dir, name) or {}
+            print(f"{'BROKEN' if problem else 'ok':6} {name}: {manifest.get('count')} vectors, "
+                  f"model {manifest.get('model')}, corpus version {manifest.get('corpus_version')}"
+                  + (f" ({problem})" if problem else ""))
+            checked += 1
+            broken += bool(problem)
+    print(f"{checked} index bundles, {broken} broken")
+    if broken:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--snapshot', help='Catalog snapshot file (default: DB_SNAPSHOT_PATH)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest = subparsers.add_parser('ingest', help='Ingest a directory tree of PDFs')
+    ingest.add_argument('directory')
+    ingest.add_argument('--user', required=True)
+    ingest.add_argument('--password', help='Create the user with this password if it does not exist')
+    ingest.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Extraction processes')
+    ingest.add_argument('--batch-size', type=int, default=32, help='PDFs per embedding call and commit')
+    ingest.add_argument('--manifest', default='ingest_manifest.json', help='Resume manifest')
+    ingest.set_defaults(func=cmd_ingest)
+
+    ask = subparsers.add_parser('ask', help='Answer a file of questions, write JSONL')
+    ask.add_argument('questions')
+    ask.add_argument('--user', required=True)
+    ask.add_argument('--pdf', help='Filename or id of one PDF (default: all PDFs of the user)')
+    ask.add_argument('--output', default='-', help='JSONL output file (default: stdout)')
+    ask.add_argument('--workers', type=int, default=4, help='Concurrent questions')
+    ask.add_argument('--no-llm', action='store_true', help='Answer without OpenAI')
+    ask.set_defaults(func=cmd_ask)
+
+    migrate = subparsers.add_parser('migrate-model', help='Re-embed all PDFs with another model, then switch to it')
+    migrate.add_argument('model', nargs='?', help='sentence-transformers model name (omit to show the status)')
+    migrate.set_defaults(func=cmd_migrate_model)
+
+    verify = subparsers.add_parser('verify-indices', help='Check the checksums of all saved FAISS index bundles')
+    verify.set_defaults(func=cmd_verify_indices)
+
+    args = parser.parse_args()
+    if args.snapshot:
+        config.DB_SNAPSHOT_PATH = args.snapshot
+    if not config.DB_SNAPSHOT_PATH and args.command != 'verify-indices':
+        parser.error("DB_SNAPSHOT_PATH or --snapshot is required, the database is in-memory otherwise")
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
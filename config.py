@@ -9,11 +9,141 @@ EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+# Optional: other endpoint for the OpenAI backend (proxy, Azure-compatible gateway)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# Concurrent requests to the backend (0 = unlimited)
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "16"))
+
+# Answer generation backend: "openai" or "local", an OpenAI-compatible server such as
+# llama.cpp's llama-server; LOCAL_LLM_CONCURRENCY should match its number of slots (--parallel)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL", "http://127.0.0.1:8080/v1")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "local")
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY", "local")
+LOCAL_LLM_CONCURRENCY = int(os.getenv("LOCAL_LLM_CONCURRENCY", "1"))
+# Generation on CPU is slower than the OpenAI API
+LOCAL_LLM_TIMEOUT = float(os.getenv("LOCAL_LLM_TIMEOUT", "120"))
+
+# LLM gateway (services/llm_gateway.py): rate limits of the OpenAI tier (0 = unlimited) and how
+# long a call may wait for them or a free slot, timeout per attempt and retries in seconds, circuit breaker
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "3500"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
 
 # FAISS Index Directory
 FAISS_INDEX_DIR = "faiss_indices"
+# Memory-map saved indices instead of reading them: worker processes share one copy in the page cache
+INDEX_MMAP_ENABLED = os.getenv("INDEX_MMAP_ENABLED", "true").lower() == "true"
+# Rebuild the global indices once deleted chunks make up this share of them
+INDEX_COMPACTION_THRESHOLD = float(os.getenv("INDEX_COMPACTION_THRESHOLD", "0.2"))
+
+# Coarse-to-fine search over all PDFs: document centroids, then page centroids of the best
+# documents, then only the chunks of the best pages (models/hierarchical_index.py)
+HIERARCHICAL_SEARCH_ENABLED = os.getenv("HIERARCHICAL_SEARCH_ENABLED", "false").lower() == "true"
+HIERARCHY_TOP_DOCS = int(os.getenv("HIERARCHY_TOP_DOCS", "10"))
+HIERARCHY_TOP_PAGES = int(os.getenv("HIERARCHY_TOP_PAGES", "30"))
+
+# Vector compression: storage of embeddings in the database and FAISS indices (float32, float16 or int8)
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "float32")
+# Optional PCA reduction of index vectors (0 = off), trained once per model on its corpus
+PCA_DIMENSIONS = int(os.getenv("PCA_DIMENSIONS", "0"))
+PCA_MIN_TRAINING_VECTORS = int(os.getenv("PCA_MIN_TRAINING_VECTORS", "1000"))
+PCA_TRAINING_SAMPLE = int(os.getenv("PCA_TRAINING_SAMPLE", "50000"))
+
+# Uploads: spooled to disk before ingest (default: system temp dir), size cap per file and
+# storage quota per user in MB (0 = unlimited), both checked before parsing
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR")
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "100"))
+USER_QUOTA_MB = float(os.getenv("USER_QUOTA_MB", "1000"))
+
+# PDF text extraction: backend ("pypdf2" or "pdfium"), page text cache ("" = off),
+# per-page timeout in seconds (0 = extract in-process without a timeout)
+EXTRACTION_BACKEND = os.getenv("EXTRACTION_BACKEND", "pypdf2")
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", "extraction_cache")
+EXTRACTION_PAGE_TIMEOUT = float(os.getenv("EXTRACTION_PAGE_TIMEOUT", "30"))
 
 # Chunking Settings
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 
+
+# Prompt Context Settings
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+# Extractive Fast Path (answers structured questions without the LLM)
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_MAX_CHUNKS = int(os.getenv("FAST_PATH_MAX_CHUNKS", "3"))
+
+# Hybrid Retrieval (BM25 + vector search, merged with reciprocal rank fusion)
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = 60
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Similarity Thresholds (cosine similarity, -1..1)
+MIN_SIMILARITY_SCORE = float(os.getenv("MIN_SIMILARITY_SCORE", "0.2"))
+MAX_SCORE_DROP = float(os.getenv("MAX_SCORE_DROP", "0.25"))
+# BM25 hits below this share of the best lexical hit are not fused in (0 = keep all); relative,
+# because raw BM25 scores shrink with the index size (an exact term in a 1-chunk PDF scores ~0.3)
+MIN_BM25_SCORE_RATIO = float(os.getenv("MIN_BM25_SCORE_RATIO", "0.5"))
+# Absolute BM25 floor, only for the global index where scores are comparable (0 = off)
+MIN_BM25_SCORE = float(os.getenv("MIN_BM25_SCORE", "0"))
+
+# Neighbour expansion: retrieve fewer hits and add the chunks around each one (same page)
+# within a token budget (0 = CONTEXT_TOKEN_BUDGET), so answers crossing a chunk boundary stay whole
+NEIGHBOUR_EXPANSION_ENABLED = os.getenv("NEIGHBOUR_EXPANSION_ENABLED", "false").lower() == "true"
+NEIGHBOUR_TOP_K = int(os.getenv("NEIGHBOUR_TOP_K", "3"))
+NEIGHBOUR_WINDOW = int(os.getenv("NEIGHBOUR_WINDOW", "1"))
+NEIGHBOUR_TOKEN_BUDGET = int(os.getenv("NEIGHBOUR_TOKEN_BUDGET", "0"))
+
+# Hot chunk cache (number of hydrated chunks kept in memory)
+CHUNK_CACHE_SIZE = int(os.getenv("CHUNK_CACHE_SIZE", "2048"))
+
+# Cross-Encoder Re-Ranking (optional)
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "3"))
+RERANK_LATENCY_BUDGET_MS = float(os.getenv("RERANK_LATENCY_BUDGET_MS", "300"))
+
+# Latency Metrics (per-stage histograms, Prometheus text export)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1000"))
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH")
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "15"))
+# Users who see the performance panel and may start model migrations (empty = nobody)
+ADMIN_USERS = [name.strip() for name in os.getenv("ADMIN_USERS", "").split(",") if name.strip()]
+
+# Request Profiling (opt-in, profiles a sampled fraction of ask/ingest requests)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0.01"))
+PROFILING_MODE = os.getenv("PROFILING_MODE", "sampling")  # "sampling" (collapsed stacks) or "cprofile" (pstats)
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "5"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "200"))
+
+# Shared catalog snapshot (lets several API workers see the same users/PDFs/chunks)
+DB_SNAPSHOT_PATH = os.getenv("DB_SNAPSHOT_PATH")
+
+# HTTP API (api/server.py), the Streamlit app becomes a thin client when API_BASE_URL is set
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+API_BATCH_CONCURRENCY = int(os.getenv("API_BATCH_CONCURRENCY", "4"))
+# Most questions per POST /ask/batch, each one is a retrieval and possibly an LLM call
+API_MAX_BATCH_QUESTIONS = int(os.getenv("API_MAX_BATCH_QUESTIONS", "20"))
+API_BASE_URL = os.getenv("API_BASE_URL")
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "120"))
+# Lifetime of the session tokens issued by POST /auth
+API_SESSION_HOURS = float(os.getenv("API_SESSION_HOURS", "24"))
+JOB_DIR = os.getenv("JOB_DIR", "jobs")
+
+# Sharded dense retrieval (0 = search in-process; N = N shard processes, by pdf_id hash)
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+SHARD_START_TIMEOUT = float(os.getenv("SHARD_START_TIMEOUT", "30"))
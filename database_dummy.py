@@ -2,17 +2,38 @@
 Dummy Database - In-Memory Storage
 Replaces Oracle DB with simple in-memory data structures
 """
+import os
+import pickle
+import time
+import threading
+from contextlib import contextmanager
+import config
+
+# Cross-process locking is POSIX only, without it only one writer process is supported
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Tables shared between processes through the snapshot file (queries/responses/errors stay local)
+SHARED_TABLES = ('users', 'sessions', 'pdf_files', 'chunks', 'chunk_adjacency', 'embeddings', 'field_index',
+                 'user_id_counter', 'pdf_id_counter', 'chunk_id_counter', 'embedding_id_counter',
+                 'corpus_versions', 'tombstones', 'embedding_model', 'model_migration')
 
 class DummyDB:
     """Simple in-memory database replacement"""
     
     def __init__(self):
         self.users = {}  # {user_id: {username, password_hash, created_at}}
+        self.sessions = {}  # {token_hash: {user_id, expires_at}} (API logins)
         self.pdf_files = {}  # {pdf_id: {user_id, filename, upload_date}}
         self.chunks = {}  # {chunk_id: {pdf_id, text_chunk, chunk_index, page_number}}
-        self.embeddings = {}  # {embedding_id: {chunk_id, vector}}
+        self.chunk_adjacency = {}  # {(pdf_id, page_number, chunk_index): chunk_id}
+        self.embeddings = {}  # {embedding_id: {chunk_id, vector, model}}
+        self.field_index = {}  # {pdf_id: {field_type: [(value, chunk_id, page_number)]}}
         self.queries = {}  # {query_id: {user_id, question, asked_at}}
-        self.responses = {}  # {response_id: {query_id, answer, source_pdf, source_page, answered_at}}
+        self.responses = {}  # {response_id: {query_id, answer, source_pdf, source_page, prompt_tokens, answered_at}}
         self.error_logs = []  # List of error dicts
         
         # Auto-increment counters
@@ -22,6 +43,99 @@ class DummyDB:
         self.embedding_id_counter = 1
         self.query_id_counter = 1
         self.response_id_counter = 1
+        
+        # Per embedding model, bumped on every new embedding: saved indices record the version they were built from
+        self.corpus_versions = {}  # {model: version}
+        # chunk_ids of deleted PDFs that are still in the global indices, until compaction rebuilds them
+        self.tombstones = set()
+        # Embedding model serving all scopes (None = config.EMBEDDING_MODEL) and a running migration
+        self.embedding_model = None
+        self.model_migration = None  # {target, migrated: set of pdf_ids, started_at}
+        
+        # Snapshot state for sharing the catalog between API workers (DB_SNAPSHOT_PATH)
+        self._snapshot_version = None
+        self._lock = threading.RLock()
+        self._transaction_depth = 0
+    
+    def sync(self):
+        """Reload shared tables if another process wrote a newer snapshot"""
+        path = config.DB_SNAPSHOT_PATH
+        if not path or not os.path.exists(path):
+            return
+        # Every save is a new file (atomic rename), so the inode identifies the version
+        stat = os.stat(path)
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version == self._snapshot_version:
+            return
+        with self._lock:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            for name in SHARED_TABLES:
+                # Snapshots written by older versions may lack newer tables
+                if name in state:
+                    setattr(self, name, state[name])
+            if 'chunk_adjacency' not in state:
+                self.chunk_adjacency = {
+                    (data['pdf_id'], data['page_number'], data['chunk_index']): chunk_id
+                    for chunk_id, data in self.chunks.items()
+                }
+            self._snapshot_version = version
+    
+    def save_snapshot(self):
+        """Write shared tables to DB_SNAPSHOT_PATH (atomic rename)"""
+        path = config.DB_SNAPSHOT_PATH
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            state = {name: getattr(self, name) for name in SHARED_TABLES}
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            stat = os.stat(path)
+            self._snapshot_version = (stat.st_ino, stat.st_mtime_ns)
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Serialize writes across processes: lock, reload the latest snapshot, write, save
+        Without DB_SNAPSHOT_PATH only the in-process lock is taken. Nested transactions
+        join the outer one, which saves once at the end (bulk ingest batches).
+        """
+        path = config.DB_SNAPSHOT_PATH
+        with self._lock:
+            if not path or self._transaction_depth:
+                self._transaction_depth += 1
+                try:
+                    yield
+                finally:
+                    self._transaction_depth -= 1
+                return
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path + '.lock', 'a') as lock_file:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._transaction_depth += 1
+                try:
+                    self.sync()
+                    try:
+                        yield
+                    except BaseException:
+                        # Drop the partial writes (e.g. a PDF whose indices failed to build), else the
+                        # next transaction would save them: reload the last saved snapshot
+                        self._snapshot_version = None
+                        self.sync()
+                        raise
+                    self.save_snapshot()
+                finally:
+                    self._transaction_depth -= 1
+                    if FCNTL_AVAILABLE:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
     
     def insert_user(self, username: str, password_hash: str) -> int:
         """Insert user and return user_id"""
@@ -34,6 +148,26 @@ class DummyDB:
         }
         return user_id
     
+    def get_user(self, user_id: int) -> dict:
+        """Get user by ID"""
+        if user_id in self.users:
+            return {'user_id': user_id, **self.users[user_id]}
+        return None
+    
+    def insert_session(self, token_hash: str, user_id: int, expires_at: float):
+        """Store an API session, expired sessions are dropped on the way"""
+        now = time.time()
+        for expired in [key for key, data in self.sessions.items() if data['expires_at'] <= now]:
+            del self.sessions[expired]
+        self.sessions[token_hash] = {'user_id': user_id, 'expires_at': expires_at}
+    
+    def get_session(self, token_hash: str) -> dict:
+        """Get a session that has not expired"""
+        session = self.sessions.get(token_hash)
+        if session and session['expires_at'] > time.time():
+            return session
+        return None
+    
     def get_user_by_username(self, username: str) -> dict:
         """Get user by username"""
         for user_id, user_data in self.users.items():
@@ -52,17 +186,29 @@ class DummyDB:
         """Check if username exists"""
         return self.get_user_by_username(username) is not None
     
-    def insert_pdf(self, user_id: int, filename: str) -> int:
+    def insert_pdf(self, user_id: int, filename: str, size_bytes: int = 0, file_hash: str = None) -> int:
         """Insert PDF and return pdf_id"""
         pdf_id = self.pdf_id_counter
         self.pdf_id_counter += 1
         self.pdf_files[pdf_id] = {
             'user_id': user_id,
             'filename': filename,
-            'upload_date': self._now()
+            'upload_date': self._now(),
+            'size_bytes': size_bytes,
+            'file_hash': file_hash
         }
         return pdf_id
     
+    def file_hash_in_use(self, file_hash: str) -> bool:
+        """True if a stored PDF has this content hash (the same file uploaded again)"""
+        return any(pdf_data.get('file_hash') == file_hash for pdf_data in self.pdf_files.values())
+    
+    def get_user_storage_bytes(self, user_id: int) -> int:
+        """Total file size of a user's PDFs"""
+        return sum(
+            pdf_data.get('size_bytes', 0) for pdf_data in self.pdf_files.values() if pdf_data['user_id'] == user_id
+        )
+    
     def get_pdfs_by_user(self, user_id: int) -> list:
         """Get all PDFs for a user"""
         result = []
@@ -71,6 +217,29 @@ class DummyDB:
                 result.append((pdf_id, pdf_data['filename'], pdf_data['upload_date']))
         return sorted(result, key=lambda x: x[2], reverse=True)  # Sort by date desc
     
+    def get_pdf(self, pdf_id: int) -> dict:
+        """Get PDF by ID"""
+        if pdf_id in self.pdf_files:
+            return {'pdf_id': pdf_id, **self.pdf_files[pdf_id]}
+        return None
+    
+    def delete_pdf(self, pdf_id: int) -> list:
+        """Delete a PDF with its chunks, embeddings and field index, returns the deleted chunk_ids"""
+        self.pdf_files.pop(pdf_id, None)
+        self.field_index.pop(pdf_id, None)
+        chunk_ids = [chunk_id for chunk_id, chunk_data in self.chunks.items() if chunk_data['pdf_id'] == pdf_id]
+        for chunk_id in chunk_ids:
+            chunk_data = self.chunks.pop(chunk_id)
+            self.chunk_adjacency.pop((pdf_id, chunk_data['page_number'], chunk_data['chunk_index']), None)
+        deleted = set(chunk_ids)
+        for embedding_id in [eid for eid, data in self.embeddings.items() if data['chunk_id'] in deleted]:
+            del self.embeddings[embedding_id]
+        return chunk_ids
+    
+    def get_all_pdf_ids(self) -> list:
+        """Get ids of all PDFs"""
+        return list(self.pdf_files.keys())
+    
     def insert_chunk(self, pdf_id: int, text_chunk: str, chunk_index: int, page_number: int = None) -> int:
         """Insert chunk and return chunk_id"""
         chunk_id = self.chunk_id_counter
@@ -81,8 +250,22 @@ class DummyDB:
             'chunk_index': chunk_index,
             'page_number': page_number
         }
+        self.chunk_adjacency[(pdf_id, page_number, chunk_index)] = chunk_id
         return chunk_id
     
+    def get_neighbour_chunk_ids(self, chunk_id: int, window: int = 1) -> list:
+        """chunk_ids of up to window chunks before and after a chunk on the same page, nearest first"""
+        chunk_data = self.chunks.get(chunk_id)
+        if chunk_data is None or chunk_data['chunk_index'] is None:
+            return []
+        result = []
+        for distance in range(1, window + 1):
+            for chunk_index in (chunk_data['chunk_index'] - distance, chunk_data['chunk_index'] + distance):
+                neighbour = self.chunk_adjacency.get((chunk_data['pdf_id'], chunk_data['page_number'], chunk_index))
+                if neighbour is not None:
+                    result.append(neighbour)
+        return result
+    
     def get_chunks_by_pdf(self, pdf_id: int) -> list:
         """Get all chunks for a PDF, ordered by chunk_index"""
         result = []
@@ -91,6 +274,10 @@ class DummyDB:
                 result.append((chunk_id, chunk_data))
         return sorted(result, key=lambda x: x[1]['chunk_index'])
     
+    def get_all_chunks(self) -> list:
+        """Get all chunks, ordered by chunk_id"""
+        return sorted(self.chunks.items(), key=lambda x: x[0])
+    
     def get_chunk_by_id(self, chunk_id: int) -> dict:
         """Get chunk by ID"""
         if chunk_id in self.chunks:
@@ -107,26 +294,74 @@ class DummyDB:
             return chunk
         return None
     
-    def insert_embedding(self, chunk_id: int, vector) -> int:
-        """Insert embedding and return embedding_id"""
+    def get_chunks_with_pdf_info(self, chunk_ids: list) -> list:
+        """Get several chunks with PDF filename in one call, in the order of chunk_ids"""
+        result = []
+        for chunk_id in chunk_ids:
+            chunk_data = self.chunks.get(chunk_id)
+            if chunk_data is None:
+                continue
+            pdf = self.pdf_files.get(chunk_data['pdf_id'])
+            chunk = {'chunk_id': chunk_id, **chunk_data}
+            if pdf:
+                chunk['filename'] = pdf['filename']
+            result.append(chunk)
+        return result
+    
+    def insert_embedding(self, chunk_id: int, vector, model: str = None) -> int:
+        """Insert embedding of one model and return embedding_id"""
+        model = model or config.EMBEDDING_MODEL
         embedding_id = self.embedding_id_counter
         self.embedding_id_counter += 1
         self.embeddings[embedding_id] = {
             'chunk_id': chunk_id,
-            'vector': vector
+            'vector': vector,
+            'model': model
         }
+        self.corpus_versions[model] = self.corpus_versions.get(model, 0) + 1
         return embedding_id
     
-    def get_embeddings_by_pdf(self, pdf_id: int = None) -> list:
-        """Get all embeddings, optionally filtered by pdf_id"""
+    def get_embeddings_by_pdf(self, pdf_id: int = None, model: str = None) -> list:
+        """Get all embeddings of one model, optionally filtered by pdf_id"""
+        model = model or config.EMBEDDING_MODEL
         result = []
         for embedding_id, embedding_data in self.embeddings.items():
+            # Rows from before the model registry belong to the configured model
+            if embedding_data.get('model', config.EMBEDDING_MODEL) != model:
+                continue
             chunk_id = embedding_data['chunk_id']
             chunk = self.get_chunk_by_id(chunk_id)
             if pdf_id is None or (chunk and chunk['pdf_id'] == pdf_id):
                 result.append((embedding_id, chunk_id, embedding_data['vector']))
         return result
     
+    def delete_embeddings_by_model(self, model: str):
+        """Drop all embeddings of a retired model"""
+        for embedding_id in [eid for eid, data in self.embeddings.items()
+                             if data.get('model', config.EMBEDDING_MODEL) == model]:
+            del self.embeddings[embedding_id]
+        self.corpus_versions.pop(model, None)
+    
+    def get_corpus_version(self, model: str) -> int:
+        """Number of embeddings ever stored for model"""
+        return self.corpus_versions.get(model, 0)
+    
+    def add_tombstones(self, chunk_ids: list):
+        """Mark deleted chunks that saved indices still contain"""
+        self.tombstones.update(chunk_ids)
+    
+    def clear_tombstones(self, chunk_ids: set):
+        """Forget tombstones once no index contains the chunks anymore"""
+        self.tombstones.difference_update(chunk_ids)
+    
+    def insert_field_index(self, pdf_id: int, field_index: dict):
+        """Store structured field index for a PDF"""
+        self.field_index[pdf_id] = field_index
+    
+    def get_field_values(self, pdf_id: int, field_type: str) -> list:
+        """Get (value, chunk_id, page_number) entries of one field type for a PDF"""
+        return self.field_index.get(pdf_id, {}).get(field_type, [])
+    
     def insert_query(self, user_id: int, question: str) -> int:
         """Insert query and return query_id"""
         query_id = self.query_id_counter
@@ -146,7 +381,8 @@ class DummyDB:
                 return query_id
         return None
     
-    def insert_response(self, query_id: int, answer: str, source_pdf: str = None, source_page: int = None) -> int:
+    def insert_response(self, query_id: int, answer: str, source_pdf: str = None, source_page: int = None,
+                        prompt_tokens: int = None) -> int:
         """Insert response and return response_id"""
         response_id = self.response_id_counter
         self.response_id_counter += 1
@@ -155,6 +391,7 @@ class DummyDB:
             'answer': answer,
             'source_pdf': source_pdf,
             'source_page': source_page,
+            'prompt_tokens': prompt_tokens,
             'answered_at': self._now()
         }
         return response_id
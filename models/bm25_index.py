@@ -0,0 +1,223 @@
+import os
+import re
+import math
+import threading
+from array import array
+from typing import Callable, List, Tuple, Optional
+import numpy as np
+from database_dummy import db
+import config
+
+# Keeps identifiers like "RE-2023-001", "5.2" or "user@mail.de" parts together
+TOKEN_PATTERN = re.compile(r'\w+(?:[./-]\w+)*')
+
+# Term frequencies are stored as uint16
+MAX_TERM_FREQUENCY = 65535
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase lexical tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Incremental BM25 inverted index with array-backed postings"""
+
+    def __init__(self, k1: float = None, b: float = None):
+        self.k1 = config.BM25_K1 if k1 is None else k1
+        self.b = config.BM25_B if b is None else b
+        self.chunk_ids = array('q')   # document index -> chunk_id
+        self.doc_lengths = array('I')  # document index -> token count
+        self.total_length = 0
+        self.postings = {}  # {term: (array('I') doc indices, array('H') term frequencies)}
+
+    @property
+    def size(self) -> int:
+        return len(self.chunk_ids)
+
+    def add_document(self, chunk_id: int, text: str):
+        """Add one chunk to the index"""
+        doc_index = len(self.chunk_ids)
+        tokens = tokenize(text)
+
+        frequencies = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+
+        for term, frequency in frequencies.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array('I'), array('H'))
+            posting[0].append(doc_index)
+            posting[1].append(min(frequency, MAX_TERM_FREQUENCY))
+
+        self.chunk_ids.append(chunk_id)
+        self.doc_lengths.append(len(tokens))
+        self.total_length += len(tokens)
+
+    def search(self, query: str, k: int = 5, exclude: set = None,
+               allow: Callable[[int], bool] = None) -> List[Tuple[int, float]]:
+        """
+        Score documents against the query terms, skipping chunk_ids in exclude (tombstones)
+        and, if given, chunk_ids for which allow(chunk_id) is false (PDFs outside the search scope)
+        Returns: List of (chunk_id, score) tuples, best first
+        """
+        if self.size == 0:
+            return []
+
+        doc_count = self.size
+        avg_length = self.total_length / doc_count or 1.0
+        # Copies instead of views, so concurrent add_document() calls can still grow the arrays
+        doc_lengths = np.array(self.doc_lengths, dtype=np.uint32)
+        scores = np.zeros(doc_count, dtype=np.float32)
+
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            docs = np.array(posting[0], dtype=np.intp)
+            frequencies = np.array(posting[1], dtype=np.float32)
+            doc_frequency = len(docs)
+            idf = math.log(1 + (doc_count - doc_frequency + 0.5) / (doc_frequency + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[docs] / avg_length)
+            scores[docs] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+        matched = np.flatnonzero(scores)
+        if allow is not None:
+            # Only matching documents are checked, before the top-k cut so k allowed hits remain
+            matched = matched[np.fromiter((allow(self.chunk_ids[i]) for i in matched), dtype=bool, count=len(matched))]
+        if len(matched) == 0:
+            return []
+        fetch_k = k + len(exclude) if exclude else k
+        if len(matched) > fetch_k:
+            matched = matched[np.argpartition(-scores[matched], fetch_k - 1)[:fetch_k]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+        results = [(self.chunk_ids[i], float(scores[i])) for i in matched]
+        if exclude:
+            results = [result for result in results if result[0] not in exclude]
+        return results[:k]
+
+    def save(self, path: str):
+        """Save index as flat (CSR) numpy arrays"""
+        terms = list(self.postings.keys())
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(self.postings[term][0])
+
+        posting_docs = np.empty(offsets[-1], dtype=np.uint32)
+        posting_freqs = np.empty(offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(terms):
+            docs, freqs = self.postings[term]
+            posting_docs[offsets[i]:offsets[i + 1]] = np.frombuffer(docs, dtype=np.uint32)
+            posting_freqs[offsets[i]:offsets[i + 1]] = np.frombuffer(freqs, dtype=np.uint16)
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                chunk_ids=np.frombuffer(self.chunk_ids, dtype=np.int64),
+                doc_lengths=np.frombuffer(self.doc_lengths, dtype=np.uint32),
+                terms=np.frombuffer("\n".join(terms).encode('utf-8'), dtype=np.uint8),
+                offsets=offsets,
+                posting_docs=posting_docs,
+                posting_freqs=posting_freqs
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Load index saved with save()"""
+        index = cls()
+        with np.load(path) as data:
+            index.chunk_ids.frombytes(data['chunk_ids'].astype(np.int64).tobytes())
+            index.doc_lengths.frombytes(data['doc_lengths'].astype(np.uint32).tobytes())
+            terms_blob = data['terms'].tobytes().decode('utf-8')
+            offsets = data['offsets']
+            posting_docs = data['posting_docs']
+            posting_freqs = data['posting_freqs']
+
+        index.total_length = int(np.frombuffer(index.doc_lengths, dtype=np.uint32).sum())
+        terms = terms_blob.split("\n") if terms_blob else []
+        for i, term in enumerate(terms):
+            docs = array('I')
+            freqs = array('H')
+            docs.frombytes(posting_docs[offsets[i]:offsets[i + 1]].tobytes())
+            freqs.frombytes(posting_freqs[offsets[i]:offsets[i + 1]].tobytes())
+            index.postings[term] = (docs, freqs)
+        return index
+
+
+class LexicalIndexManager:
+    """Manages per-PDF and global BM25 indices on disk"""
+
+    def __init__(self):
+        self._cache = {}  # {index_path: (mtime, BM25Index)}
+        os.makedirs(config.FAISS_INDEX_DIR, exist_ok=True)
+
+    def _index_path(self, pdf_id: int = None) -> str:
+        if pdf_id:
+            return os.path.join(config.FAISS_INDEX_DIR, f"bm25_{pdf_id}.npz")
+        return os.path.join(config.FAISS_INDEX_DIR, "bm25_global.npz")
+
+    def create_index(self, pdf_id: int = None) -> BM25Index:
+        """Build BM25 index from database chunks"""
+        index = BM25Index()
+        chunks = db.get_chunks_by_pdf(pdf_id) if pdf_id else db.get_all_chunks()
+        for chunk_id, chunk_data in chunks:
+            index.add_document(chunk_id, chunk_data['text_chunk'])
+        return index
+
+    def save_index(self, index: BM25Index, pdf_id: int = None):
+        """Save BM25 index to disk"""
+        path = self._index_path(pdf_id)
+        index.save(path)
+        self._cache[path] = (os.path.getmtime(path), index)
+
+    def load_index(self, pdf_id: int = None) -> Optional[BM25Index]:
+        """Load BM25 index from disk, reusing the in-memory copy while the file is unchanged"""
+        path = self._index_path(pdf_id)
+        if not os.path.exists(path):
+            return None
+        mtime = os.path.getmtime(path)
+        cached = self._cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        index = BM25Index.load(path)
+        self._cache[path] = (mtime, index)
+        return index
+
+    def has_index(self, pdf_id: int = None) -> bool:
+        return os.path.exists(self._index_path(pdf_id))
+    
+    def delete_index(self, pdf_id: int = None):
+        """Remove a saved BM25 index"""
+        path = self._index_path(pdf_id)
+        self._cache.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    
+    def add_pdf_chunks(self, pdf_id: int, chunks: List[dict], update_global: bool = True):
+        """
+        Index the chunks of a newly ingested PDF
+        chunks: List of dicts with chunk_id and text
+        """
+        pdf_index = BM25Index()
+        for chunk in chunks:
+            pdf_index.add_document(chunk['chunk_id'], chunk['text'])
+        self.save_index(pdf_index, pdf_id)
+        if update_global:
+            self.add_to_global_index(chunks)
+
+    def add_to_global_index(self, chunks: List[dict]):
+        """Append chunks to the global index instead of rebuilding it"""
+        if not chunks:
+            return
+        global_index = self.load_index()
+        if global_index is None:
+            global_index = self.create_index()
+        else:
+            for chunk in chunks:
+                global_index.add_document(chunk['chunk_id'], chunk['text'])
+        self.save_index(global_index)
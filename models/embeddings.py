@@ -1,51 +1,59 @@
 import os
-import json
-from typing import Tuple, List, Optional
+import threading
+from typing import Callable, Tuple, List, Optional
 import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
 from database_dummy import db
+from models.index_bundle import (bundle_name, delete_bundle, migrate_legacy_bundles, model_index_dir, read_bundle,
+                                 read_manifest, write_bundle)
+from models.vector_codec import decode_vector, encode_vector
+from models.hierarchical_index import HierarchicalIndex, read_hierarchy_manifest
 import config
 
 class EmbeddingManager:
-    """Manages embeddings and FAISS indices"""
+    """Manages the embeddings and FAISS indices of one embedding model"""
     
-    def __init__(self):
-        self.model = SentenceTransformer(config.EMBEDDING_MODEL)
+    def __init__(self, model_name: str = None):
+        self.model_name = model_name or config.EMBEDDING_MODEL
+        self.model = SentenceTransformer(self.model_name)
         self.embedding_dim = self.model.get_sentence_embedding_dimension()
-        os.makedirs(config.FAISS_INDEX_DIR, exist_ok=True)
+        # Indices of different models live side by side, one directory per model
+        self.index_dir = model_index_dir(self.model_name)
+        os.makedirs(self.index_dir, exist_ok=True)
+        migrate_legacy_bundles()
+        self._pca = None
+        self._pca_lock = threading.Lock()
+        self._pca_too_small_at = None  # corpus version at which the corpus was too small for the PCA
     
     def generate_embedding(self, text: str) -> np.ndarray:
-        """Generate embedding for a single text"""
-        return self.model.encode(text, convert_to_numpy=True)
+        """Generate unit-length embedding for a single text"""
+        return self.model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
     
     def generate_embeddings_batch(self, texts: List[str]) -> np.ndarray:
-        """Generate embeddings for multiple texts"""
-        return self.model.encode(texts, convert_to_numpy=True)
+        """Generate unit-length embeddings for multiple texts"""
+        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
     
     def save_embedding_to_db(self, chunk_id: int, embedding: np.ndarray):
-        """Save embedding vector to database"""
-        db.insert_embedding(chunk_id, embedding)
+        """Save embedding vector to database, compressed per VECTOR_STORAGE"""
+        db.insert_embedding(chunk_id, encode_vector(embedding), self.model_name)
     
     def load_embeddings_from_db(self, pdf_id: int = None) -> Tuple[np.ndarray, List[int]]:
         """
         Load embeddings from database
         Returns: (embeddings_array, chunk_ids_list)
         """
-        results = db.get_embeddings_by_pdf(pdf_id)
+        results = db.get_embeddings_by_pdf(pdf_id, self.model_name)
         
         embeddings = []
         chunk_ids = []
         
         for embedding_id, chunk_id, vector in results:
-            # Vector is already a numpy array from dummy DB
-            if isinstance(vector, list):
-                vector = np.array(vector)
-            embeddings.append(vector)
+            embeddings.append(decode_vector(vector))
             chunk_ids.append(chunk_id)
         
         if embeddings:
-            return np.array(embeddings), chunk_ids
+            return np.array(embeddings, dtype=np.float32), chunk_ids
         return np.array([]), []
     
     def create_faiss_index(self, pdf_id: int = None) -> Tuple[Optional[faiss.Index], List[int]]:
@@ -55,55 +63,211 @@ class EmbeddingManager:
         if len(embeddings) == 0:
             return None, []
         
-        index = faiss.IndexFlatL2(self.embedding_dim)
-        index.add(embeddings.astype('float32'))
-        
-        return index, chunk_ids
+        return self.index_from_vectors(embeddings), chunk_ids
     
-    def save_faiss_index(self, index: faiss.Index, chunk_ids: List[int], pdf_id: int = None):
-        """Save FAISS index to disk"""
-        if pdf_id:
-            index_path = os.path.join(config.FAISS_INDEX_DIR, f"index_{pdf_id}.faiss")
-            ids_path = os.path.join(config.FAISS_INDEX_DIR, f"ids_{pdf_id}.json")
-        else:
-            index_path = os.path.join(config.FAISS_INDEX_DIR, "index_global.faiss")
-            ids_path = os.path.join(config.FAISS_INDEX_DIR, "ids_global.json")
-        
-        faiss.write_index(index, index_path)
-        with open(ids_path, 'w') as f:
-            json.dump(chunk_ids, f)
-    
-    def load_faiss_index(self, pdf_id: int = None) -> Tuple[Optional[faiss.Index], List[int]]:
-        """Load FAISS index from disk"""
-        if pdf_id:
-            index_path = os.path.join(config.FAISS_INDEX_DIR, f"index_{pdf_id}.faiss")
-            ids_path = os.path.join(config.FAISS_INDEX_DIR, f"ids_{pdf_id}.json")
+    def index_from_vectors(self, embeddings: np.ndarray) -> faiss.Index:
+        """Build a FAISS index from embedding vectors"""
+        # Inner product over unit vectors = cosine similarity
+        vectors = np.ascontiguousarray(embeddings, dtype='float32')
+        faiss.normalize_L2(vectors)
+        index = self._new_index()
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        return index
+    
+    def _new_index(self) -> faiss.Index:
+        """Empty index in the configured storage (VECTOR_STORAGE), behind the corpus PCA if there is one"""
+        pca = self.get_pca()
+        dim = pca.d_out if pca is not None else self.embedding_dim
+        if config.VECTOR_STORAGE == 'float16':
+            index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+        elif config.VECTOR_STORAGE == 'int8':
+            # One value range for all dimensions, trained per index with a margin for later appends
+            index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit_uniform,
+                                               faiss.METRIC_INNER_PRODUCT)
+            index.sq.rangestat = faiss.ScalarQuantizer.RS_minmax
+            index.sq.rangestat_arg = 0.2
         else:
-            index_path = os.path.join(config.FAISS_INDEX_DIR, "index_global.faiss")
-            ids_path = os.path.join(config.FAISS_INDEX_DIR, "ids_global.json")
-        
-        if not os.path.exists(index_path):
+            index = faiss.IndexFlatIP(dim)
+        if pca is None:
+            return index
+        # The query goes through the same transform; re-normalized so scores stay cosine similarities
+        index = faiss.IndexPreTransform(index)
+        index.prepend_transform(faiss.NormalizationTransform(dim, 2.0))
+        index.prepend_transform(pca)
+        return index
+    
+    def get_pca(self) -> Optional[faiss.VectorTransform]:
+        """
+        PCA to PCA_DIMENSIONS, trained once on this model's corpus and shared by all its indices
+        None if disabled or while the corpus has fewer than PCA_MIN_TRAINING_VECTORS vectors
+        """
+        if not config.PCA_DIMENSIONS or config.PCA_DIMENSIONS >= self.embedding_dim:
+            return None
+        if self._pca is not None:
+            return self._pca
+        path = os.path.join(self.index_dir, f"pca_{config.PCA_DIMENSIONS}.faiss")
+        with self._pca_lock:
+            if self._pca is None and os.path.exists(path):
+                self._pca = faiss.read_VectorTransform(path)
+            elif self._pca is None:
+                # Fewer vectors than dimensions give a rank-deficient PCA
+                min_vectors = max(config.PCA_MIN_TRAINING_VECTORS, self.embedding_dim)
+                # The corpus version counts every embedding ever stored, so it bounds the corpus size:
+                # no decoding the whole table on every upload until the corpus can be large enough
+                version = db.get_corpus_version(self.model_name)
+                if version < min_vectors or version == self._pca_too_small_at:
+                    return None
+                vectors, _ = self.load_embeddings_from_db()
+                if len(vectors) < min_vectors:
+                    self._pca_too_small_at = version
+                    return None
+                if len(vectors) > config.PCA_TRAINING_SAMPLE:
+                    sample = np.random.default_rng(0).choice(len(vectors), config.PCA_TRAINING_SAMPLE, replace=False)
+                    vectors = vectors[sample]
+                vectors = np.ascontiguousarray(vectors)
+                faiss.normalize_L2(vectors)
+                pca = faiss.PCAMatrix(self.embedding_dim, config.PCA_DIMENSIONS)
+                pca.train(vectors)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                faiss.write_VectorTransform(pca, tmp_path)
+                os.replace(tmp_path, path)
+                self._pca = pca
+        return self._pca
+    
+    def save_faiss_index(self, index: faiss.Index, chunk_ids: List[int], pdf_id: int = None):
+        """Save FAISS index to disk as a versioned bundle (see models/index_bundle.py)"""
+        write_bundle(self.index_dir, bundle_name(pdf_id), index, chunk_ids,
+                     model=self.model_name, corpus_version=db.get_corpus_version(self.model_name))
+    
+    def append_to_global_index(self, embeddings: np.ndarray, chunk_ids: List[int]):
+        """Add vectors of newly ingested chunks to the global index, if one exists"""
+        if len(chunk_ids) == 0:
+            return
+        # The chunks were stored in the caller's transaction: the index is current only if it
+        # was built right before them, otherwise it is left stale and rebuilt on the next question.
+        # A memory-mapped index is read-only, so a private copy is grown and saved as a new generation
+        global_index, global_chunk_ids = self.load_faiss_index(
+            corpus_version=db.get_corpus_version(self.model_name) - len(chunk_ids), mmap=False
+        )
+        if global_index is None:
+            # Built from the database on the first "Alle PDFs" question
+            return
+        vectors = np.ascontiguousarray(embeddings, dtype='float32')
+        faiss.normalize_L2(vectors)
+        global_index.add(vectors)
+        self.save_faiss_index(
+            global_index, np.concatenate([global_chunk_ids, np.asarray(chunk_ids, dtype=np.int64)])
+        )
+    
+    def load_faiss_index(self, pdf_id: int = None, corpus_version: int = None,
+                         mmap: bool = None) -> Tuple[Optional[faiss.Index], List[int]]:
+        """
+        Load FAISS index from disk
+        With INDEX_MMAP_ENABLED vectors and ids are memory-mapped instead of read: loading
+        takes well under a millisecond and all worker processes share one page-cache copy.
+        Bundles of another model, and a global index older than the embeddings table, are
+        rejected (caller rebuilds them)
+        """
+        if pdf_id is None and corpus_version is None:
+            corpus_version = db.get_corpus_version(self.model_name)
+        index, chunk_ids, _ = read_bundle(
+            self.index_dir, bundle_name(pdf_id), model=self.model_name,
+            dimension=self.embedding_dim, corpus_version=corpus_version, mmap=mmap
+        )
+        if index is not None and index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            # Index from before cosine scoring (L2), caller rebuilds it
             return None, []
-        
-        index = faiss.read_index(index_path)
-        with open(ids_path, 'r') as f:
-            chunk_ids = json.load(f)
-        
         return index, chunk_ids
     
+    def create_hierarchy(self) -> HierarchicalIndex:
+        """Build the document/page hierarchy of all PDFs from database embeddings"""
+        embeddings, chunk_ids = self.load_embeddings_from_db()
+        chunks = [db.get_chunk_by_id(chunk_id) for chunk_id in chunk_ids]
+        return HierarchicalIndex.from_chunks(
+            embeddings.reshape(-1, self.embedding_dim), chunk_ids,
+            [chunk['pdf_id'] for chunk in chunks], [chunk['page_number'] for chunk in chunks]
+        )
+    
+    def has_hierarchy(self) -> bool:
+        return read_hierarchy_manifest(self.index_dir) is not None
+    
+    def save_hierarchy(self, hierarchy: HierarchicalIndex):
+        hierarchy.save(self.index_dir, self.model_name, db.get_corpus_version(self.model_name))
+    
+    def load_hierarchy(self, corpus_version: int = None) -> Optional[HierarchicalIndex]:
+        """Saved hierarchy, None if there is none or it is older than the embeddings table"""
+        if corpus_version is None:
+            corpus_version = db.get_corpus_version(self.model_name)
+        return HierarchicalIndex.load(self.index_dir, self.model_name, corpus_version)
+    
+    def append_to_hierarchy(self, embeddings: np.ndarray, chunk_ids: List[int], pdf_ids: List[int],
+                            page_numbers: List[Optional[int]]):
+        """Add newly ingested PDFs to the saved hierarchy, if it is current (like append_to_global_index)"""
+        if len(chunk_ids) == 0:
+            return
+        hierarchy = self.load_hierarchy(db.get_corpus_version(self.model_name) - len(chunk_ids))
+        if hierarchy is None:
+            return
+        self.save_hierarchy(hierarchy.appended(
+            HierarchicalIndex.from_chunks(embeddings, chunk_ids, pdf_ids, page_numbers)
+        ))
+    
+    def delete_faiss_index(self, pdf_id: int = None):
+        """Remove a saved FAISS index"""
+        delete_bundle(self.index_dir, bundle_name(pdf_id))
+    
+    def global_index_size(self) -> int:
+        """Number of vectors in the saved global index (manifest only, 0 if there is none)"""
+        manifest = read_manifest(self.index_dir, bundle_name())
+        return manifest['count'] if manifest else 0
+    
     def search_similar(self, query_embedding: np.ndarray, index: faiss.Index, 
-                      chunk_ids: List[int], k: int = 3) -> List[int]:
-        """Search for similar chunks"""
+                      chunk_ids: List[int], k: int = 3, exclude: set = None,
+                      allow: Callable[[int], bool] = None) -> List[Tuple[int, float]]:
+        """
+        Search for similar chunks, skipping chunk_ids in exclude (tombstones) and, if given,
+        chunk_ids for which allow(chunk_id) is false (PDFs outside the search scope)
+        Returns: List of (chunk_id, cosine_score) tuples, best first
+        """
         if index is None or index.ntotal == 0:
             return []
         
-        query_embedding = query_embedding.reshape(1, -1).astype('float32')
-        distances, indices = index.search(query_embedding, k)
-        
-        result_chunk_ids = []
-        for idx in indices[0]:
-            if idx < len(chunk_ids):
-                result_chunk_ids.append(chunk_ids[idx])
+        query_embedding = np.ascontiguousarray(query_embedding.reshape(1, -1), dtype='float32')
+        faiss.normalize_L2(query_embedding)
+        # Over-fetch so k live results remain after dropping excluded ones
+        fetch_k = min(k + len(exclude), index.ntotal) if exclude else k
+        while True:
+            scores, indices = index.search(query_embedding, fetch_k)
+            
+            results = []
+            for idx, score in zip(indices[0], scores[0]):
+                # FAISS pads with -1 when k exceeds the number of vectors
+                if 0 <= idx < len(chunk_ids):
+                    chunk_id = int(chunk_ids[idx])
+                    if exclude and chunk_id in exclude:
+                        continue
+                    if allow is not None and not allow(chunk_id):
+                        continue
+                    results.append((chunk_id, float(score)))
+            
+            # Widen the search until k hits in scope are found or the whole index was searched
+            if allow is None or len(results) >= k or fetch_k >= index.ntotal:
+                return results[:k]
+            fetch_k = min(fetch_k * 4, index.ntotal)
+    
+    def filter_by_score(self, results: List[Tuple[int, float]], min_score: float = None,
+                        max_drop: float = None) -> List[Tuple[int, float]]:
+        """
+        Drop low-value hits: below min_score, or more than max_drop below the best hit
+        (adaptive k, a clear winner is not padded with weak neighbours)
+        """
+        min_score = config.MIN_SIMILARITY_SCORE if min_score is None else min_score
+        max_drop = config.MAX_SCORE_DROP if max_drop is None else max_drop
+        if not results:
+            return []
         
-        return result_chunk_ids
+        cutoff = max(min_score, results[0][1] - max_drop)
+        return [(chunk_id, score) for chunk_id, score in results if score >= cutoff]
 
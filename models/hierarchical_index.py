@@ -0,0 +1,233 @@
+"""
+Coarse-to-fine dense retrieval over many PDFs (HIERARCHICAL_SEARCH_ENABLED)
+
+Every PDF has a centroid of its chunk vectors and every page a centroid of the page's
+chunks. A question is scored against all document centroids, then against the page
+centroids of the best HIERARCHY_TOP_DOCS documents, and finally only the chunks of the
+best HIERARCHY_TOP_PAGES pages are scored. Chunks are stored grouped by document and page,
+so every level is a set of contiguous slices: the work per question grows with the number
+of documents instead of the number of chunks.
+
+Saved next to the model's FAISS bundles as .npy arrays (memory-mapped like the indices)
+with a manifest hierarchy.json, written and swapped the same way as index bundles.
+"""
+import os
+import json
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import config
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "hierarchy.json"
+# Pages without a page number (text files, old rows)
+NO_PAGE = -1
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top(scores: np.ndarray, n: int) -> np.ndarray:
+    """Positions of the n largest scores, best first"""
+    if n < len(scores):
+        positions = np.argpartition(-scores, n - 1)[:n]
+    else:
+        positions = np.arange(len(scores))
+    return positions[np.argsort(-scores[positions], kind='stable')]
+
+
+def _slices(offsets: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Row numbers of groups positions, group i owns rows offsets[i]:offsets[i + 1]"""
+    if len(positions) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate([np.arange(offsets[i], offsets[i + 1]) for i in positions])
+
+
+class HierarchicalIndex:
+    """Document and page centroids over chunk vectors grouped by document and page"""
+
+    ARRAYS = ('doc_ids', 'doc_centroids', 'doc_pages', 'page_numbers', 'page_centroids',
+              'page_chunks', 'chunk_ids', 'chunk_vectors')
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        # doc_pages / page_chunks are offsets: document i owns pages doc_pages[i]:doc_pages[i + 1]
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @property
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    @property
+    def size(self) -> int:
+        return len(self.chunk_ids)
+
+    @classmethod
+    def from_chunks(cls, vectors: np.ndarray, chunk_ids: Iterable[int], pdf_ids: Iterable[int],
+                    page_numbers: Iterable[Optional[int]], dtype=None) -> "HierarchicalIndex":
+        """Build from chunk vectors with the pdf_id and page number of every chunk"""
+        dtype = dtype or (np.float16 if config.VECTOR_STORAGE in ('float16', 'int8') else np.float32)
+        vectors = _unit(np.asarray(vectors, dtype=np.float32))
+        chunk_ids = np.asarray(list(chunk_ids), dtype=np.int64)
+        if len(chunk_ids) == 0:
+            return cls.empty(vectors.shape[-1] if vectors.ndim == 2 else 0, dtype)
+        pdf_ids = np.asarray(list(pdf_ids), dtype=np.int64)
+        pages = np.asarray([NO_PAGE if page is None else page for page in page_numbers], dtype=np.int64)
+        # Group by document, then page; chunks keep their order within a page
+        order = np.lexsort((np.arange(len(chunk_ids)), pages, pdf_ids))
+        vectors, chunk_ids, pdf_ids, pages = vectors[order], chunk_ids[order], pdf_ids[order], pages[order]
+
+        page_starts = np.flatnonzero(np.r_[True, (pdf_ids[1:] != pdf_ids[:-1]) | (pages[1:] != pages[:-1])])
+        page_chunks = np.r_[page_starts, len(chunk_ids)].astype(np.int64)
+        page_centroids = _unit(np.add.reduceat(vectors, page_starts, axis=0))
+        page_pdf_ids = pdf_ids[page_starts]
+
+        doc_starts = np.flatnonzero(np.r_[True, page_pdf_ids[1:] != page_pdf_ids[:-1]])
+        doc_pages = np.r_[doc_starts, len(page_starts)].astype(np.int64)
+        doc_centroids = _unit(np.add.reduceat(vectors, page_starts[doc_starts], axis=0))
+
+        return cls({
+            'doc_ids': page_pdf_ids[doc_starts],
+            'doc_centroids': doc_centroids,
+            'doc_pages': doc_pages,
+            'page_numbers': pages[page_starts],
+            'page_centroids': page_centroids,
+            'page_chunks': page_chunks,
+            'chunk_ids': chunk_ids,
+            'chunk_vectors': vectors.astype(dtype)
+        })
+
+    @classmethod
+    def empty(cls, dimension: int, dtype=np.float32) -> "HierarchicalIndex":
+        return cls({
+            'doc_ids': np.zeros(0, dtype=np.int64),
+            'doc_centroids': np.zeros((0, dimension), dtype=np.float32),
+            'doc_pages': np.zeros(1, dtype=np.int64),
+            'page_numbers': np.zeros(0, dtype=np.int64),
+            'page_centroids': np.zeros((0, dimension), dtype=np.float32),
+            'page_chunks': np.zeros(1, dtype=np.int64),
+            'chunk_ids': np.zeros(0, dtype=np.int64),
+            'chunk_vectors': np.zeros((0, dimension), dtype=dtype)
+        })
+
+    def appended(self, other: "HierarchicalIndex") -> "HierarchicalIndex":
+        """New index with the documents of other after these (other holds new PDFs only)"""
+        return HierarchicalIndex({
+            'doc_ids': np.concatenate([self.doc_ids, other.doc_ids]),
+            'doc_centroids': np.concatenate([self.doc_centroids, other.doc_centroids]),
+            'doc_pages': np.concatenate([self.doc_pages, other.doc_pages[1:] + self.doc_pages[-1]]),
+            'page_numbers': np.concatenate([self.page_numbers, other.page_numbers]),
+            'page_centroids': np.concatenate([self.page_centroids, other.page_centroids]),
+            'page_chunks': np.concatenate([self.page_chunks, other.page_chunks[1:] + self.page_chunks[-1]]),
+            'chunk_ids': np.concatenate([self.chunk_ids, other.chunk_ids]),
+            'chunk_vectors': np.concatenate([self.chunk_vectors, other.chunk_vectors.astype(self.chunk_vectors.dtype)])
+        })
+
+    def search(self, query: np.ndarray, k: int = 5, pdf_ids: Iterable[int] = None, top_docs: int = None,
+               top_pages: int = None) -> List[Tuple[int, float]]:
+        """
+        Top-k (chunk_id, cosine_score) among the chunks of the best pages of the best documents
+        pdf_ids restricts the search to these documents (the user's PDFs, live PDFs)
+        """
+        top_docs = top_docs or config.HIERARCHY_TOP_DOCS
+        top_pages = top_pages or config.HIERARCHY_TOP_PAGES
+        if self.size == 0:
+            return []
+        query = _unit(np.asarray(query, dtype=np.float32).reshape(-1))
+
+        doc_scores = self.doc_centroids @ query
+        if pdf_ids is not None:
+            allowed = np.isin(self.doc_ids, np.fromiter(pdf_ids, dtype=np.int64))
+            doc_scores = np.where(allowed, doc_scores, -np.inf)
+            top_docs = min(top_docs, int(allowed.sum()))
+        if top_docs <= 0:
+            return []
+        docs = _top(doc_scores, top_docs)
+
+        pages = _slices(self.doc_pages, docs)
+        pages = pages[_top(self.page_centroids[pages] @ query, top_pages)]
+
+        rows = _slices(self.page_chunks, pages)
+        scores = self.chunk_vectors[rows].astype(np.float32) @ query
+        best = _top(scores, k)
+        return [(int(self.chunk_ids[rows[i]]), float(scores[i])) for i in best]
+
+    def save(self, index_dir: str, model: str, corpus_version: int = None) -> dict:
+        """Write the arrays as a new generation and swap the manifest, returns the manifest"""
+        generation = uuid.uuid4().hex[:12]
+        files = {}
+        for name, array in self.arrays.items():
+            files[name] = f"hierarchy_{name}.{generation}.npy"
+            with open(os.path.join(index_dir, files[name]), 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+        manifest = {
+            'format': FORMAT_VERSION,
+            'generation': generation,
+            'model': model,
+            'documents': len(self.doc_ids),
+            'pages': len(self.page_numbers),
+            'count': self.size,
+            'corpus_version': corpus_version,
+            'files': files
+        }
+
+        previous = read_hierarchy_manifest(index_dir)
+        path = os.path.join(index_dir, MANIFEST_FILE)
+        tmp_path = f"{path}.{generation}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, path)
+        if previous:
+            _remove_files(index_dir, previous)
+        return manifest
+
+    @classmethod
+    def load(cls, index_dir: str, model: str = None, corpus_version: int = None,
+             mmap: bool = None) -> Optional["HierarchicalIndex"]:
+        """Load the saved hierarchy, None if it is missing, of another model or stale"""
+        if mmap is None:
+            mmap = config.INDEX_MMAP_ENABLED
+        # A concurrent save can remove the generation between reading the manifest and the arrays
+        for _ in range(2):
+            manifest = read_hierarchy_manifest(index_dir)
+            if manifest is None or manifest.get('format') != FORMAT_VERSION:
+                return None
+            if (model is not None and manifest['model'] != model) or \
+                    (corpus_version is not None and manifest['corpus_version'] != corpus_version):
+                return None
+            try:
+                return cls({
+                    name: np.load(os.path.join(index_dir, filename), mmap_mode='r' if mmap else None)
+                    for name, filename in manifest['files'].items()
+                })
+            except FileNotFoundError:
+                continue
+        return None
+
+
+def read_hierarchy_manifest(index_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _remove_files(index_dir: str, manifest: dict):
+    # Processes that still map the old generation keep their inode after the unlink
+    for filename in manifest['files'].values():
+        try:
+            os.remove(os.path.join(index_dir, filename))
+        except FileNotFoundError:
+            pass
+
+
+def delete_hierarchy(index_dir: str):
+    """Remove the saved hierarchy, the manifest first"""
+    manifest = read_hierarchy_manifest(index_dir)
+    if manifest is None:
+        return
+    os.remove(os.path.join(index_dir, MANIFEST_FILE))
+    _remove_files(index_dir, manifest)
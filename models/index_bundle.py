@@ -0,0 +1,242 @@
+"""
+Versioned on-disk FAISS index bundles
+
+Every embedding model has its own index directory (model_index_dir), a bundle is
+three files in it:
+  index_<name>.<generation>.faiss   FAISS index
+  ids_<name>.<generation>.npy       int64 chunk ids, row i of the index is chunk ids[i]
+  bundle_<name>.json                manifest: generation, model, dimension, count,
+                                    corpus version, file sizes and checksum
+
+Data files are never overwritten: a save writes a new generation and then swaps the
+manifest by atomic rename, so readers always see an index and ids that belong together.
+Bundles saved before per-model directories sit in FAISS_INDEX_DIR itself;
+migrate_legacy_bundles() moves them into the directory of their model.
+
+Loading validates the manifest against file sizes and the expected model, dimension
+and corpus version (all O(1)); the checksum is only read by verify_bundle().
+"""
+import os
+import re
+import json
+import uuid
+import hashlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+import numpy as np
+import faiss
+import config
+
+FORMAT_VERSION = 1
+
+# Memory-mapped loading of flat indices needs a recent faiss, older releases read the index into memory
+MMAP_AVAILABLE = hasattr(faiss, 'IO_FLAG_MMAP_IFC')
+
+
+def model_index_dir(model: str, root: str = None) -> str:
+    """Index directory of one embedding model below FAISS_INDEX_DIR"""
+    return os.path.join(root or config.FAISS_INDEX_DIR, re.sub(r'[^A-Za-z0-9._-]+', '__', model))
+
+
+def bundle_name(pdf_id: int = None) -> str:
+    return str(pdf_id) if pdf_id else "global"
+
+
+def manifest_path(index_dir: str, name: str) -> str:
+    return os.path.join(index_dir, f"bundle_{name}.json")
+
+
+def read_manifest(index_dir: str, name: str) -> Optional[dict]:
+    try:
+        with open(manifest_path(index_dir, name), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _file_checksum(path: str, digest) -> int:
+    size = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+            size += len(block)
+    return size
+
+
+def write_bundle(index_dir: str, name: str, index: faiss.Index, chunk_ids, model: str,
+                 corpus_version: int = None) -> dict:
+    """Write index and ids as a new generation and publish it, returns the manifest"""
+    generation = uuid.uuid4().hex[:12]
+    index_file = f"index_{name}.{generation}.faiss"
+    ids_file = f"ids_{name}.{generation}.npy"
+    chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+
+    with open(os.path.join(index_dir, ids_file), 'wb') as f:
+        np.save(f, chunk_ids)
+    faiss.write_index(index, os.path.join(index_dir, index_file))
+
+    digest = hashlib.sha256()
+    ids_bytes = _file_checksum(os.path.join(index_dir, ids_file), digest)
+    index_bytes = _file_checksum(os.path.join(index_dir, index_file), digest)
+    manifest = {
+        'format': FORMAT_VERSION,
+        'name': name,
+        'generation': generation,
+        'model': model,
+        'dimension': index.d,
+        'count': index.ntotal,
+        'corpus_version': corpus_version,
+        'index_file': index_file,
+        'ids_file': ids_file,
+        'index_bytes': index_bytes,
+        'ids_bytes': ids_bytes,
+        'checksum': digest.hexdigest(),
+        'created_at': datetime.now().isoformat(timespec='seconds')
+    }
+
+    previous = read_manifest(index_dir, name)
+    path = manifest_path(index_dir, name)
+    tmp_path = f"{path}.{generation}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+    # Processes that still map the old generation keep their inode after the unlink
+    if previous and previous['generation'] != generation:
+        for old_file in (previous['index_file'], previous['ids_file']):
+            try:
+                os.remove(os.path.join(index_dir, old_file))
+            except FileNotFoundError:
+                pass
+    return manifest
+
+
+def delete_bundle(index_dir: str, name: str):
+    """Remove a bundle, the manifest first so readers never see missing data files"""
+    manifest = read_manifest(index_dir, name)
+    if manifest is None:
+        return
+    for path in (manifest_path(index_dir, name),
+                 os.path.join(index_dir, manifest['index_file']),
+                 os.path.join(index_dir, manifest['ids_file'])):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def check_manifest(manifest: dict, index_dir: str, model: str = None, dimension: int = None,
+                   corpus_version: int = None) -> Optional[str]:
+    """Reason why the bundle cannot be used, None if it is valid"""
+    if manifest.get('format') != FORMAT_VERSION:
+        return f"format {manifest.get('format')}"
+    if model is not None and manifest['model'] != model:
+        return f"model {manifest['model']}"
+    if dimension is not None and manifest['dimension'] != dimension:
+        return f"dimension {manifest['dimension']}"
+    if corpus_version is not None and manifest['corpus_version'] != corpus_version:
+        return f"corpus version {manifest['corpus_version']}, expected {corpus_version}"
+    for file_key, size_key in (('index_file', 'index_bytes'), ('ids_file', 'ids_bytes')):
+        try:
+            size = os.path.getsize(os.path.join(index_dir, manifest[file_key]))
+        except FileNotFoundError:
+            return f"{manifest[file_key]} missing"
+        if size != manifest[size_key]:
+            return f"{manifest[file_key]} has {size} bytes, expected {manifest[size_key]}"
+    return None
+
+
+def read_bundle(index_dir: str, name: str, model: str = None, dimension: int = None,
+                corpus_version: int = None,
+                mmap: bool = None) -> Tuple[Optional[faiss.Index], List[int], Optional[dict]]:
+    """
+    Load a bundle, memory-mapped (read-only) with INDEX_MMAP_ENABLED unless mmap=False
+    Returns: (index, chunk_ids, manifest), or (None, [], None) if it is missing or stale
+    """
+    if mmap is None:
+        mmap = config.INDEX_MMAP_ENABLED
+    # A concurrent save can remove the generation between reading the manifest and opening it
+    for attempt in range(2):
+        manifest = read_manifest(index_dir, name)
+        if manifest is None:
+            return None, [], None
+        problem = check_manifest(manifest, index_dir, model, dimension, corpus_version)
+        if problem:
+            if attempt == 0 and problem.endswith('missing'):
+                continue
+            print(f"Index bundle {name} rejected: {problem}")
+            return None, [], None
+
+        index_path = os.path.join(index_dir, manifest['index_file'])
+        ids_path = os.path.join(index_dir, manifest['ids_file'])
+        try:
+            if mmap and MMAP_AVAILABLE:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC)
+            else:
+                index = faiss.read_index(index_path)
+            chunk_ids = np.load(ids_path, mmap_mode='r' if mmap else None)
+        except (FileNotFoundError, RuntimeError):
+            # faiss reports a missing file as RuntimeError
+            if attempt == 0:
+                continue
+            raise
+        return index, chunk_ids, manifest
+    return None, [], None
+
+
+def verify_bundle(index_dir: str, name: str) -> Optional[str]:
+    """Full check including the checksum (reads both files), None if the bundle is intact"""
+    manifest = read_manifest(index_dir, name)
+    if manifest is None:
+        return "manifest missing"
+    problem = check_manifest(manifest, index_dir)
+    if problem:
+        return problem
+    digest = hashlib.sha256()
+    _file_checksum(os.path.join(index_dir, manifest['ids_file']), digest)
+    _file_checksum(os.path.join(index_dir, manifest['index_file']), digest)
+    if digest.hexdigest() != manifest['checksum']:
+        return "checksum mismatch"
+    return None
+
+
+def list_bundles(index_dir: str) -> List[str]:
+    """Names of all bundles in index_dir"""
+    return sorted(
+        name[len('bundle_'):-len('.json')]
+        for name in os.listdir(index_dir)
+        if name.startswith('bundle_') and name.endswith('.json')
+    )
+
+
+def migrate_legacy_bundles(root: str = None) -> int:
+    """
+    Move bundles from FAISS_INDEX_DIR itself (layout before per-model directories) into the
+    directory of the model in their manifest, returns the number of bundles moved
+    """
+    root = root or config.FAISS_INDEX_DIR
+    if not os.path.isdir(root):
+        return 0
+    moved = 0
+    for name in list_bundles(root):
+        manifest = read_manifest(root, name)
+        if manifest is None:
+            continue
+        index_dir = model_index_dir(manifest['model'], root)
+        os.makedirs(index_dir, exist_ok=True)
+        if read_manifest(index_dir, name) is not None:
+            # Saved again since the upgrade, the legacy bundle is older
+            delete_bundle(root, name)
+            continue
+        try:
+            # Data files first, so a manifest in the model directory always finds its files
+            for file_key in ('index_file', 'ids_file'):
+                os.replace(os.path.join(root, manifest[file_key]), os.path.join(index_dir, manifest[file_key]))
+            os.replace(manifest_path(root, name), manifest_path(index_dir, name))
+        except FileNotFoundError:
+            # Another process is moving it; a half-moved bundle is rebuilt on first use
+            continue
+        moved += 1
+    if moved:
+        print(f"Moved {moved} index bundles into their model directories")
+    return moved
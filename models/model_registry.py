@@ -0,0 +1,62 @@
+import threading
+from typing import List, Optional
+from database_dummy import db
+from models.embeddings import EmbeddingManager
+import config
+
+
+class ModelRegistry:
+    """
+    Embedding models by name (loaded once per process) and which model serves which scope
+    The active model serves everything, except PDFs that a running migration has already
+    re-embedded: those are served by the migration target. The global scope switches when
+    the migration finishes.
+    """
+
+    def __init__(self):
+        self._managers = {}  # {model_name: EmbeddingManager}
+        self._lock = threading.Lock()
+
+    def active_model(self) -> str:
+        return db.embedding_model or config.EMBEDDING_MODEL
+
+    def migration_target(self) -> Optional[str]:
+        migration = db.model_migration
+        return migration['target'] if migration else None
+
+    def serving_models(self) -> List[str]:
+        """Models with indices in use: the active one and a migration target"""
+        target = self.migration_target()
+        return [self.active_model()] + ([target] if target else [])
+
+    def model_for_scope(self, pdf_id: int = None) -> str:
+        migration = db.model_migration
+        if pdf_id and migration and pdf_id in migration['migrated']:
+            return migration['target']
+        return self.active_model()
+
+    def register(self, manager: EmbeddingManager):
+        """Reuse an already loaded model"""
+        with self._lock:
+            self._managers.setdefault(manager.model_name, manager)
+
+    def get(self, model_name: str = None) -> EmbeddingManager:
+        """EmbeddingManager of model_name (default: the active model), loaded on first use"""
+        model_name = model_name or self.active_model()
+        with self._lock:
+            manager = self._managers.get(model_name)
+            if manager is None:
+                manager = self._managers[model_name] = EmbeddingManager(model_name)
+        return manager
+
+    def unload(self, model_name: str):
+        """Forget a retired model, it is freed once no caller holds it anymore"""
+        with self._lock:
+            self._managers.pop(model_name, None)
+
+    def for_scope(self, pdf_id: int = None) -> EmbeddingManager:
+        return self.get(self.model_for_scope(pdf_id))
+
+
+# Global instance
+model_registry = ModelRegistry()
@@ -1,6 +1,5 @@
-import PyPDF2
-import io
 from typing import List, Tuple
+from models.text_extraction import TextExtractor
 import config
 
 class PDFProcessor:
@@ -9,6 +8,7 @@ class PDFProcessor:
     def __init__(self):
         self.chunk_size = config.CHUNK_SIZE
         self.chunk_overlap = config.CHUNK_OVERLAP
+        self.text_extractor = TextExtractor()
     
     def _split_text(self, text: str) -> List[str]:
         """Split text into chunks with overlap"""
@@ -47,20 +47,12 @@ class PDFProcessor:
         
         return chunks
     
-    def extract_text_from_pdf(self, pdf_file) -> List[Tuple[str, int]]:
+    def extract_text_from_pdf(self, pdf_file, file_hash: str = None) -> List[Tuple[str, int]]:
         """
-        Extract text from PDF with page numbers
+        Extract text from PDF with page numbers (backend and page cache: models/text_extraction.py)
         Returns: List of (text, page_number) tuples
         """
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        pages_text = []
-        
-        for page_num, page in enumerate(pdf_reader.pages, start=1):
-            text = page.extract_text()
-            if text.strip():
-                pages_text.append((text, page_num))
-        
-        return pages_text
+        return self.text_extractor.extract(pdf_file, file_hash)
     
     def chunk_text(self, text: str, page_number: int = None) -> List[dict]:
         """
@@ -80,12 +72,12 @@ class PDFProcessor:
         
         return chunk_list
     
-    def process_pdf(self, pdf_file) -> List[dict]:
+    def process_pdf(self, pdf_file, file_hash: str = None) -> List[dict]:
         """
         Process PDF: extract text and create chunks
         Returns: List of chunks with text and page numbers
         """
-        pages = self.extract_text_from_pdf(pdf_file)
+        pages = self.extract_text_from_pdf(pdf_file, file_hash)
         all_chunks = []
         
         for page_text, page_num in pages:
@@ -0,0 +1,319 @@
+"""
+PDF text extraction backends (EXTRACTION_BACKEND) with an on-disk page cache
+  pypdf2  PyPDF2, pure Python (default)
+  pdfium  pypdfium2, native PDFium: several times faster, text in layout reading order
+Page texts are cached by file hash, backend and page number (EXTRACTION_CACHE_DIR), so a
+re-processed file is not extracted again. With EXTRACTION_PAGE_TIMEOUT pages are extracted
+in a helper process that is killed when a page takes too long: the page is skipped instead
+of stalling the ingest worker.
+"""
+import io
+import os
+import queue
+import shutil
+import hashlib
+import threading
+import multiprocessing
+from typing import Dict, List, Optional, Tuple
+import PyPDF2
+import config
+
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+
+class ExtractionBackend:
+    """Opens a PDF (file object, path or bytes) and extracts the text of single pages"""
+    name = None
+
+    def open(self, source):
+        raise NotImplementedError
+
+    def page_count(self, document) -> int:
+        raise NotImplementedError
+
+    def page_text(self, document, page_index: int) -> str:
+        raise NotImplementedError
+
+    def close(self, document):
+        pass
+
+
+class PyPDF2Backend(ExtractionBackend):
+    name = 'pypdf2'
+
+    def open(self, source):
+        return PyPDF2.PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+    def page_count(self, document) -> int:
+        return len(document.pages)
+
+    def page_text(self, document, page_index: int) -> str:
+        return document.pages[page_index].extract_text() or ''
+
+
+class PdfiumBackend(ExtractionBackend):
+    name = 'pdfium'
+
+    def open(self, source):
+        # A file on disk is read by PDFium itself instead of through Python
+        name = getattr(source, 'name', None)
+        if isinstance(name, str) and os.path.isfile(name):
+            source = name
+        return pdfium.PdfDocument(source)
+
+    def page_count(self, document) -> int:
+        return len(document)
+
+    def page_text(self, document, page_index: int) -> str:
+        page = document[page_index]
+        text_page = page.get_textpage()
+        try:
+            return text_page.get_text_bounded().replace('\r\n', '\n')
+        finally:
+            text_page.close()
+            page.close()
+
+    def close(self, document):
+        document.close()
+
+
+EXTRACTION_BACKENDS = {backend.name: backend for backend in (PyPDF2Backend, PdfiumBackend)}
+
+
+def get_backend(name: str = None) -> ExtractionBackend:
+    name = name or config.EXTRACTION_BACKEND
+    if name not in EXTRACTION_BACKENDS:
+        raise ValueError(f"Unknown extraction backend: {name}")
+    if name == PdfiumBackend.name and not PDFIUM_AVAILABLE:
+        print("Extraction Warning: pypdfium2 is not installed, using PyPDF2")
+        name = PyPDF2Backend.name
+    return EXTRACTION_BACKENDS[name]()
+
+
+def file_sha256(pdf_file) -> str:
+    """Hash of a file object's content, read in blocks"""
+    digest = hashlib.sha256()
+    pdf_file.seek(0)
+    for block in iter(lambda: pdf_file.read(1 << 20), b''):
+        digest.update(block)
+    pdf_file.seek(0)
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """Extracted page texts on disk: <cache_dir>/<backend>/<file hash>/<page>.txt"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _path(self, backend: str, file_hash: str, name: str) -> str:
+        return os.path.join(self.cache_dir, backend, file_hash, name)
+
+    def _read(self, path: str) -> Optional[str]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path: str, text: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def page_count(self, backend: str, file_hash: str) -> Optional[int]:
+        count = self._read(self._path(backend, file_hash, 'pages'))
+        return int(count) if count else None
+
+    def set_page_count(self, backend: str, file_hash: str, count: int):
+        self._write(self._path(backend, file_hash, 'pages'), str(count))
+
+    def get(self, backend: str, file_hash: str, page_number: int) -> Optional[str]:
+        return self._read(self._path(backend, file_hash, f"{page_number}.txt"))
+
+    def put(self, backend: str, file_hash: str, page_number: int, text: str):
+        self._write(self._path(backend, file_hash, f"{page_number}.txt"), text)
+
+    def delete(self, file_hash: str):
+        """Remove the cached pages of a file for every backend"""
+        for backend in EXTRACTION_BACKENDS:
+            shutil.rmtree(os.path.join(self.cache_dir, backend, file_hash), ignore_errors=True)
+
+
+# Seconds a new helper process may take to start, not counted against the page timeout
+WORKER_START_TIMEOUT = 30
+
+
+def _run_worker(conn):
+    """Helper process: opens one document at a time and extracts pages on request"""
+    conn.send(('ready', None))
+    backend = document = None
+    while True:
+        try:
+            command, argument = conn.recv()
+        except EOFError:
+            return
+        try:
+            if command == 'open':
+                if document is not None:
+                    backend.close(document)
+                backend_name, source = argument
+                backend = get_backend(backend_name)
+                document = backend.open(source)
+                conn.send(('ok', backend.page_count(document)))
+            elif command == 'page':
+                conn.send(('ok', backend.page_text(document, argument)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+class ExtractionWorker:
+    """One helper process, killed when a request runs over its timeout"""
+
+    def __init__(self):
+        # Spawn, not fork: the worker needs the PDF library only, not a copy of the embedding model
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_run_worker, args=(child_conn,), name='pdf-extraction', daemon=True)
+        self.process.start()
+        child_conn.close()
+        if not self.conn.poll(WORKER_START_TIMEOUT):
+            self.kill()
+            raise TimeoutError("extraction worker did not start")
+        self.conn.recv()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def request(self, command: str, argument, timeout: float):
+        self.conn.send((command, argument))
+        if not self.conn.poll(timeout):
+            self.kill()
+            raise TimeoutError(f"no result after {timeout:g}s")
+        status, result = self.conn.recv()
+        if status == 'error':
+            raise RuntimeError(result)
+        return result
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+# Idle helper processes, reused across documents (one per concurrent extraction)
+_idle_workers = queue.LifoQueue()
+
+
+def _acquire_worker() -> ExtractionWorker:
+    while True:
+        try:
+            worker = _idle_workers.get_nowait()
+        except queue.Empty:
+            return ExtractionWorker()
+        if worker.alive:
+            return worker
+
+
+def _release_worker(worker: Optional[ExtractionWorker]):
+    if worker is not None and worker.alive:
+        _idle_workers.put(worker)
+
+
+class TextExtractor:
+    """Page texts of a PDF through the configured backend, page cache and per-page timeout"""
+
+    def __init__(self, backend: str = None, cache_dir: str = None, page_timeout: float = None):
+        self.backend = get_backend(backend)
+        cache_dir = config.EXTRACTION_CACHE_DIR if cache_dir is None else cache_dir
+        self.cache = PageTextCache(cache_dir) if cache_dir else None
+        self.page_timeout = config.EXTRACTION_PAGE_TIMEOUT if page_timeout is None else page_timeout
+
+    def extract(self, pdf_file, file_hash: str = None) -> List[Tuple[str, int]]:
+        """
+        Extract text from PDF with page numbers, pages without text are left out
+        file_hash (file_sha256) saves hashing the file again if the caller has it
+        Returns: List of (text, page_number) tuples
+        """
+        if self.cache and file_hash is None:
+            file_hash = file_sha256(pdf_file)
+        texts = {}
+        page_count = self.cache.page_count(self.backend.name, file_hash) if self.cache else None
+        if page_count is not None:
+            for page_number in range(1, page_count + 1):
+                text = self.cache.get(self.backend.name, file_hash, page_number)
+                if text is not None:
+                    texts[page_number] = text
+        if page_count is None or len(texts) < page_count:
+            pdf_file.seek(0)
+            if self.page_timeout > 0:
+                page_count = self._extract_in_worker(pdf_file, texts, file_hash)
+            else:
+                page_count = self._extract_in_process(pdf_file, texts, file_hash)
+
+        return [
+            (texts[page_number], page_number)
+            for page_number in range(1, page_count + 1)
+            if texts.get(page_number, '').strip()
+        ]
+
+    def forget(self, file_hash: str):
+        """Drop the cached page texts of a file (its last PDF was deleted)"""
+        if self.cache:
+            self.cache.delete(file_hash)
+
+    def _store(self, texts: Dict[int, str], file_hash: Optional[str], page_number: int, text: str):
+        texts[page_number] = text
+        if self.cache:
+            self.cache.put(self.backend.name, file_hash, page_number, text)
+
+    def _extract_in_process(self, pdf_file, texts: Dict[int, str], file_hash: Optional[str]) -> int:
+        document = self.backend.open(pdf_file)
+        try:
+            page_count = self.backend.page_count(document)
+            if self.cache:
+                self.cache.set_page_count(self.backend.name, file_hash, page_count)
+            for page_number in range(1, page_count + 1):
+                if page_number not in texts:
+                    self._store(texts, file_hash, page_number, self.backend.page_text(document, page_number - 1))
+            return page_count
+        finally:
+            self.backend.close(document)
+
+    def _extract_in_worker(self, pdf_file, texts: Dict[int, str], file_hash: Optional[str]) -> int:
+        # A file on disk is opened by path in the worker, anything else is sent as bytes
+        name = getattr(pdf_file, 'name', None)
+        source = os.path.abspath(name) if isinstance(name, str) and os.path.isfile(name) else pdf_file.read()
+        worker = _acquire_worker()
+        try:
+            page_count = worker.request('open', (self.backend.name, source), self.page_timeout)
+            if self.cache:
+                self.cache.set_page_count(self.backend.name, file_hash, page_count)
+            for page_number in range(1, page_count + 1):
+                if page_number in texts:
+                    continue
+                if worker is None:
+                    # The last one was killed on a timeout, continue in a fresh process
+                    worker = _acquire_worker()
+                    worker.request('open', (self.backend.name, source), self.page_timeout)
+                try:
+                    text = worker.request('page', page_number - 1, self.page_timeout)
+                except TimeoutError as e:
+                    # Not cached: a later run gets another chance at the page
+                    print(f"Extraction Timeout: page {page_number} skipped, {e}")
+                    worker = None
+                    continue
+                except RuntimeError as e:
+                    print(f"Extraction Error: page {page_number} skipped, {e}")
+                    continue
+                self._store(texts, file_hash, page_number, text)
+            return page_count
+        finally:
+            _release_worker(worker)
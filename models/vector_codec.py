@@ -0,0 +1,50 @@
+"""
+Compressed storage of embedding vectors in the database (VECTOR_STORAGE)
+  float32  unchanged
+  float16  half precision, 2x smaller
+  int8     symmetric per-vector scalar quantization, 4x smaller
+"""
+import numpy as np
+import config
+
+
+class QuantizedVector:
+    """int8 codes with one scale factor, vector ~= codes * scale"""
+    __slots__ = ('codes', 'scale')
+
+    def __init__(self, codes: np.ndarray, scale: float):
+        self.codes = codes
+        self.scale = scale
+
+    def __getstate__(self):
+        return self.codes, self.scale
+
+    def __setstate__(self, state):
+        self.codes, self.scale = state
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + 8
+
+    def decode(self) -> np.ndarray:
+        return self.codes.astype(np.float32) * np.float32(self.scale)
+
+
+def encode_vector(vector: np.ndarray, storage: str = None):
+    """Compress a vector for storage"""
+    storage = storage or config.VECTOR_STORAGE
+    vector = np.asarray(vector, dtype=np.float32)
+    if storage == 'float16':
+        return vector.astype(np.float16)
+    if storage == 'int8':
+        peak = float(np.abs(vector).max())
+        scale = peak / 127 if peak else 1.0
+        return QuantizedVector(np.round(vector / scale).astype(np.int8), scale)
+    return vector
+
+
+def decode_vector(stored) -> np.ndarray:
+    """float32 vector from any stored form (also lists from older rows)"""
+    if isinstance(stored, QuantizedVector):
+        return stored.decode()
+    return np.asarray(stored, dtype=np.float32)
@@ -0,0 +1,100 @@
+import time
+from typing import Optional
+import httpx
+import config
+from services.upload_spool import UploadRejected
+
+
+class ApiClient:
+    """
+    Thin client for api/server.py
+    Offers the methods app.py uses from UserService, QAService and IngestService
+    The server takes the user from the session token of the login, the user_id
+    arguments are only kept for the same signatures as the local services
+    """
+
+    def __init__(self, base_url: str = None, timeout: float = None, token: str = None):
+        self.client = httpx.Client(
+            base_url=(base_url or config.API_BASE_URL).rstrip('/'),
+            timeout=timeout or config.API_TIMEOUT
+        )
+        self.token = None
+        if token:
+            self._set_token(token)
+
+    def _set_token(self, token: str):
+        self.token = token
+        self.client.headers['Authorization'] = f"Bearer {token}"
+
+    def _post(self, path: str, **kwargs) -> httpx.Response:
+        response = self.client.post(path, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def user_exists(self, username: str) -> bool:
+        response = self.client.get("/users", params={'username': username})
+        response.raise_for_status()
+        return response.json()['exists']
+
+    def create_user(self, username: str, password: str) -> Optional[int]:
+        response = self.client.post("/users", json={'username': username, 'password': password})
+        if response.status_code == 409:
+            return None
+        response.raise_for_status()
+        result = response.json()
+        self._set_token(result['token'])
+        return result['user_id']
+
+    def authenticate_user(self, username: str, password: str) -> Optional[int]:
+        response = self.client.post("/auth", json={'username': username, 'password': password})
+        if response.status_code == 401:
+            return None
+        response.raise_for_status()
+        result = response.json()
+        self._set_token(result['token'])
+        return result['user_id']
+
+    def list_pdfs(self, user_id: int) -> list:
+        """Get (pdf_id, filename, upload_date) of a user's PDFs, newest first"""
+        response = self.client.get("/pdfs")
+        response.raise_for_status()
+        return [(pdf['pdf_id'], pdf['filename'], pdf['upload_date']) for pdf in response.json()]
+
+    def process_pdf(self, pdf_file, filename: str, user_id: int, poll_interval: float = 0.5) -> Optional[int]:
+        """
+        Upload a PDF and wait until the server has ingested it
+        Returns: pdf_id of the new PDF
+        """
+        pdf_file.seek(0)
+        # Streamed from the file object, not read into memory first
+        response = self.client.post(
+            "/pdfs",
+            files={'file': (filename, pdf_file, 'application/pdf')}
+        )
+        if response.status_code == 413:
+            raise UploadRejected(response.json()['detail'])
+        response.raise_for_status()
+        job = response.json()
+
+        deadline = time.monotonic() + self.client.timeout.read
+        while job['status'] not in ('done', 'failed'):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Verarbeitung von {filename} dauert zu lange (Job {job['job_id']})")
+            time.sleep(poll_interval)
+            response = self.client.get(f"/jobs/{job['job_id']}")
+            response.raise_for_status()
+            job = response.json()
+
+        if job['status'] == 'failed':
+            raise RuntimeError(job['error'])
+        return job['pdf_id']
+
+    def delete_pdf(self, pdf_id: int, user_id: int) -> bool:
+        response = self.client.delete(f"/pdfs/{pdf_id}")
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    def ask_question(self, question: str, user_id: int, pdf_id: int = None) -> dict:
+        return self._post("/ask", json={'question': question, 'pdf_id': pdf_id}).json()
@@ -0,0 +1,50 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+import config
+
+
+class ChunkCache:
+    """Bounded, thread-safe LRU cache of hydrated chunk dicts"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries = OrderedDict()  # {chunk_id: chunk dict}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, chunk_ids: Iterable[int]) -> Dict[int, dict]:
+        """Get cached chunks (as copies) and mark them recently used"""
+        found = {}
+        with self._lock:
+            for chunk_id in chunk_ids:
+                chunk = self._entries.get(chunk_id)
+                if chunk is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(chunk_id)
+                self.hits += 1
+                found[chunk_id] = dict(chunk)
+        return found
+
+    def put_many(self, chunks: List[dict]):
+        """Add chunks, evicting the least recently used ones beyond capacity"""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            for chunk in chunks:
+                self._entries[chunk['chunk_id']] = dict(chunk)
+                self._entries.move_to_end(chunk['chunk_id'])
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate_pdf(self, pdf_id: int):
+        """Drop all cached chunks of a PDF"""
+        with self._lock:
+            for chunk_id in [cid for cid, chunk in self._entries.items() if chunk['pdf_id'] == pdf_id]:
+                del self._entries[chunk_id]
+
+
+# Global instance, IngestService.delete_pdf drops the chunks of deleted PDFs
+chunk_cache = ChunkCache(config.CHUNK_CACHE_SIZE)
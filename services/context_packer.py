@@ -0,0 +1,168 @@
+import re
+from typing import List, Optional, Tuple
+import config
+
+# Try to import tiktoken for exact token counts, but make it optional
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Splits text into sentence/line segments for duplicate detection
+SEGMENT_PATTERN = re.compile(r'(?<=[.!?])\s+|\n+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Segments shorter than this are never treated as duplicates (e.g. "Tel.", "1.")
+MIN_DUPLICATE_SEGMENT = 20
+
+# Overlaps shorter than this are not trusted when merging neighbours
+MIN_MERGE_OVERLAP = 20
+
+
+class ContextPacker:
+    """Packs retrieved chunks into a token-bounded prompt context"""
+
+    def __init__(self, token_budget: int = None, model: str = None):
+        self.token_budget = token_budget or config.CONTEXT_TOKEN_BUDGET
+        self.max_overlap = config.CHUNK_OVERLAP
+        self.encoding = None
+        if TIKTOKEN_AVAILABLE:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model or config.OPENAI_MODEL)
+            except Exception:
+                try:
+                    self.encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    self.encoding = None
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens in text (exact with tiktoken, estimated otherwise)"""
+        if not text:
+            return 0
+        if self.encoding:
+            return len(self.encoding.encode(text))
+        # Rough estimate: ~4 characters per token
+        return (len(text) + 3) // 4
+
+    def _truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        """Cut text down to at most max_tokens tokens"""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding:
+            return self.encoding.decode(self.encoding.encode(text)[:max_tokens])
+        return text[:max_tokens * 4]
+
+    def _overlap_length(self, left: str, right: str) -> int:
+        """Length of the longest suffix of left that is a prefix of right"""
+        limit = min(len(left), len(right), self.max_overlap)
+        for size in range(limit, MIN_MERGE_OVERLAP - 1, -1):
+            if left.endswith(right[:size]):
+                return size
+        return 0
+
+    def _merge_neighbours(self, chunks: List[dict]) -> List[dict]:
+        """
+        Merge chunks that are consecutive on the same page into one passage
+        Returns: List of passages ordered by their best relevance rank
+        """
+        groups = {}
+        for rank, chunk in enumerate(chunks):
+            key = (chunk.get('pdf_id'), chunk.get('page_number'))
+            groups.setdefault(key, []).append((rank, chunk))
+
+        passages = []
+        for members in groups.values():
+            members.sort(key=lambda m: (m[1].get('chunk_index') is None, m[1].get('chunk_index') or 0))
+            current = None
+            for rank, chunk in members:
+                chunk_index = chunk.get('chunk_index')
+                if (current is not None and chunk_index is not None
+                        and current['last_index'] is not None
+                        and chunk_index == current['last_index'] + 1):
+                    overlap = self._overlap_length(current['text'], chunk['text'])
+                    if overlap:
+                        current['text'] += chunk['text'][overlap:]
+                    else:
+                        current['text'] += " " + chunk['text']
+                    current['last_index'] = chunk_index
+                    current['rank'] = min(current['rank'], rank)
+                    current['chunk_ids'].append(chunk.get('chunk_id'))
+                    continue
+                if current is not None:
+                    passages.append(current)
+                current = {
+                    'text': chunk['text'],
+                    'rank': rank,
+                    'last_index': chunk_index,
+                    'chunk_ids': [chunk.get('chunk_id')]
+                }
+            if current is not None:
+                passages.append(current)
+
+        passages.sort(key=lambda p: p['rank'])
+        return passages
+
+    def _strip_duplicates(self, text: str, seen: set) -> Tuple[str, set]:
+        """
+        Remove segments of text that were already emitted in an earlier passage
+        Returns: (stripped_text, new_segments)
+        """
+        segments = [s for s in SEGMENT_PATTERN.split(text) if s and s.strip()]
+        kept = []
+        new_segments = set()
+        removed = False
+        for segment in segments:
+            normalized = WHITESPACE_PATTERN.sub(' ', segment).strip().lower()
+            if len(normalized) >= MIN_DUPLICATE_SEGMENT:
+                if normalized in seen or normalized in new_segments:
+                    removed = True
+                    continue
+                new_segments.add(normalized)
+            kept.append(segment.strip())
+        if not removed:
+            return text, new_segments
+        return ' '.join(kept), new_segments
+
+    def pack(self, chunks: List[dict], token_budget: Optional[int] = None) -> dict:
+        """
+        Build prompt context from chunks ordered by relevance
+        Returns: dict with context, tokens, chunk_ids and dropped passage count
+        """
+        budget = token_budget or self.token_budget
+        separator_tokens = self.count_tokens("\n\n")
+
+        parts = []
+        used_chunk_ids = []
+        used_tokens = 0
+        dropped = 0
+        seen = set()
+
+        for passage in self._merge_neighbours(chunks):
+            text, new_segments = self._strip_duplicates(passage['text'], seen)
+            text = text.strip()
+            if not text:
+                dropped += 1
+                continue
+
+            cost = self.count_tokens(text) + (separator_tokens if parts else 0)
+            if used_tokens + cost > budget:
+                if parts:
+                    # Skip, a smaller less relevant passage may still fit
+                    dropped += 1
+                    continue
+                # Always keep at least the most relevant passage
+                text = self._truncate_to_tokens(text, budget)
+                cost = self.count_tokens(text)
+
+            parts.append(text)
+            seen.update(new_segments)
+            used_chunk_ids.extend(passage['chunk_ids'])
+            used_tokens += cost
+
+        return {
+            'context': "\n\n".join(parts),
+            'tokens': used_tokens,
+            'chunk_ids': used_chunk_ids,
+            'dropped': dropped
+        }
@@ -0,0 +1,244 @@
+import re
+import threading
+from typing import List, Tuple, Optional
+from services.metrics import metrics
+
+# Confidence levels for extracted field candidates
+HIGH_CONFIDENCE = 1.0
+LOW_CONFIDENCE = 0.5
+
+# Field patterns (compiled once at import time)
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+STREET_SUFFIXES = r'(?:straße|str\.|weg|platz|allee|ring|gasse|damm|ufer)'
+ADDRESS_PATTERN = re.compile(
+    r'([A-ZÄÖÜ][a-zäöüß]+' + STREET_SUFFIXES + r'\s+\d+[a-z]?[,\s]+)?(\d{5})\s+([A-ZÄÖÜ][a-zäöüß]+(?:stadt|dorf|hausen)?)',
+    re.IGNORECASE
+)
+FULL_ADDRESS_PATTERN = re.compile(
+    r'[A-ZÄÖÜ][a-zäöüß]+' + STREET_SUFFIXES + r'\s+\d+[a-z]?[,\s]+\d{5}\s+[A-ZÄÖÜ][a-zäöüß]+',
+    re.IGNORECASE
+)
+STREET_PATTERN = re.compile(r'[A-ZÄÖÜ][a-zäöüß]+' + STREET_SUFFIXES + r'\s+\d+[a-z]?', re.IGNORECASE)
+
+# Cheap necessary conditions for the address patterns above, checked first to skip
+# their backtracking scan over texts without any address
+POSTCODE_HINT_PATTERN = re.compile(r'\d{5}\s+[A-ZÄÖÜ]', re.IGNORECASE)
+STREET_HINT_PATTERN = re.compile(STREET_SUFFIXES + r'\s+\d', re.IGNORECASE)
+
+PHONE_LABELLED_PATTERN = re.compile(
+    r'\b(?:telefon|tel|mobil|handy|fon|phone)\b\.?\s*(?:nr\.?|nummer)?\s*[:.]?\s*(\+?\d[\d /()-]{5,}\d)',
+    re.IGNORECASE
+)
+PHONE_PATTERN = re.compile(r'(?<![\w+])(\+\d{2}[\d /()-]{6,}\d)')
+
+DATE_VALUE = r'(\d{1,2}\.\s?\d{1,2}\.\s?(?:\d{4}|\d{2})|\d{1,2}\.\s?[A-ZÄÖÜ][a-zäöü]+\s+\d{4})'
+BIRTHDATE_LABELLED_PATTERN = re.compile(
+    r'(?:geboren\s+am|geboren|geburtsdatum|geburtstag|geb\.)\s*[:.]?\s*' + DATE_VALUE,
+    re.IGNORECASE
+)
+
+NAME_LABELLED_PATTERN = re.compile(
+    r'\b(?i:name)\s*:\s*([A-ZÄÖÜ][a-zäöüß]+(?:[ -][A-ZÄÖÜ][a-zäöüß]+){1,2})'
+)
+PROFESSION_LABELLED_PATTERN = re.compile(
+    r'\b(?:beruf|berufsbezeichnung|position|tätigkeit)\s*:\s*([^\n.,;:]{3,60})',
+    re.IGNORECASE
+)
+
+# Stricter question patterns: the fast path only answers unambiguous questions
+FAST_PATH_QUESTION_PATTERNS = {
+    "email": re.compile(r'e-?mail', re.IGNORECASE),
+    "address": re.compile(r'\b(?:adresse|anschrift|wohne|wohnort|wohnhaft)\b', re.IGNORECASE),
+    "phone": re.compile(r'\b(?:telefon\w*|handy\w*|mobil\w*|tel\.?)(?:\s|\?|$)', re.IGNORECASE),
+    "birthdate": re.compile(r'\b(?:geburtsdatum|geburtstag|geboren)\b', re.IGNORECASE),
+    "name": re.compile(r'\b(?:name|vorname|nachname|heiße)\b', re.IGNORECASE),
+    "profession": re.compile(r'\b(?:beruf|position|berufsbezeichnung|tätigkeit)\b', re.IGNORECASE),
+}
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class FieldExtractor:
+    """Rule-based extraction of structured fields (email, phone, address, ...)"""
+
+    @staticmethod
+    def extract_email(text: str) -> List[Tuple[str, float]]:
+        """Extract email candidates"""
+        return [(m.group(0).strip(), HIGH_CONFIDENCE) for m in EMAIL_PATTERN.finditer(text)]
+
+    @staticmethod
+    def extract_phone(text: str) -> List[Tuple[str, float]]:
+        """Extract phone candidates, labelled numbers are trusted most"""
+        candidates = [(m.group(1).strip(), HIGH_CONFIDENCE) for m in PHONE_LABELLED_PATTERN.finditer(text)]
+        labelled = {value for value, _ in candidates}
+        for m in PHONE_PATTERN.finditer(text):
+            value = m.group(1).strip()
+            if value not in labelled:
+                candidates.append((value, LOW_CONFIDENCE))
+        return candidates
+
+    @staticmethod
+    def extract_address(text: str) -> List[Tuple[str, float]]:
+        """Extract address candidates, street + PLZ + city is trusted most"""
+        if not STREET_HINT_PATTERN.search(text):
+            return []
+        candidates = []
+        if POSTCODE_HINT_PATTERN.search(text):
+            candidates = [(m.group(0).strip(), HIGH_CONFIDENCE) for m in FULL_ADDRESS_PATTERN.finditer(text)]
+        if not candidates:
+            candidates = [(m.group(0).strip(), LOW_CONFIDENCE) for m in STREET_PATTERN.finditer(text)]
+        return candidates
+
+    @staticmethod
+    def extract_birthdate(text: str) -> List[Tuple[str, float]]:
+        """Extract birthdate candidates following a birth label"""
+        return [(m.group(1).strip(), HIGH_CONFIDENCE) for m in BIRTHDATE_LABELLED_PATTERN.finditer(text)]
+
+    @staticmethod
+    def extract_name(text: str) -> List[Tuple[str, float]]:
+        """Extract name candidates following a "Name:" label"""
+        return [(m.group(1).strip(), HIGH_CONFIDENCE) for m in NAME_LABELLED_PATTERN.finditer(text)]
+
+    @staticmethod
+    def extract_profession(text: str) -> List[Tuple[str, float]]:
+        """Extract profession candidates following a "Beruf:"/"Position:" label"""
+        return [(m.group(1).strip(), HIGH_CONFIDENCE) for m in PROFESSION_LABELLED_PATTERN.finditer(text)]
+
+    @classmethod
+    def extract(cls, field_type: str, text: str) -> List[Tuple[str, float]]:
+        """
+        Extract candidates for one field type
+        Returns: List of (value, confidence) tuples in text order
+        """
+        extractor = FIELD_EXTRACTORS.get(field_type)
+        if extractor is None:
+            return []
+        return extractor(text)
+
+    @classmethod
+    def build_field_index(cls, chunks: List[dict]) -> dict:
+        """
+        Extract all high-confidence fields of a document once at ingest
+        Returns: {field_type: [(value, chunk_id, page_number)]}, deduplicated by value
+        """
+        field_index = {}
+        for field_type, extractor in FIELD_EXTRACTORS.items():
+            entries = []
+            seen = set()
+            for chunk in chunks:
+                for value, confidence in extractor(chunk['text']):
+                    normalized = cls.normalize(value)
+                    if confidence < HIGH_CONFIDENCE or normalized in seen:
+                        continue
+                    seen.add(normalized)
+                    entries.append((value, chunk['chunk_id'], chunk.get('page_number')))
+            if entries:
+                field_index[field_type] = entries
+        return field_index
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        """Normalize a value for comparing candidates"""
+        return WHITESPACE_PATTERN.sub(' ', value).strip().lower()
+
+
+FIELD_EXTRACTORS = {
+    "email": FieldExtractor.extract_email,
+    "phone": FieldExtractor.extract_phone,
+    "address": FieldExtractor.extract_address,
+    "birthdate": FieldExtractor.extract_birthdate,
+    "name": FieldExtractor.extract_name,
+    "profession": FieldExtractor.extract_profession,
+}
+
+
+class FastPathStats:
+    """Thread-safe counters for the extractive fast path"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.hits = 0
+        self.fast_path_ms = 0.0
+        self.llm_calls = 0
+        self.llm_ms = 0.0
+
+    def record_attempt(self, hit: bool, elapsed_ms: float):
+        """Record one fast path attempt"""
+        with self._lock:
+            self.attempts += 1
+            self.fast_path_ms += elapsed_ms
+            if hit:
+                self.hits += 1
+
+    def record_llm_call(self, latency_ms: float):
+        """Record latency of an LLM call, used to estimate savings"""
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_ms += latency_ms
+
+    def snapshot(self) -> dict:
+        """Current hit rate and estimated latency saved"""
+        with self._lock:
+            avg_llm_ms = self.llm_ms / self.llm_calls if self.llm_calls else 0.0
+            avg_fast_ms = self.fast_path_ms / self.attempts if self.attempts else 0.0
+            return {
+                'attempts': self.attempts,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.attempts if self.attempts else 0.0,
+                'avg_fast_path_ms': avg_fast_ms,
+                'avg_llm_ms': avg_llm_ms,
+                'latency_saved_ms': self.hits * max(avg_llm_ms - avg_fast_ms, 0.0)
+            }
+
+    def to_prometheus(self) -> str:
+        """Hit rate and estimated latency saved in the Prometheus text format"""
+        snapshot = self.snapshot()
+        metrics_text = [
+            ('pdf_faq_fast_path_attempts_total', 'counter', 'Questions tried on the extractive fast path.',
+             snapshot['attempts']),
+            ('pdf_faq_fast_path_hits_total', 'counter', 'Questions answered by the fast path without the LLM.',
+             snapshot['hits']),
+            ('pdf_faq_fast_path_hit_rate', 'gauge', 'Share of fast path attempts that were answered.',
+             f"{snapshot['hit_rate']:.6f}"),
+            ('pdf_faq_fast_path_latency_saved_seconds', 'gauge', 'Estimated LLM latency saved by fast path answers.',
+             f"{snapshot['latency_saved_ms'] / 1000:.6f}"),
+        ]
+        lines = []
+        for name, metric_type, help_text, value in metrics_text:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+        return '\n'.join(lines) + '\n'
+
+
+def is_fast_path_question(question: str, question_type: str) -> bool:
+    """Check whether a question clearly asks for one structured field"""
+    question_pattern = FAST_PATH_QUESTION_PATTERNS.get(question_type)
+    return question_pattern is not None and question_pattern.search(question) is not None
+
+
+def find_fast_path_answer(question: str, question_type: str, relevant_chunks: List[dict],
+                          max_chunks: int) -> Optional[Tuple[str, dict]]:
+    """
+    Look for a single unambiguous high-confidence field value in the top chunks
+    Returns: (value, source_chunk) or None if the LLM should decide
+    """
+    if not is_fast_path_question(question, question_type):
+        return None
+
+    found = {}
+    for chunk in relevant_chunks[:max_chunks]:
+        for value, confidence in FieldExtractor.extract(question_type, chunk['text']):
+            if confidence < HIGH_CONFIDENCE:
+                continue
+            found.setdefault(FieldExtractor.normalize(value), (value, chunk))
+
+    # Several distinct values (e.g. two emails) are ambiguous
+    if len(found) != 1:
+        return None
+    return next(iter(found.values()))
+
+
+# Global instance, shared by all QAService instances (Streamlit creates one per rerun)
+fast_path_stats = FastPathStats()
+metrics.add_collector(fast_path_stats.to_prometheus)
@@ -0,0 +1,229 @@
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import numpy as np
+import config
+from database_dummy import db
+from models.pdf_processor import PDFProcessor
+from models.text_extraction import file_sha256
+from models.embeddings import EmbeddingManager
+from models.model_registry import model_registry
+from models.bm25_index import LexicalIndexManager
+from services.chunk_cache import chunk_cache
+from services.field_extractor import FieldExtractor
+from services.metrics import metrics
+from services.profiler import profiler
+
+# Index compaction runs in the background, one at a time per process
+_compaction_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='compaction')
+_compaction_lock = threading.Lock()
+
+
+class IngestService:
+    """Runs the ingest pipeline: extract, chunk, embed, store and index a PDF"""
+    
+    def __init__(self, embedding_manager: EmbeddingManager = None):
+        self.pdf_processor = PDFProcessor()
+        # Share the embedding model with QAService when possible, it is the largest object in memory
+        if embedding_manager is not None:
+            model_registry.register(embedding_manager)
+        self.lexical_index_manager = LexicalIndexManager()
+    
+    @property
+    def embedding_manager(self) -> EmbeddingManager:
+        """Manager of the active model, new PDFs are always embedded with it"""
+        return model_registry.get()
+    
+    def extract_chunks(self, pdf_file, file_hash: str = None) -> List[dict]:
+        """Extract page texts and split them into chunks"""
+        with metrics.span('ingest.extract'):
+            pages = self.pdf_processor.extract_text_from_pdf(pdf_file, file_hash)
+        
+        with metrics.span('ingest.chunk'):
+            chunks = []
+            for page_text, page_num in pages:
+                chunks.extend(self.pdf_processor.chunk_text(page_text, page_num))
+        
+        return chunks
+    
+    @metrics.timed('ingest.embed')
+    def embed_chunks(self, chunks: List[dict]):
+        """Generate embeddings for chunks, sets chunk['embedding'] and chunk['embedding_model'] on every chunk"""
+        if not chunks:
+            return
+        embedding_manager = self.embedding_manager
+        embeddings = embedding_manager.generate_embeddings_batch([chunk['text'] for chunk in chunks])
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk['embedding'] = embedding
+            chunk['embedding_model'] = embedding_manager.model_name
+    
+    def ensure_current_embeddings(self, chunks: List[dict]):
+        """
+        Re-embed chunks if a model migration switched the active model after embed_chunks()
+        Call inside the database transaction that stores them
+        """
+        active_model = model_registry.active_model()
+        stale = [chunk for chunk in chunks if chunk.get('embedding_model', active_model) != active_model]
+        if stale:
+            self.embed_chunks(stale)
+    
+    @metrics.timed('ingest.store')
+    def store_chunks(self, pdf_id: int, chunks: List[dict]):
+        """Save chunks and their embeddings to DB, sets chunk['chunk_id'] on every chunk"""
+        for chunk in chunks:
+            chunk['chunk_id'] = db.insert_chunk(
+                pdf_id, 
+                chunk['text'], 
+                chunk['chunk_index'], 
+                chunk.get('page_number')
+            )
+            if chunk.get('embedding') is not None:
+                embedding_manager = model_registry.get(chunk.get('embedding_model'))
+                embedding_manager.save_embedding_to_db(chunk['chunk_id'], chunk['embedding'])
+        
+        # Extract structured fields (emails, phones, addresses, dates) once per document
+        db.insert_field_index(pdf_id, FieldExtractor.build_field_index(chunks))
+    
+    @metrics.timed('ingest.index')
+    def build_indices(self, pdf_id: int, chunks: List[dict], update_global: bool = True):
+        """
+        Create and save the FAISS and BM25 indices for a PDF
+        With update_global=False the caller appends to the global indices itself (bulk ingest)
+        """
+        if chunks and all(chunk.get('embedding') is not None for chunk in chunks):
+            # Vectors are at hand, no need to scan the embeddings table
+            index = self.embedding_manager.index_from_vectors(np.stack([chunk['embedding'] for chunk in chunks]))
+            chunk_ids = [chunk['chunk_id'] for chunk in chunks]
+        else:
+            index, chunk_ids = self.embedding_manager.create_faiss_index(pdf_id)
+        if index is not None:
+            self.embedding_manager.save_faiss_index(index, chunk_ids, pdf_id)
+        
+        # Update BM25 indices for exact-term search
+        self.lexical_index_manager.add_pdf_chunks(pdf_id, chunks, update_global=False)
+        
+        if update_global:
+            self.update_global_indices(chunks)
+    
+    @metrics.timed('ingest.global_index')
+    def update_global_indices(self, chunks: List[dict]):
+        """Append stored chunks (with embeddings) to the global FAISS and BM25 indices"""
+        embedded = [chunk for chunk in chunks if chunk.get('embedding') is not None]
+        if embedded:
+            embeddings = np.stack([chunk['embedding'] for chunk in embedded])
+            chunk_ids = [chunk['chunk_id'] for chunk in embedded]
+            self.embedding_manager.append_to_global_index(embeddings, chunk_ids)
+            self.embedding_manager.append_to_hierarchy(
+                embeddings, chunk_ids,
+                [db.get_chunk_by_id(chunk_id)['pdf_id'] for chunk_id in chunk_ids],
+                [chunk.get('page_number') for chunk in embedded]
+            )
+        self.lexical_index_manager.add_to_global_index(chunks)
+    
+    def list_pdfs(self, user_id: int) -> list:
+        """Get (pdf_id, filename, upload_date) of a user's PDFs, newest first"""
+        return db.get_pdfs_by_user(user_id)
+    
+    @profiler.profiled('ingest')
+    @metrics.timed('ingest.total')
+    def process_pdf(self, pdf_file, filename: str, user_id: int) -> Optional[int]:
+        """
+        Process PDF: extract, chunk, embed, and save to DB
+        Returns: pdf_id of the new PDF
+        """
+        # Extraction and embedding need no database access and run outside the write lock
+        pdf_file.seek(0, os.SEEK_END)
+        size_bytes = pdf_file.tell()
+        pdf_file.seek(0)
+        # Key of the page text cache, kept on the PDF so deleting it can drop the cached pages
+        file_hash = file_sha256(pdf_file)
+        chunks = self.extract_chunks(pdf_file, file_hash)
+        self.embed_chunks(chunks)
+        
+        with db.transaction():
+            # Save PDF info to DB (the size counts against the user's upload quota)
+            pdf_id = db.insert_pdf(user_id, filename, size_bytes, file_hash)
+            
+            if not pdf_id:
+                return None
+            
+            self.ensure_current_embeddings(chunks)
+            self.store_chunks(pdf_id, chunks)
+            self.build_indices(pdf_id, chunks)
+        
+        return pdf_id
+    
+    def delete_pdf(self, pdf_id: int, user_id: int) -> bool:
+        """
+        Delete a PDF of user_id with its chunks, embeddings and indices
+        Its vectors stay in the global indices as tombstones (filtered at search time)
+        until a background compaction rebuilds them
+        Returns: False if the PDF does not exist or belongs to another user
+        """
+        with db.transaction():
+            pdf = db.get_pdf(pdf_id)
+            if pdf is None or pdf['user_id'] != user_id:
+                return False
+            chunk_ids = db.delete_pdf(pdf_id)
+            db.add_tombstones(chunk_ids)
+            file_hash = pdf.get('file_hash')
+            # The same file can be stored several times (other users, re-uploads), they share the cache
+            forget_pages = file_hash is not None and not db.file_hash_in_use(file_hash)
+        
+        for model in model_registry.serving_models():
+            model_registry.get(model).delete_faiss_index(pdf_id)
+        self.lexical_index_manager.delete_index(pdf_id)
+        chunk_cache.invalidate_pdf(pdf_id)
+        if forget_pages:
+            self.pdf_processor.text_extractor.forget(file_hash)
+        
+        if self.compaction_due():
+            _compaction_executor.submit(self._compact_in_background)
+        return True
+    
+    def compaction_due(self) -> bool:
+        """True once tombstones make up INDEX_COMPACTION_THRESHOLD of the global index"""
+        tombstones = len(db.tombstones)
+        if not tombstones:
+            return False
+        size = self.embedding_manager.global_index_size()
+        return size == 0 or tombstones / size >= config.INDEX_COMPACTION_THRESHOLD
+    
+    def _compact_in_background(self):
+        try:
+            self.compact_indices()
+        except Exception as e:
+            print(f"Compaction Error: {e}")
+            db.log_error(str(e), traceback.format_exc())
+    
+    @metrics.timed('ingest.compact')
+    def compact_indices(self) -> bool:
+        """
+        Rebuild the global FAISS and BM25 indices from the live corpus and clear the tombstones
+        Returns: False if another compaction is already running
+        """
+        if not _compaction_lock.acquire(blocking=False):
+            return False
+        try:
+            # Writers wait for the rebuild, so no chunk is stored between reading and clearing
+            with db.transaction():
+                tombstones = set(db.tombstones)
+                for model in model_registry.serving_models():
+                    embedding_manager = model_registry.get(model)
+                    if embedding_manager.has_hierarchy():
+                        embedding_manager.save_hierarchy(embedding_manager.create_hierarchy())
+                    if not embedding_manager.global_index_size():
+                        continue
+                    index, chunk_ids = embedding_manager.create_faiss_index()
+                    if index is None:
+                        embedding_manager.delete_faiss_index()
+                    else:
+                        embedding_manager.save_faiss_index(index, chunk_ids)
+                if self.lexical_index_manager.has_index():
+                    self.lexical_index_manager.save_index(self.lexical_index_manager.create_index())
+                db.clear_tombstones(tombstones)
+            return True
+        finally:
+            _compaction_lock.release()
@@ -0,0 +1,77 @@
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Iterable, Set, Tuple
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton that finds all keywords in a single pass over a text"""
+
+    def __init__(self, keywords: Iterable[str]):
+        # Distinct non-empty keywords, in first-seen order
+        self.keywords = [kw for kw in dict.fromkeys(keywords) if kw]
+
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for keyword_id, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._out[state] += (keyword_id,)
+
+        # Breadth-first construction of failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+        # Plain "contains any keyword" checks run faster in the C regex engine
+        if self.keywords:
+            alternation = '|'.join(re.escape(kw) for kw in sorted(self.keywords, key=len, reverse=True))
+            self._any_pattern = re.compile(alternation)
+        else:
+            self._any_pattern = None
+
+    def contains_any(self, text: str) -> bool:
+        """Check whether text contains at least one keyword"""
+        return self._any_pattern is not None and self._any_pattern.search(text) is not None
+
+    def find_all(self, text: str) -> Set[int]:
+        """
+        Find every keyword occurring in text, including overlapping ones
+        Returns: Set of keyword ids (indices into self.keywords)
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+@lru_cache(maxsize=256)
+def get_keyword_matcher(keywords: Tuple[str, ...]) -> KeywordMatcher:
+    """Get a cached matcher for a keyword tuple"""
+    return KeywordMatcher(keywords)
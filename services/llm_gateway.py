@@ -0,0 +1,339 @@
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Optional
+import config
+from services.metrics import metrics
+
+# The OpenAI SDK is the client for every backend, all of them speak the chat completions API
+try:
+    from openai import OpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+# Breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class LLMUnavailable(Exception):
+    """No answer from the LLM (circuit open, rate-limit queue full, retries exhausted), caller falls back"""
+
+
+class TokenBucket:
+    """Refills per_minute units per minute, holds at most one minute's worth (0 = unlimited)"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.available = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount units are available"""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing * 60 / self.capacity)
+
+    def take(self, amount: float):
+        if self.capacity:
+            self.available -= min(amount, self.capacity)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failed API calls; after the cooldown one trial call decides"""
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_owner = None  # thread running the half-open trial call
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._trial_owner is None:
+                self._trial_owner = threading.get_ident()
+                return True
+            return False
+
+    def end_trial(self):
+        """The calling thread's trial ended without a verdict (never reached the API), let the next one try"""
+        with self._lock:
+            if self._trial_owner == threading.get_ident():
+                self._trial_owner = None
+
+    def record(self, success: bool):
+        with self._lock:
+            # Only the trial's own result frees the slot, not a late one of a call admitted before
+            if self._trial_owner == threading.get_ident():
+                self._trial_owner = None
+            if success:
+                self.state = CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.failure_threshold and self.failures >= self.failure_threshold):
+                if self.state != OPEN:
+                    print(f"LLM circuit breaker open for {self.cooldown:g}s after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, 'status_code', None)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Retry-After header of a rate-limit response, in seconds"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _retryable(error: Exception) -> bool:
+    # No status code: timeout or connection error; 408/409/429 and 5xx are transient
+    status = _status_code(error)
+    return status is None or status in (408, 409, 429) or status >= 500
+
+
+class LLMBackend:
+    """An OpenAI-compatible chat completions endpoint and the limits to call it with (0 = unlimited)"""
+
+    def __init__(self, name: str, base_url: Optional[str], api_key: Optional[str], model: str,
+                 concurrency: int = 0, requests_per_minute: int = 0, tokens_per_minute: int = 0,
+                 timeout: float = None, extra_body: dict = None):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.concurrency = concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.timeout = config.LLM_TIMEOUT if timeout is None else timeout
+        self.extra_body = extra_body
+
+    def create_client(self):
+        # Retries are done by the gateway, which also sees rate limits and the circuit breaker
+        return OpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0)
+
+
+def _openai_backend() -> LLMBackend:
+    return LLMBackend('openai', config.OPENAI_BASE_URL, config.OPENAI_API_KEY, config.OPENAI_MODEL,
+                      concurrency=config.OPENAI_CONCURRENCY,
+                      requests_per_minute=config.LLM_REQUESTS_PER_MINUTE,
+                      tokens_per_minute=config.LLM_TOKENS_PER_MINUTE)
+
+
+def _local_backend() -> LLMBackend:
+    # cache_prompt: llama.cpp keeps the KV cache of the shared prompt prefix (system prompt) per slot
+    return LLMBackend('local', config.LOCAL_LLM_BASE_URL, config.LOCAL_LLM_API_KEY, config.LOCAL_LLM_MODEL,
+                      concurrency=config.LOCAL_LLM_CONCURRENCY, timeout=config.LOCAL_LLM_TIMEOUT,
+                      extra_body={'cache_prompt': True})
+
+
+LLM_BACKENDS = {'openai': _openai_backend, 'local': _local_backend}
+
+
+def get_llm_backend(name: str = None) -> LLMBackend:
+    name = name or config.LLM_BACKEND
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name}")
+    return LLM_BACKENDS[name]()
+
+
+def create_gateway(name: str = None) -> Optional["LLMGateway"]:
+    """Gateway to the configured backend, None if it cannot be used (no openai package or API key)"""
+    backend = get_llm_backend(name)
+    if not OPENAI_AVAILABLE or not backend.api_key:
+        return None
+    try:
+        return LLMGateway(backend.create_client(), backend)
+    except Exception as e:
+        print(f"LLM Backend Error: {e}")
+        return None
+
+
+_gateways = {}  # {backend name: LLMGateway}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(name: str = None) -> Optional["LLMGateway"]:
+    """Process-wide gateway per backend, so buckets, breaker and in-flight calls survive Streamlit reruns"""
+    name = name or config.LLM_BACKEND
+    with _gateways_lock:
+        if name not in _gateways:
+            gateway = create_gateway(name)
+            if gateway is None:
+                return None
+            _gateways[name] = gateway
+        return _gateways[name]
+
+
+class LLMGateway:
+    """
+    All chat completion calls go through here:
+      - identical requests in flight at the same time share one call (single flight)
+      - request and token buckets keep us under the OpenAI tier limits, callers queue
+        for up to LLM_QUEUE_TIMEOUT, a 429 pauses the buckets for its Retry-After
+      - at most backend.concurrency calls run at once (slots of a local server)
+      - every attempt has a timeout, transient errors are retried with jittered backoff
+      - a circuit breaker stops calling a failing API, callers get LLMUnavailable at once
+        and fall back to the local extractor
+    """
+
+    def __init__(self, client, backend: LLMBackend = None):
+        self.client = client
+        self.backend = backend or get_llm_backend()
+        self.model = self.backend.model
+        self.requests = TokenBucket(self.backend.requests_per_minute)
+        self.tokens = TokenBucket(self.backend.tokens_per_minute)
+        self._slots = threading.BoundedSemaphore(self.backend.concurrency) if self.backend.concurrency else None
+        self.breaker = CircuitBreaker(config.LLM_BREAKER_FAILURES, config.LLM_BREAKER_COOLDOWN)
+        self._paused_until = 0.0
+        self._bucket_lock = threading.Lock()
+        self._in_flight = {}  # {request key: Future}
+        self._in_flight_lock = threading.Lock()
+        self.stats = {'calls': 0, 'coalesced': 0, 'retries': 0, 'rate_limited': 0, 'failures': 0, 'rejected': 0}
+
+    def complete(self, messages: list, estimated_tokens: int = 0, **params):
+        """
+        chat.completions.create(model, messages, **params) with coalescing, rate limiting,
+        retries and the circuit breaker. estimated_tokens (prompt + completion) is charged
+        to the token bucket.
+        Raises: LLMUnavailable
+        """
+        key = hashlib.sha256(
+            json.dumps([self.model, messages, params], sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.stats['coalesced'] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(self._call(messages, estimated_tokens, params))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+        return future.result()
+
+    def _call(self, messages: list, estimated_tokens: int, params: dict):
+        if not self.breaker.allow():
+            self.stats['rejected'] += 1
+            raise LLMUnavailable("circuit breaker open")
+        try:
+            return self._attempts(messages, estimated_tokens, params)
+        finally:
+            # A trial that ended without a result (queue timeout, no slot, an error) must not block the next
+            self.breaker.end_trial()
+
+    def _attempts(self, messages: list, estimated_tokens: int, params: dict):
+        """The call with retries, Raises: LLMUnavailable"""
+        deadline = time.monotonic() + config.LLM_QUEUE_TIMEOUT
+        last_error = None
+        for attempt in range(config.LLM_MAX_RETRIES + 1):
+            if attempt:
+                # Calls admitted before the breaker opened stop retrying too
+                if self.breaker.state == OPEN:
+                    break
+                self.stats['retries'] += 1
+            self._acquire(estimated_tokens, deadline)
+            response, error = self._send(messages, params, deadline)
+            if error is None:
+                self.breaker.record(True)
+                return response
+            last_error = error
+            if not _retryable(error):
+                # A rejected request (400 context length, 404, 422) says nothing about the API's health
+                break
+            self.breaker.record(False)
+            if attempt == config.LLM_MAX_RETRIES:
+                break
+            delay = random.uniform(0, config.LLM_RETRY_BASE_DELAY * 2 ** attempt)
+            if _status_code(error) == 429:
+                self.stats['rate_limited'] += 1
+                delay = max(delay, _retry_after(error) or 0.0)
+                self._pause(delay)
+            if time.monotonic() + delay > deadline:
+                break
+            time.sleep(delay)
+
+        self.stats['failures'] += 1
+        raise LLMUnavailable(f"{type(last_error).__name__}: {last_error}")
+
+    def _send(self, messages: list, params: dict, deadline: float):
+        """One upstream call in a concurrency slot, returns (response, error)"""
+        if self._slots is not None:
+            with metrics.span('llm.queue_wait'):
+                acquired = self._slots.acquire(timeout=max(0.0, deadline - time.monotonic()))
+            if not acquired:
+                self.stats['rejected'] += 1
+                raise LLMUnavailable(f"all {self.backend.concurrency} {self.backend.name} slots busy")
+        if self.backend.extra_body:
+            params = {**params, 'extra_body': self.backend.extra_body}
+        self.stats['calls'] += 1
+        started = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model, messages=messages, timeout=self.backend.timeout, **params
+            )
+        except Exception as e:
+            metrics.observe('llm.call', (time.perf_counter() - started) * 1000, error=True)
+            return None, e
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+        metrics.observe('llm.call', (time.perf_counter() - started) * 1000)
+        return response, None
+
+    def _pause(self, seconds: float):
+        """Stop sending for seconds (the API told us to back off)"""
+        with self._bucket_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _acquire(self, estimated_tokens: int, deadline: float):
+        """Wait for a request slot and estimated_tokens, LLMUnavailable if that takes past deadline"""
+        while True:
+            with self._bucket_lock:
+                now = time.monotonic()
+                wait = max(self._paused_until - now,
+                           self.requests.wait_time(1, now),
+                           self.tokens.wait_time(estimated_tokens, now))
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(estimated_tokens)
+                    return
+            if now + wait > deadline:
+                self.stats['rejected'] += 1
+                raise LLMUnavailable("rate limit, request queue timed out")
+            with metrics.span('llm.queue_wait'):
+                time.sleep(min(wait, 0.25))
+
+    def snapshot(self) -> dict:
+        return {**self.stats, 'backend': self.backend.name, 'breaker': self.breaker.state}
@@ -0,0 +1,170 @@
+import os
+import functools
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+import config
+
+# Histogram bucket upper bounds in milliseconds (Prometheus "le" labels are exported in seconds)
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+METRIC_NAME = 'pdf_faq_stage_duration_seconds'
+ERROR_METRIC_NAME = 'pdf_faq_stage_errors_total'
+
+
+class Histogram:
+    """Latency histogram with fixed buckets plus a window of recent samples for percentiles"""
+
+    def __init__(self, window: int = None):
+        self.bucket_counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.errors = 0
+        self.recent = deque(maxlen=window or config.METRICS_WINDOW)
+
+    def observe(self, ms: float, error: bool = False):
+        self.count += 1
+        self.sum_ms += ms
+        self.errors += error
+        self.recent.append(ms)
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def percentile(self, fraction: float) -> float:
+        """Nearest-rank percentile over the recent window"""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+        return ordered[rank]
+
+
+class MetricsRegistry:
+    """In-process latency metrics per pipeline stage (thread-safe)"""
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+        self._collectors: List[Callable[[], str]] = []
+
+    def observe(self, stage: str, ms: float, error: bool = False):
+        """Record one duration for a stage"""
+        if not config.METRICS_ENABLED:
+            return
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(ms, error)
+        self._start_exporter()
+
+    def add_collector(self, collector: Callable[[], str]):
+        """Append the Prometheus text of collector() to every export (counters kept outside the registry)"""
+        self._collectors.append(collector)
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time the wrapped block as one stage, failed blocks are counted as errors"""
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(stage, (time.perf_counter() - started) * 1000, error)
+
+    def timed(self, stage: str):
+        """Decorator form of span for whole functions"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> List[dict]:
+        """
+        Summary per stage, sorted by stage name
+        Returns: List of dicts with stage, count, errors, mean_ms, p50_ms, p95_ms, p99_ms
+        """
+        with self._lock:
+            rows = []
+            for stage in sorted(self.histograms):
+                histogram = self.histograms[stage]
+                rows.append({
+                    'stage': stage,
+                    'count': histogram.count,
+                    'errors': histogram.errors,
+                    'mean_ms': histogram.sum_ms / histogram.count if histogram.count else 0.0,
+                    'p50_ms': histogram.percentile(0.50),
+                    'p95_ms': histogram.percentile(0.95),
+                    'p99_ms': histogram.percentile(0.99)
+                })
+            return rows
+
+    def to_prometheus(self) -> str:
+        """Render all histograms in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {METRIC_NAME} Duration of QA and ingest pipeline stages.",
+            f"# TYPE {METRIC_NAME} histogram"
+        ]
+        error_lines = [
+            f"# HELP {ERROR_METRIC_NAME} Pipeline stages that raised an exception.",
+            f"# TYPE {ERROR_METRIC_NAME} counter"
+        ]
+        with self._lock:
+            for stage in sorted(self.histograms):
+                histogram = self.histograms[stage]
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKETS_MS, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound / 1000:g}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {histogram.sum_ms / 1000:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {histogram.count}')
+                error_lines.append(f'{ERROR_METRIC_NAME}{{stage="{stage}"}} {histogram.errors}')
+        return '\n'.join(lines + error_lines) + '\n' + ''.join(collector() for collector in self._collectors)
+
+    def export(self, path: str):
+        """Write the Prometheus text to a file atomically (for the node_exporter textfile collector)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+    def _start_exporter(self):
+        """Start the periodic file export once if METRICS_EXPORT_PATH is configured"""
+        if self._exporter is not None or not config.METRICS_EXPORT_PATH:
+            return
+        with self._lock:
+            if self._exporter is not None:
+                return
+            self._exporter = threading.Thread(target=self._export_loop, name='metrics-export', daemon=True)
+            self._exporter.start()
+
+    def _export_loop(self):
+        while True:
+            time.sleep(config.METRICS_EXPORT_INTERVAL)
+            try:
+                self.export(config.METRICS_EXPORT_PATH)
+            except Exception as e:
+                print(f"Metrics Export Error: {e}")
+
+
+# Global metrics instance
+metrics = MetricsRegistry()
@@ -0,0 +1,170 @@
+import time
+import uuid
+import shutil
+import threading
+import traceback
+from datetime import datetime
+from typing import Callable, List
+from database_dummy import db
+from models.embeddings import EmbeddingManager
+from models.index_bundle import model_index_dir
+from models.model_registry import model_registry
+from services.metrics import metrics
+
+# Passes outside the write lock before the rest is migrated under it (PDFs uploaded meanwhile)
+MIGRATION_PASSES = 3
+# A migration whose run has not written progress for this long is taken as crashed and may be replaced
+MIGRATION_STALE_SECONDS = 600
+
+
+def _alive(migration: dict) -> bool:
+    """True while the run owning the shared migration state keeps writing progress"""
+    return migration is not None and time.time() - migration.get('heartbeat', 0) < MIGRATION_STALE_SECONDS
+
+
+def _owned(migration: dict, target_model: str, run_id: str) -> bool:
+    """The shared migration state still belongs to this run (not replaced by another process)"""
+    return migration is not None and migration['target'] == target_model and migration.get('run_id') == run_id
+
+
+class ModelMigration:
+    """
+    Re-embeds the corpus with another embedding model while the active model keeps serving
+    Each PDF switches to the new model as soon as its index is written. The global scope and
+    new uploads switch when all PDFs are done; then the old model's vectors and indices are dropped.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._lock = threading.Lock()
+        self.last_error = None
+
+    @property
+    def running(self) -> bool:
+        """A migration runs in this process or, by the shared state, in another one"""
+        if self._thread is not None and self._thread.is_alive():
+            return True
+        db.sync()
+        return _alive(db.model_migration)
+
+    def status(self) -> dict:
+        running = self.running
+        migration = db.model_migration
+        return {
+            'active_model': model_registry.active_model(),
+            'target_model': migration['target'] if migration else None,
+            'migrated_pdfs': len(migration['migrated']) if migration else 0,
+            'total_pdfs': len(db.get_all_pdf_ids()),
+            'running': running,
+            'error': self.last_error
+        }
+
+    def start(self, target_model: str) -> bool:
+        """Run the migration in a background thread, False if one is already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self.last_error = None
+            self._thread = threading.Thread(
+                target=self._run_in_background, args=(target_model,), name='model-migration', daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def _run_in_background(self, target_model: str):
+        try:
+            self.run(target_model)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Model Migration Error: {e}")
+            db.log_error(str(e), traceback.format_exc())
+
+    def run(self, target_model: str, progress: Callable[[int, int], None] = None):
+        """
+        Migrate to target_model and switch over (blocking), resumes an interrupted migration
+        Raises: RuntimeError if another process is running a migration
+        """
+        # Load the model first, a name that does not resolve must not leave a migration behind
+        target = model_registry.get(target_model)
+        run_id = uuid.uuid4().hex
+        with db.transaction():
+            if target_model == model_registry.active_model():
+                return
+            migration = db.model_migration
+            if _alive(migration):
+                raise RuntimeError(f"Migration to {migration['target']} is running in another process")
+            if migration and migration['target'] != target_model:
+                # Another target was left behind by a crashed run: its partial vectors are of no use
+                self._drop_model(migration['target'])
+                migration = None
+            if migration is None:
+                migration = {'target': target_model, 'migrated': set(), 'started_at': datetime.now()}
+            # Take over the (resumed) migration, a run that still writes would see it is no longer the owner
+            db.model_migration = {**migration, 'run_id': run_id, 'heartbeat': time.time()}
+
+        for _ in range(MIGRATION_PASSES):
+            pending = self._pending_pdfs()
+            if not pending:
+                break
+            for pdf_id in pending:
+                if not self._migrate_pdf(target, pdf_id, run_id):
+                    raise RuntimeError(f"Migration to {target_model} was taken over by another process")
+                if progress:
+                    progress(len(db.model_migration['migrated']), len(db.get_all_pdf_ids()))
+
+        with db.transaction():
+            for pdf_id in self._pending_pdfs():
+                if not self._migrate_pdf(target, pdf_id, run_id):
+                    raise RuntimeError(f"Migration to {target_model} was taken over by another process")
+            if not _owned(db.model_migration, target_model, run_id):
+                raise RuntimeError(f"Migration to {target_model} was taken over by another process")
+            index, chunk_ids = target.create_faiss_index()
+            if index is not None:
+                target.save_faiss_index(index, chunk_ids)
+            old_model = model_registry.active_model()
+            # Cutover: global scope and new uploads use the new model from here on
+            db.embedding_model = target_model
+            db.model_migration = None
+            self._drop_model(old_model)
+        model_registry.unload(old_model)
+
+    def _pending_pdfs(self) -> List[int]:
+        with db.transaction():
+            migration = db.model_migration
+            if migration is None:
+                return []
+            return [pdf_id for pdf_id in db.get_all_pdf_ids() if pdf_id not in migration['migrated']]
+
+    @metrics.timed('migration.pdf')
+    def _migrate_pdf(self, target: EmbeddingManager, pdf_id: int, run_id: str) -> bool:
+        """Embed one PDF with the target model and switch its scope over, False if the run lost the migration"""
+        with db.transaction():
+            chunks = db.get_chunks_by_pdf(pdf_id)
+        # The slow part runs outside the write lock (unless the caller holds it)
+        texts = [chunk_data['text_chunk'] for _, chunk_data in chunks]
+        vectors = target.generate_embeddings_batch(texts) if texts else []
+
+        with db.transaction():
+            if not _owned(db.model_migration, target.model_name, run_id):
+                # Replaced by another process: its target's directory may already be dropped
+                return False
+            db.model_migration['heartbeat'] = time.time()
+            if db.get_pdf(pdf_id) is None:
+                # Deleted meanwhile
+                return True
+            chunk_ids = [chunk_id for chunk_id, _ in chunks]
+            for chunk_id, vector in zip(chunk_ids, vectors):
+                target.save_embedding_to_db(chunk_id, vector)
+            if chunk_ids:
+                target.save_faiss_index(target.index_from_vectors(vectors), chunk_ids, pdf_id)
+            db.model_migration['migrated'].add(pdf_id)
+        return True
+
+    def _drop_model(self, model: str):
+        """Remove vectors and indices of a model that no longer serves (other processes keep open mappings)"""
+        db.delete_embeddings_by_model(model)
+        shutil.rmtree(model_index_dir(model), ignore_errors=True)
+
+
+# Global instance
+model_migration = ModelMigration()
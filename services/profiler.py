@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import uuid
+import random
+import cProfile
+import functools
+import threading
+from collections import Counter
+from contextlib import contextmanager
+import config
+
+
+class StackSampler:
+    """Samples the call stack of one thread at a fixed interval (collapsed-stack output)"""
+
+    def __init__(self, thread_id: int, interval_ms: float):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(frames))] += 1
+
+    def write(self, path: str):
+        """Write stacks in the collapsed format used by flamegraph.pl / speedscope"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    """Profiles a sampled fraction of requests and keeps the newest PROFILING_MAX_FILES files"""
+
+    def __init__(self):
+        # Only one cProfile can be active per process, concurrent requests skip profiling
+        self._cprofile_lock = threading.Lock()
+        self._retention_lock = threading.Lock()
+
+    def _should_sample(self) -> bool:
+        return config.PROFILING_ENABLED and random.random() < config.PROFILING_SAMPLE_RATE
+
+    @contextmanager
+    def profile(self, kind: str):
+        """Profile the wrapped block if this request is sampled"""
+        if not self._should_sample():
+            yield None
+            return
+
+        request_id = f"{time.strftime('%Y%m%d-%H%M%S')}_{kind}_{uuid.uuid4().hex[:8]}"
+        if config.PROFILING_MODE == 'sampling':
+            sampler = StackSampler(threading.get_ident(), config.PROFILING_SAMPLE_INTERVAL_MS)
+            sampler.start()
+            try:
+                yield request_id
+            finally:
+                sampler.stop()
+                self._write(request_id, '.collapsed', sampler.write)
+            return
+
+        if not self._cprofile_lock.acquire(blocking=False):
+            yield None
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool (debugger, coverage) is already active
+            self._cprofile_lock.release()
+            yield None
+            return
+        try:
+            yield request_id
+        finally:
+            profile.disable()
+            self._cprofile_lock.release()
+            self._write(request_id, '.pstats', profile.dump_stats)
+
+    def profiled(self, kind: str):
+        """Decorator form of profile"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.profile(kind):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _write(self, request_id: str, suffix: str, writer):
+        """Write one profile file and apply retention, never fails the request"""
+        try:
+            os.makedirs(config.PROFILING_DIR, exist_ok=True)
+            writer(os.path.join(config.PROFILING_DIR, request_id + suffix))
+            self._enforce_retention()
+        except Exception as e:
+            print(f"Profiler Error: {e}")
+
+    def _enforce_retention(self):
+        """Delete the oldest profile files beyond PROFILING_MAX_FILES"""
+        with self._retention_lock:
+            entries = [entry for entry in os.scandir(config.PROFILING_DIR)
+                       if entry.is_file() and entry.name.endswith(('.pstats', '.collapsed'))]
+            if len(entries) <= config.PROFILING_MAX_FILES:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - config.PROFILING_MAX_FILES]:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+# Global profiler instance
+profiler = RequestProfiler()
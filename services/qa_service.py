@@ -1,76 +1,302 @@
 import re
-from typing import List, Tuple, Optional
+import time
+from itertools import accumulate
+from typing import Callable, List, Tuple, Optional
 from database_dummy import db
-from models.embeddings import EmbeddingManager
+from models.model_registry import model_registry
+from models.bm25_index import LexicalIndexManager
+from services.context_packer import ContextPacker
+from services.chunk_cache import chunk_cache
+from services.reranker import Reranker
+from services.field_extractor import (
+    EMAIL_PATTERN, ADDRESS_PATTERN, STREET_PATTERN, POSTCODE_HINT_PATTERN, STREET_HINT_PATTERN,
+    FieldExtractor, fast_path_stats,
+    find_fast_path_answer, is_fast_path_question
+)
+from services.keyword_matcher import KeywordMatcher, get_keyword_matcher
+from services.llm_gateway import LLMUnavailable, get_gateway
+from services.metrics import metrics
+from services.profiler import profiler
+from services.shard_search import get_sharded_searcher
 import config
 
-# Try to import OpenAI, but make it optional
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+def _any_word_pattern(words: List[str]) -> re.Pattern:
+    """Compile a pattern matching any of the given substrings"""
+    return re.compile('|'.join(re.escape(word) for word in words))
+
+# Fixed prefix of every answer prompt: identical across questions, so the OpenAI API and
+# llama.cpp servers reuse its processed tokens (prompt caching); all variable parts follow it
+ANSWER_SYSTEM_PROMPT = """Du bist ein präziser Dokumenten-Assistent. Du extrahierst gezielt spezifische Informationen aus Dokumenten und gibst nur die direkte Antwort zurück.
+
+Du analysierst ein Dokument und beantwortest Fragen präzise.
+
+WICHTIG:
+- Suche gezielt nach der gesuchten Information im Dokumenteninhalt
+- Gib NUR die direkte Antwort zurück, keine Erklärungen
+- Wenn die Information nicht im Dokument steht, antworte: "Nicht im Dokument enthalten"
+- Sei präzise und kurz"""
+
+# Local extractor patterns and keyword tables (compiled once at import time)
+SENTENCE_SPLIT_PATTERN = re.compile(r'[.!?]\s+')
+EMAIL_QUESTION_PATTERN = _any_word_pattern(['email', 'e-mail', 'mail', 'e-mail-adresse', 'email-adresse'])
+ADDRESS_QUESTION_PATTERN = _any_word_pattern(['adresse', 'wohne', 'wohnort', 'wohnhaft'])
+EXTRACTION_KEYWORDS = [
+    (ADDRESS_QUESTION_PATTERN,
+     ('straße', 'str.', 'weg', 'platz', 'adresse', 'wohnort', 'wohne', 'wohnhaft', 'straße', 'strasse')),
+    (_any_word_pattern(['email', 'e-mail', 'mail']), ('@', 'email', 'e-mail', 'mail')),
+    (_any_word_pattern(['telefon', 'nummer', 'handy', 'mobil']),
+     ('telefon', 'tel.', 'mobil', 'handy', '+49', '+43', '+41')),
+    (_any_word_pattern(['geburt', 'geboren', 'geburtstag']), ('geboren', 'geburt', 'geburtstag', 'geb.')),
+    (_any_word_pattern(['name', 'heiße', 'heißt']), ('name', 'vorname', 'nachname')),
+    (_any_word_pattern(['beruf', 'arbeit', 'stelle', 'position']),
+     ('beruf', 'arbeit', 'position', 'stelle', 'tätigkeit')),
+]
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = None) -> List[int]:
+    """Merge ranked chunk id lists by summing 1 / (k + rank) per list"""
+    k = config.RRF_K if k is None else k
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)
 
 class QAService:
     """Handles question-answering logic"""
     
     def __init__(self):
-        self.embedding_manager = EmbeddingManager()
-        self.openai_client = None
-        if OPENAI_AVAILABLE and config.OPENAI_API_KEY:
-            try:
-                self.openai_client = OpenAI(api_key=config.OPENAI_API_KEY)
-            except Exception:
-                self.openai_client = None
+        # Model of the active scope at startup, find_relevant_chunks() picks the model per scope
+        self.embedding_manager = model_registry.get()
+        self.lexical_index_manager = LexicalIndexManager()
+        self.context_packer = ContextPacker()
+        self.chunk_cache = chunk_cache
+        self.reranker = Reranker() if config.RERANK_ENABLED else None
+        self.fast_path_stats = fast_path_stats
+        # LLM_BACKEND: OpenAI or a local OpenAI-compatible server, None without a usable backend
+        self.llm_gateway = get_gateway()
+        self.openai_client = self.llm_gateway.client if self.llm_gateway else None
     
     def get_chunk_text(self, chunk_id: int) -> dict:
         """Get chunk text and metadata from database"""
-        chunk = db.get_chunk_with_pdf_info(chunk_id)
-        if chunk:
-            return {
-                'chunk_id': chunk['chunk_id'],
-                'text': chunk['text_chunk'],
-                'page_number': chunk.get('page_number'),
-                'filename': chunk.get('filename')
-            }
-        return None
+        chunks = self.get_chunk_texts([chunk_id])
+        return chunks[0] if chunks else None
+    
+    def get_chunk_texts(self, chunk_ids: List[int]) -> List[dict]:
+        """
+        Get text and metadata of several chunks, in the order of chunk_ids
+        Served from the hot chunk cache, misses are fetched from the database in one call
+        """
+        cached = self.chunk_cache.get_many(chunk_ids)
+        missing = [chunk_id for chunk_id in chunk_ids if chunk_id not in cached]
+        
+        if missing:
+            fetched = []
+            for chunk in db.get_chunks_with_pdf_info(missing):
+                fetched.append({
+                    'chunk_id': chunk['chunk_id'],
+                    'pdf_id': chunk['pdf_id'],
+                    'chunk_index': chunk.get('chunk_index'),
+                    'text': chunk['text_chunk'],
+                    'page_number': chunk.get('page_number'),
+                    'filename': chunk.get('filename')
+                })
+            self.chunk_cache.put_many(fetched)
+            for chunk in fetched:
+                cached[chunk['chunk_id']] = chunk
+        
+        return [cached[chunk_id] for chunk_id in chunk_ids if chunk_id in cached]
     
-    def find_relevant_chunks(self, question: str, pdf_id: int = None, top_k: int = 5) -> List[dict]:
-        """Find relevant chunks using FAISS similarity search"""
-        # Generate query embedding
-        query_embedding = self.embedding_manager.generate_embedding(question)
+    def find_relevant_chunks(self, question: str, pdf_id: int = None, top_k: int = None,
+                             user_id: int = None) -> List[dict]:
+        """
+        Find relevant chunks using FAISS similarity search
+        With NEIGHBOUR_EXPANSION_ENABLED fewer hits (NEIGHBOUR_TOP_K) are retrieved and each is
+        followed by its neighbouring chunks
+        """
+        started = time.perf_counter()
+        expand = config.NEIGHBOUR_EXPANSION_ENABLED
+        if top_k is None:
+            top_k = config.NEIGHBOUR_TOP_K if expand else 5
+        rerank = self.reranker is not None and config.RERANK_ENABLED
         
-        # Load or create FAISS index
-        index, chunk_ids = self.embedding_manager.load_faiss_index(pdf_id)
+        # Search for similar chunks (a larger candidate pool when fusing with BM25 or re-ranking)
+        candidate_k = top_k
+        if config.HYBRID_SEARCH_ENABLED:
+            candidate_k = max(candidate_k, config.HYBRID_CANDIDATES)
+        if rerank:
+            candidate_k = max(candidate_k, config.RERANK_CANDIDATES)
         
-        if index is None:
-            # Create index if it doesn't exist
-            index, chunk_ids = self.embedding_manager.create_faiss_index(pdf_id)
-            if index is not None:
-                self.embedding_manager.save_faiss_index(index, chunk_ids, pdf_id)
+        # Generate query embedding with the model that serves this scope (changes during a model migration)
+        embedding_manager = model_registry.for_scope(pdf_id)
+        with metrics.span('qa.embed_query'):
+            query_embedding = embedding_manager.generate_embedding(question)
         
-        if index is None or len(chunk_ids) == 0:
-            return []
+        # PDFs a search over several PDFs is restricted to; the lexical leg uses the same scope
+        scope_pdf_ids = None
+        if config.SHARD_COUNT:
+            scope_pdf_ids = self._scope_pdf_ids(pdf_id, user_id)
+            dense_results = self._search_shards(embedding_manager, query_embedding, scope_pdf_ids, candidate_k)
+            if not dense_results:
+                return []
+        elif not pdf_id and config.HIERARCHICAL_SEARCH_ENABLED:
+            scope_pdf_ids = self._scope_pdf_ids(pdf_id, user_id)
+            dense_results = self._search_hierarchy(embedding_manager, query_embedding, scope_pdf_ids, candidate_k)
+        else:
+            if not pdf_id and user_id is not None:
+                # The global index holds every user's chunks
+                scope_pdf_ids = self._scope_pdf_ids(pdf_id, user_id)
+            # Load or create FAISS index
+            with metrics.span('qa.load_index'):
+                index, chunk_ids = embedding_manager.load_faiss_index(pdf_id)
+                
+                if index is None:
+                    # Create index if it doesn't exist
+                    index, chunk_ids = embedding_manager.create_faiss_index(pdf_id)
+                    if index is not None:
+                        embedding_manager.save_faiss_index(index, chunk_ids, pdf_id)
+            
+            if index is None or len(chunk_ids) == 0:
+                return []
+            
+            with metrics.span('qa.dense_search'):
+                # The global index still holds chunks of deleted PDFs until it is compacted
+                dense_results = embedding_manager.search_similar(
+                    query_embedding, index, chunk_ids, k=candidate_k,
+                    exclude=None if pdf_id else db.tombstones,
+                    allow=self._scope_filter(scope_pdf_ids) if scope_pdf_ids is not None else None
+                )
+        
+        # Drop irrelevant chunks before they reach the prompt
+        dense_results = embedding_manager.filter_by_score(dense_results)
+        dense_scores = dict(dense_results)
+        similar_chunk_ids = [chunk_id for chunk_id, _ in dense_results]
         
-        # Search for similar chunks
-        similar_chunk_ids = self.embedding_manager.search_similar(
-            query_embedding, index, chunk_ids, k=top_k
-        )
+        if config.HYBRID_SEARCH_ENABLED:
+            with metrics.span('qa.lexical_search'):
+                lexical_chunk_ids = self._search_lexical(
+                    question, pdf_id, candidate_k, None if pdf_id else scope_pdf_ids
+                )
+            similar_chunk_ids = reciprocal_rank_fusion([similar_chunk_ids, lexical_chunk_ids])
+        similar_chunk_ids = similar_chunk_ids[:candidate_k if rerank else top_k]
         
         # Get chunk texts
-        relevant_chunks = []
-        for chunk_id in similar_chunk_ids:
-            chunk = self.get_chunk_text(chunk_id)
-            if chunk:
-                relevant_chunks.append(chunk)
+        with metrics.span('qa.hydrate'):
+            relevant_chunks = self.get_chunk_texts(similar_chunk_ids)
+        for chunk in relevant_chunks:
+            chunk['score'] = dense_scores.get(chunk['chunk_id'])
+        
+        if rerank:
+            # Re-rank with the cross-encoder unless the latency budget is already spent
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with metrics.span('qa.rerank'):
+                reranked = self.reranker.rerank(
+                    question, relevant_chunks, min(top_k, config.RERANK_TOP_N),
+                    config.RERANK_LATENCY_BUDGET_MS - elapsed_ms
+                )
+            relevant_chunks = reranked if reranked is not None else relevant_chunks[:top_k]
+        
+        if expand:
+            with metrics.span('qa.expand_neighbours'):
+                relevant_chunks = self.expand_neighbours(relevant_chunks)
         
         return relevant_chunks
     
+    def expand_neighbours(self, chunks: List[dict], window: int = None, token_budget: int = None) -> List[dict]:
+        """
+        Add the chunks right before and after each hit on the same page, so answers that cross a
+        chunk boundary reach the prompt. Hits are expanded best first while the token budget lasts.
+        Neighbours follow the hits (score None); the context packer merges them with their hit.
+        """
+        window = config.NEIGHBOUR_WINDOW if window is None else window
+        budget = token_budget or config.NEIGHBOUR_TOKEN_BUDGET or config.CONTEXT_TOKEN_BUDGET
+        used_tokens = sum(self.context_packer.count_tokens(chunk['text']) for chunk in chunks)
+        seen = {chunk['chunk_id'] for chunk in chunks}
+        neighbours = []
+        
+        for chunk in chunks:
+            neighbour_ids = [
+                chunk_id for chunk_id in db.get_neighbour_chunk_ids(chunk['chunk_id'], window)
+                if chunk_id not in seen
+            ]
+            for neighbour in self.get_chunk_texts(neighbour_ids):
+                cost = self.context_packer.count_tokens(neighbour['text'])
+                if used_tokens + cost > budget:
+                    continue
+                used_tokens += cost
+                seen.add(neighbour['chunk_id'])
+                neighbour['score'] = None
+                neighbour['neighbour_of'] = chunk['chunk_id']
+                neighbours.append(neighbour)
+        
+        return chunks + neighbours
+    
+    def _scope_pdf_ids(self, pdf_id: int = None, user_id: int = None) -> List[int]:
+        """PDFs a question searches: one PDF, the user's PDFs or all (only live PDFs, deleted ones are skipped)"""
+        if pdf_id:
+            return [pdf_id]
+        if user_id is not None:
+            return [pdf[0] for pdf in db.get_pdfs_by_user(user_id)]
+        return db.get_all_pdf_ids()
+    
+    def _scope_filter(self, pdf_ids: List[int]) -> Callable[[int], bool]:
+        """Predicate for chunk_ids that belong to one of pdf_ids (filters hits of a global index)"""
+        allowed = set(pdf_ids)
+        return lambda chunk_id: (db.get_chunk_by_id(chunk_id) or {}).get('pdf_id') in allowed
+    
+    def _search_shards(self, embedding_manager, query_embedding, pdf_ids: List[int],
+                       k: int = 5) -> List[Tuple[int, float]]:
+        """Dense search over the per-PDF indices of pdf_ids on the shard processes"""
+        def rebuild(missing_pdf_id: int) -> bool:
+            # Shards only read indices, a PDF without one (lost, or from an older layout) is built here
+            index, chunk_ids = embedding_manager.create_faiss_index(missing_pdf_id)
+            if index is None:
+                return False
+            embedding_manager.save_faiss_index(index, chunk_ids, missing_pdf_id)
+            return True
+        
+        with metrics.span('qa.dense_search'):
+            return get_sharded_searcher().search(
+                query_embedding, pdf_ids, k, embedding_manager.model_name, rebuild
+            )
+    
+    def _search_hierarchy(self, embedding_manager, query_embedding, pdf_ids: List[int],
+                          k: int = 5) -> List[Tuple[int, float]]:
+        """Coarse-to-fine dense search over pdf_ids: documents, pages, chunks"""
+        with metrics.span('qa.load_index'):
+            hierarchy = embedding_manager.load_hierarchy()
+            if hierarchy is None:
+                hierarchy = embedding_manager.create_hierarchy()
+                embedding_manager.save_hierarchy(hierarchy)
+        
+        # Restricting to live PDFs also skips deleted ones until the next rebuild
+        with metrics.span('qa.dense_search'):
+            return hierarchy.search(query_embedding, k, pdf_ids=pdf_ids)
+    
+    def _search_lexical(self, question: str, pdf_id: int = None, k: int = 5,
+                        pdf_ids: List[int] = None) -> List[int]:
+        """Find chunks with exact term matches using the BM25 index, only in pdf_ids if given"""
+        index = self.lexical_index_manager.load_index(pdf_id)
+        if index is None:
+            # Create index if it doesn't exist
+            index = self.lexical_index_manager.create_index(pdf_id)
+            if index.size:
+                self.lexical_index_manager.save_index(index, pdf_id)
+        exclude = None if pdf_id else db.tombstones
+        # The global BM25 index holds every user's chunks
+        allow = self._scope_filter(pdf_ids) if pdf_ids is not None else None
+        results = index.search(question, k, exclude=exclude, allow=allow)
+        if not results:
+            return []
+        # Like dense hits (MAX_SCORE_DROP), hits far below the best one matched only common words
+        cutoff = results[0][1] * config.MIN_BM25_SCORE_RATIO
+        if not pdf_id:
+            cutoff = max(cutoff, config.MIN_BM25_SCORE)
+        return [chunk_id for chunk_id, score in results if score >= cutoff]
+    
     def _extract_email(self, text: str) -> str:
         """Extract email address from text using pattern matching"""
         # Email pattern: word characters, @, domain
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        match = re.search(email_pattern, text)
+        match = EMAIL_PATTERN.search(text)
         if match:
             return match.group(0).strip()
         return None
@@ -79,14 +305,12 @@ class QAService:
         """Extract address from text using pattern matching"""
         # Pattern: Street name + number, then PLZ + City
         # Look for patterns like "Musterstraße 123, 12345 Musterstadt"
-        address_pattern = r'([A-ZÄÖÜ][a-zäöüß]+(?:straße|str\.|weg|platz|allee|ring|gasse|damm|ufer)\s+\d+[a-z]?[,\s]+)?(\d{5})\s+([A-ZÄÖÜ][a-zäöüß]+(?:stadt|dorf|hausen)?)'
-        match = re.search(address_pattern, text, re.IGNORECASE)
+        match = ADDRESS_PATTERN.search(text) if POSTCODE_HINT_PATTERN.search(text) else None
         if match:
             return match.group(0).strip()
         
         # Simpler pattern: just street + number
-        street_pattern = r'[A-ZÄÖÜ][a-zäöüß]+(?:straße|str\.|weg|platz|allee|ring|gasse|damm|ufer)\s+\d+[a-z]?'
-        match = re.search(street_pattern, text, re.IGNORECASE)
+        match = STREET_PATTERN.search(text) if STREET_HINT_PATTERN.search(text) else None
         if match:
             # Try to get surrounding context (PLZ + City if nearby)
             start = match.start()
@@ -99,67 +323,49 @@ class QAService:
     def _extract_relevant_section(self, question: str, text: str) -> str:
         """Extract the most relevant section from text based on question"""
         question_lower = question.lower()
-        text_lower = text.lower()
         
         # Special handling for email questions (prioritize over address)
-        if any(word in question_lower for word in ['email', 'e-mail', 'mail', 'e-mail-adresse', 'email-adresse']):
+        if EMAIL_QUESTION_PATTERN.search(question_lower):
             email = self._extract_email(text)
             if email:
                 return email
         
         # Special handling for address questions
-        if any(word in question_lower for word in ['adresse', 'wohne', 'wohnort', 'wohnhaft']) and 'email' not in question_lower:
+        if ADDRESS_QUESTION_PATTERN.search(question_lower) and 'email' not in question_lower:
             address = self._extract_address(text)
             if address:
                 return address
         
         # Identify question type and keywords
-        question_keywords = []
-        if any(word in question_lower for word in ['adresse', 'wohne', 'wohnort', 'wohnhaft']):
-            question_keywords = ['straße', 'str.', 'weg', 'platz', 'adresse', 'wohnort', 'wohne', 'wohnhaft', 'straße', 'strasse']
-        elif any(word in question_lower for word in ['email', 'e-mail', 'mail']):
-            question_keywords = ['@', 'email', 'e-mail', 'mail']
-        elif any(word in question_lower for word in ['telefon', 'nummer', 'handy', 'mobil']):
-            question_keywords = ['telefon', 'tel.', 'mobil', 'handy', '+49', '+43', '+41']
-        elif any(word in question_lower for word in ['geburt', 'geboren', 'geburtstag']):
-            question_keywords = ['geboren', 'geburt', 'geburtstag', 'geb.']
-        elif any(word in question_lower for word in ['name', 'heiße', 'heißt']):
-            question_keywords = ['name', 'vorname', 'nachname']
-        elif any(word in question_lower for word in ['beruf', 'arbeit', 'stelle', 'position']):
-            question_keywords = ['beruf', 'arbeit', 'position', 'stelle', 'tätigkeit']
+        for trigger_pattern, keywords in EXTRACTION_KEYWORDS:
+            if trigger_pattern.search(question_lower):
+                question_keywords = keywords
+                break
         else:
             # General: extract sentences containing question words
-            question_words = [w for w in question_lower.split() if len(w) > 3]
-            question_keywords = question_words
+            question_keywords = tuple(w for w in question_lower.split() if len(w) > 3)
+        
+        matcher = get_keyword_matcher(question_keywords)
         
         # Find sentences containing keywords
-        sentences = re.split(r'[.!?]\s+', text)
         relevant_sentences = []
-        
-        for sentence in sentences:
-            sentence_lower = sentence.lower()
+        for sentence in SENTENCE_SPLIT_PATTERN.split(text):
             # Check if sentence contains any keyword
-            if any(keyword in sentence_lower for keyword in question_keywords):
+            if matcher.contains_any(sentence.lower()):
                 relevant_sentences.append(sentence.strip())
+                if len(relevant_sentences) == 3:  # Max 3 sentences
+                    break
         
         # If we found relevant sentences, return them
         if relevant_sentences:
-            answer = '. '.join(relevant_sentences[:3])  # Max 3 sentences
+            answer = '. '.join(relevant_sentences)
             if not answer.endswith(('.', '!', '?')):
                 answer += '.'
             return answer
         
         # Fallback: find the part of text with most keyword matches
         words = text.split()
-        best_start = 0
-        best_score = 0
-        
-        for i in range(len(words) - 10):
-            window = ' '.join(words[i:i+20]).lower()
-            score = sum(1 for keyword in question_keywords if keyword in window)
-            if score > best_score:
-                best_score = score
-                best_start = i
+        best_start, best_score = self._best_keyword_window(words, question_keywords, matcher)
         
         if best_score > 0:
             extracted = ' '.join(words[best_start:best_start+30])
@@ -172,6 +378,53 @@ class QAService:
             return text[:300] + '...'
         return text
     
+    def _best_keyword_window(self, words: List[str], keywords: Tuple[str, ...],
+                             matcher: KeywordMatcher, window_size: int = 20) -> Tuple[int, int]:
+        """
+        Find the 20-word window containing the most keywords
+        Every listed keyword counts once per window (duplicates in the list count twice)
+        Returns: (best_start, best_score)
+        """
+        window_count = len(words) - 10
+        if window_count <= 0 or not matcher.keywords:
+            return 0, 0
+        
+        # Scan each distinct word once with the automaton
+        hits_by_word = {}
+        positions = {}  # {keyword_id: [word_index, ...]}
+        for index, word in enumerate(words):
+            hits = hits_by_word.get(word)
+            if hits is None:
+                hits = hits_by_word[word] = matcher.find_all(word.lower())
+            for keyword_id in hits:
+                positions.setdefault(keyword_id, []).append(index)
+        
+        if not positions:
+            return 0, 0
+        
+        # Prefix sums of occurrences for every keyword that appears at all
+        weights = {}
+        for keyword in keywords:
+            keyword_id = matcher.keywords.index(keyword)
+            weights[keyword_id] = weights.get(keyword_id, 0) + 1
+        prefix_sums = []
+        for keyword_id, indices in positions.items():
+            occurrences = [0] * len(words)
+            for index in indices:
+                occurrences[index] = 1
+            prefix_sums.append((weights[keyword_id], [0] + list(accumulate(occurrences))))
+        
+        best_start = 0
+        best_score = 0
+        for i in range(window_count):
+            end = min(i + window_size, len(words))
+            score = sum(weight for weight, prefix in prefix_sums if prefix[end] > prefix[i])
+            if score > best_score:
+                best_score = score
+                best_start = i
+        
+        return best_start, best_score
+    
     def _detect_question_type(self, question: str) -> str:
         """Detect what type of information is being asked"""
         question_lower = question.lower()
@@ -191,18 +444,62 @@ class QAService:
         else:
             return "general"
     
-    def _generate_answer_with_openai(self, question: str, relevant_chunks: List[dict]) -> Optional[Tuple[str, Optional[str], Optional[int]]]:
-        """Generate answer using OpenAI API"""
+    def _generate_answer_with_fast_path(self, question: str, relevant_chunks: List[dict]) -> Optional[Tuple[str, Optional[str], Optional[int]]]:
+        """Answer structured questions (email, phone, ...) with precompiled patterns"""
+        question_type = self._detect_question_type(question)
+        # Only questions that ask for one field count as fast path attempts (hit rate in the stats)
+        if not is_fast_path_question(question, question_type):
+            return None
+        
+        started = time.perf_counter()
+        match = find_fast_path_answer(question, question_type, relevant_chunks, config.FAST_PATH_MAX_CHUNKS)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.fast_path_stats.record_attempt(match is not None, elapsed_ms)
+        metrics.observe('qa.fast_path', elapsed_ms)
+        
+        if match is None:
+            return None
+        
+        value, chunk = match
+        return value, chunk['filename'], chunk['page_number']
+    
+    def _answer_from_field_index(self, question: str, user_id: int, pdf_id: int = None) -> Optional[Tuple[str, Optional[str], Optional[int]]]:
+        """Answer structured questions from the ingest-time field index of the whole document"""
+        question_type = self._detect_question_type(question)
+        if not is_fast_path_question(question, question_type):
+            return None
+        
+        if pdf_id:
+            pdf_ids = [pdf_id]
+        else:
+            pdf_ids = [pdf[0] for pdf in db.get_pdfs_by_user(user_id)]
+        
+        found = {}
+        for candidate_pdf_id in pdf_ids:
+            for value, chunk_id, page_number in db.get_field_values(candidate_pdf_id, question_type):
+                found.setdefault(FieldExtractor.normalize(value), (value, chunk_id, page_number))
+        
+        # Several distinct values need retrieval context to pick the right one
+        if len(found) != 1:
+            return None
+        
+        value, chunk_id, page_number = next(iter(found.values()))
+        chunk = self.get_chunk_text(chunk_id)
+        return value, chunk['filename'] if chunk else None, page_number
+    
+    def _generate_answer_with_openai(self, question: str, relevant_chunks: List[dict],
+                                     stats: dict = None) -> Optional[Tuple[str, Optional[str], Optional[int]]]:
+        """
+        Generate answer with the LLM backend (OpenAI or a local OpenAI-compatible server)
+        Token usage and latency of the call are written into stats if given
+        """
         if not self.openai_client:
             return None
         
         try:
-            # Use more chunks for better context (up to 5)
-            context_parts = []
-            for chunk in relevant_chunks[:5]:
-                context_parts.append(chunk['text'])
-            
-            context = "\n\n".join(context_parts)
+            # Merge overlapping chunks, drop duplicate spans and fit the token budget
+            packed = self.context_packer.pack(relevant_chunks)
+            context = packed['context']
             
             # Detect question type for better instructions
             question_type = self._detect_question_type(question)
@@ -220,35 +517,44 @@ class QAService:
             
             instruction = type_instructions.get(question_type, type_instructions["general"])
             
-            # Create improved prompt
-            prompt = f"""Du analysierst ein Dokument und beantwortest Fragen präzise.
-
-Dokumenteninhalt:
+            # Variable part after the fixed system prompt, which stays a cacheable prefix
+            prompt = f"""Dokumenteninhalt:
 {context}
 
 Frage: {question}
 
-Anweisung: {instruction}
-
-WICHTIG:
-- Suche gezielt nach der gesuchten Information im Dokumenteninhalt
-- Gib NUR die direkte Antwort zurück, keine Erklärungen
-- Wenn die Information nicht im Dokument steht, antworte: "Nicht im Dokument enthalten"
-- Sei präzise und kurz"""
-
-            # Call OpenAI API
-            response = self.openai_client.chat.completions.create(
-                model=config.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "Du bist ein präziser Dokumenten-Assistent. Du extrahierst gezielt spezifische Informationen aus Dokumenten und gibst nur die direkte Antwort zurück."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,  # Lower temperature for more precise answers
-                max_tokens=200  # Shorter answers for specific info
-            )
+Anweisung: {instruction}"""
+            system_prompt = ANSWER_SYSTEM_PROMPT
+            
+            # Call the LLM backend through the gateway (coalescing, rate limits, retries, circuit breaker)
+            max_tokens = 200  # Shorter answers for specific info
+            started = time.perf_counter()
+            with metrics.span('qa.llm'):
+                response = self.llm_gateway.complete(
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    estimated_tokens=self.context_packer.count_tokens(system_prompt + prompt) + max_tokens,
+                    temperature=0.1,  # Lower temperature for more precise answers
+                    max_tokens=max_tokens
+                )
+            latency_ms = (time.perf_counter() - started) * 1000
+            self.fast_path_stats.record_llm_call(latency_ms)
             
             answer = response.choices[0].message.content.strip()
             
+            if stats is not None:
+                usage = getattr(response, 'usage', None)
+                prompt_tokens = getattr(usage, 'prompt_tokens', None)
+                if prompt_tokens is None:
+                    prompt_tokens = self.context_packer.count_tokens(system_prompt + prompt)
+                stats['prompt_tokens'] = prompt_tokens
+                stats['completion_tokens'] = getattr(usage, 'completion_tokens', None)
+                stats['context_tokens'] = packed['tokens']
+                stats['context_chunks'] = len(packed['chunk_ids'])
+                stats['llm_latency_ms'] = latency_ms
+            
             # Clean up answer - remove quotes if present
             if answer.startswith('"') and answer.endswith('"'):
                 answer = answer[1:-1]
@@ -262,12 +568,17 @@ WICHTIG:
             
             return answer, source_pdf, source_page
             
+        except LLMUnavailable as e:
+            # Circuit open, rate limit or retries exhausted: the local extractor answers
+            print(f"LLM Unavailable: {e}")
+            return None
         except Exception as e:
             # If OpenAI fails, return None to fall back to local method
             print(f"OpenAI API Error: {e}")
             return None
     
-    def generate_answer(self, question: str, relevant_chunks: List[dict]) -> Tuple[str, Optional[str], Optional[int]]:
+    def generate_answer(self, question: str, relevant_chunks: List[dict],
+                        stats: dict = None) -> Tuple[str, Optional[str], Optional[int]]:
         """
         Generate answer from relevant chunks
         Returns: (answer, source_pdf, source_page)
@@ -275,13 +586,27 @@ WICHTIG:
         if not relevant_chunks:
             return "Nicht im Dokument enthalten", None, None
         
-        # Try OpenAI first if available
+        # Try the extractive fast path for structured fields before paying for an LLM call
+        if config.FAST_PATH_ENABLED:
+            fast_result = self._generate_answer_with_fast_path(question, relevant_chunks)
+            if fast_result:
+                if stats is not None:
+                    stats['answer_path'] = 'fast_path'
+                return fast_result
+        
+        # Try OpenAI if available
         if self.openai_client:
-            openai_result = self._generate_answer_with_openai(question, relevant_chunks)
+            openai_result = self._generate_answer_with_openai(question, relevant_chunks, stats)
             if openai_result:
+                if stats is not None:
+                    stats['answer_path'] = 'llm'
                 return openai_result
         
+        if stats is not None:
+            stats['answer_path'] = 'local'
+        
         # Fallback to local extraction method
+        started = time.perf_counter()
         # Try to find answer in chunks, starting with most relevant
         best_answer = None
         best_chunk = relevant_chunks[0]
@@ -313,28 +638,56 @@ WICHTIG:
         
         source_pdf = best_chunk['filename']
         source_page = best_chunk['page_number']
+        metrics.observe('qa.local_extract', (time.perf_counter() - started) * 1000)
         
         return answer, source_pdf, source_page
     
+    @profiler.profiled('ask')
     def ask_question(self, question: str, user_id: int, pdf_id: int = None) -> dict:
         """Main Q&A method"""
+        question_started = time.perf_counter()
+        
         # Save query
         query_id = db.insert_query(user_id, question)
         
-        # Find relevant chunks
-        relevant_chunks = self.find_relevant_chunks(question, pdf_id)
+        stats = {}
+        indexed_result = None
+        if config.FAST_PATH_ENABLED:
+            started = time.perf_counter()
+            with metrics.span('qa.field_index'):
+                indexed_result = self._answer_from_field_index(question, user_id, pdf_id)
+            if indexed_result:
+                # Misses are counted once by the chunk-level fast path below
+                self.fast_path_stats.record_attempt(True, (time.perf_counter() - started) * 1000)
         
-        # Generate answer
-        answer, source_pdf, source_page = self.generate_answer(question, relevant_chunks)
+        if indexed_result:
+            # Field index hit: no retrieval or LLM call needed
+            answer, source_pdf, source_page = indexed_result
+            relevant_chunk_count = 1
+            stats['answer_path'] = 'field_index'
+        else:
+            # Find relevant chunks
+            with metrics.span('qa.retrieve'):
+                relevant_chunks = self.find_relevant_chunks(question, pdf_id, user_id=user_id)
+            relevant_chunk_count = len(relevant_chunks)
+            
+            # Generate answer
+            answer, source_pdf, source_page = self.generate_answer(question, relevant_chunks, stats)
         
         # Save response
         if query_id:
-            db.insert_response(query_id, answer, source_pdf, source_page)
+            db.insert_response(query_id, answer, source_pdf, source_page,
+                               prompt_tokens=stats.get('prompt_tokens'))
+        
+        metrics.observe('qa.total', (time.perf_counter() - question_started) * 1000)
         
         return {
             'answer': answer,
             'source_pdf': source_pdf,
             'source_page': source_page,
-            'relevant_chunks': len(relevant_chunks)
+            'relevant_chunks': relevant_chunk_count,
+            'answer_path': stats.get('answer_path'),
+            'prompt_tokens': stats.get('prompt_tokens'),
+            'llm_latency_ms': stats.get('llm_latency_ms')
         }
 
@@ -0,0 +1,66 @@
+import time
+import threading
+from typing import List, Optional
+import config
+
+# Try to import the cross-encoder, but make it optional
+try:
+    from sentence_transformers import CrossEncoder
+    CROSS_ENCODER_AVAILABLE = True
+except ImportError:
+    CROSS_ENCODER_AVAILABLE = False
+
+
+class Reranker:
+    """Re-ranks retrieval candidates with a small local cross-encoder"""
+
+    def __init__(self, model_name: str = None):
+        self.model_name = model_name or config.RERANK_MODEL
+        self.model = None
+        self.disabled = not CROSS_ENCODER_AVAILABLE
+        self.per_pair_ms = None  # Moving average of scoring cost per candidate
+        self._lock = threading.Lock()
+
+    def _load_model(self):
+        """Load the cross-encoder on first use"""
+        with self._lock:
+            if self.model is None and not self.disabled:
+                try:
+                    self.model = CrossEncoder(self.model_name)
+                except Exception as e:
+                    print(f"Reranker Error: {e}")
+                    self.disabled = True
+        return self.model
+
+    def _affordable_candidates(self, count: int, remaining_ms: float) -> int:
+        """How many candidates can be scored within the remaining budget"""
+        if self.per_pair_ms is None:
+            return count
+        return min(count, int(remaining_ms / self.per_pair_ms))
+
+    def rerank(self, question: str, chunks: List[dict], top_n: int,
+               remaining_ms: float) -> Optional[List[dict]]:
+        """
+        Score all candidates against the question in one batch and keep the best top_n
+        Returns: Re-ranked chunks, or None if re-ranking was skipped (disabled or over budget)
+        """
+        if not chunks or remaining_ms <= 0 or self._load_model() is None:
+            return None
+
+        # Candidates are in retrieval order, so cutting the tail drops the weakest ones
+        affordable = self._affordable_candidates(len(chunks), remaining_ms)
+        if affordable < min(top_n, len(chunks)):
+            return None
+        candidates = chunks[:affordable]
+
+        started = time.perf_counter()
+        scores = self.model.predict([(question, chunk['text']) for chunk in candidates])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        pair_ms = elapsed_ms / len(candidates)
+        self.per_pair_ms = pair_ms if self.per_pair_ms is None else 0.8 * self.per_pair_ms + 0.2 * pair_ms
+
+        for chunk, score in zip(candidates, scores):
+            chunk['rerank_score'] = float(score)
+        ranked = sorted(candidates, key=lambda chunk: chunk['rerank_score'], reverse=True)
+        return ranked[:top_n]
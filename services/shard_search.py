@@ -0,0 +1,296 @@
+import os
+import heapq
+import queue
+import atexit
+import shutil
+import hashlib
+import tempfile
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import faiss
+import config
+from models.index_bundle import bundle_name, manifest_path, model_index_dir, read_bundle
+
+# Exceptions that mean the shard process is gone or the socket is broken
+SHARD_ERRORS = (EOFError, ConnectionError, OSError)
+
+
+class ShardRequestError(RuntimeError):
+    """The shard answered a request with an error (the process and connection are fine)"""
+
+
+def shard_for(pdf_id: int, shard_count: int) -> int:
+    """Stable shard assignment by pdf_id hash"""
+    digest = hashlib.md5(str(pdf_id).encode()).digest()
+    return int.from_bytes(digest[:4], 'little') % shard_count
+
+
+class ShardIndexStore:
+    """Per-PDF FAISS indices of one shard, reloaded when the bundle manifest changes"""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self._cache = {}  # {(model, pdf_id): (manifest mtime_ns, index, chunk_ids)}
+        self._lock = threading.Lock()
+
+    def get(self, model: str, pdf_id: int) -> Tuple[Optional[faiss.Index], List[int]]:
+        # Bundles written by EmbeddingManager.save_faiss_index
+        index_dir = model_index_dir(model, self.index_dir)
+        name = bundle_name(pdf_id)
+        try:
+            version = os.stat(manifest_path(index_dir, name)).st_mtime_ns
+        except FileNotFoundError:
+            # Deleted PDF: release its index instead of keeping it until the shard restarts
+            with self._lock:
+                self._cache.pop((model, pdf_id), None)
+            return None, []
+        cached = self._cache.get((model, pdf_id))
+        if cached and cached[0] == version:
+            return cached[1], cached[2]
+        index, chunk_ids, _ = read_bundle(index_dir, name, model=model)
+        with self._lock:
+            self._cache[(model, pdf_id)] = (version, index, chunk_ids)
+        return index, chunk_ids
+
+    def invalidate(self, pdf_id: int):
+        with self._lock:
+            for key in [key for key in self._cache if key[1] == pdf_id]:
+                del self._cache[key]
+
+    def search(self, query: np.ndarray, model: str, pdf_ids: List[int],
+               k: int) -> Tuple[List[Tuple[int, float]], List[int]]:
+        """Top-k (chunk_id, score) over the given PDFs of this shard, and the PDFs without an index"""
+        results = []
+        missing = []
+        for pdf_id in pdf_ids:
+            index, chunk_ids = self.get(model, pdf_id)
+            if index is None:
+                missing.append(pdf_id)
+                continue
+            if index.ntotal == 0:
+                continue
+            scores, indices = index.search(query, min(k, index.ntotal))
+            results.extend(
+                (int(chunk_ids[idx]), float(score))
+                for idx, score in zip(indices[0], scores[0])
+                if 0 <= idx < len(chunk_ids)
+            )
+        return heapq.nlargest(k, results, key=lambda result: result[1]), missing
+
+
+def _serve_connection(conn, store: ShardIndexStore):
+    """Answer requests on one coordinator connection until it is closed"""
+    with conn:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                return
+            # A failing request (e.g. a corrupt index) is answered with an error, the connection stays up
+            try:
+                command = request[0]
+                if command == 'search':
+                    _, query, model, pdf_ids, k = request
+                    conn.send(('ok', store.search(query, model, pdf_ids, k)))
+                elif command == 'invalidate':
+                    store.invalidate(request[1])
+                    conn.send(('ok', True))
+                elif command == 'ping':
+                    conn.send(('ok', os.getpid()))
+                else:
+                    conn.send(('error', f"unknown command {command!r}"))
+            except SHARD_ERRORS:
+                # The coordinator went away while we answered
+                return
+            except Exception as e:
+                conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+def run_shard(address: str, authkey: bytes, index_dir: str):
+    """Shard process entry point: one thread per coordinator connection (FAISS releases the GIL)"""
+    store = ShardIndexStore(index_dir)
+    with Listener(address, family='AF_UNIX', authkey=authkey) as listener:
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_serve_connection, args=(conn, store), daemon=True).start()
+
+
+class ShardClient:
+    """Coordinator side of one shard: owns the process and a pool of connections to it"""
+
+    def __init__(self, shard_id: int, socket_dir: str, authkey: bytes):
+        self.shard_id = shard_id
+        self.address = os.path.join(socket_dir, f"shard_{shard_id}.sock")
+        self.authkey = authkey
+        self.process = None
+        self.restarts = 0
+        self._connections = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the shard process and wait until it accepts connections"""
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self.process is not None:
+            self.restarts += 1
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process.join(timeout=5)
+        self._drain_connections()
+        if os.path.exists(self.address):
+            os.remove(self.address)
+
+        # Spawn, not fork: the shard needs FAISS only, not a copy of the embedding model
+        context = multiprocessing.get_context('spawn')
+        self.process = context.Process(
+            target=run_shard, args=(self.address, self.authkey, os.path.abspath(config.FAISS_INDEX_DIR)),
+            name=f"shard-{self.shard_id}", daemon=True
+        )
+        self.process.start()
+
+        deadline = time.monotonic() + config.SHARD_START_TIMEOUT
+        while True:
+            try:
+                self._connections.put(Client(self.address, family='AF_UNIX', authkey=self.authkey))
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline or not self.process.is_alive():
+                    raise RuntimeError(f"Shard {self.shard_id} did not start")
+                time.sleep(0.05)
+
+    def _recover(self, failed_process):
+        """Restart the shard if it died, unless another thread already did"""
+        with self._lock:
+            if self.process is failed_process and not failed_process.is_alive():
+                print(f"Shard {self.shard_id} Error: process exited, restarting")
+                self._start()
+
+    def _drain_connections(self):
+        while True:
+            try:
+                self._connections.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def request(self, message: tuple):
+        """Send one request, retried once on a fresh connection (after a restart if the shard died)"""
+        for attempt in range(2):
+            process = self.process
+            try:
+                conn = self._connections.get_nowait()
+            except queue.Empty:
+                conn = None
+            try:
+                if conn is None:
+                    conn = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+                conn.send(message)
+                status, result = conn.recv()
+                self._connections.put(conn)
+                if status == 'error':
+                    raise ShardRequestError(result)
+                return result
+            except SHARD_ERRORS:
+                if conn is not None:
+                    conn.close()
+                if attempt:
+                    raise
+                # A dead process can take a moment to be reported as such
+                process.join(timeout=0.5)
+                self._recover(process)
+
+    def stop(self):
+        self._drain_connections()
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5)
+
+
+class ShardedSearcher:
+    """Scatter-gather dense search over per-PDF indices distributed across shard processes"""
+
+    def __init__(self, shard_count: int = None):
+        self.shard_count = shard_count or config.SHARD_COUNT
+        self.socket_dir = tempfile.mkdtemp(prefix='pdf_faq_shards_')
+        authkey = os.urandom(16)
+        self.shards = [ShardClient(i, self.socket_dir, authkey) for i in range(self.shard_count)]
+        for shard in self.shards:
+            shard.start()
+        self._executor = ThreadPoolExecutor(max_workers=self.shard_count * 4, thread_name_prefix='shard-fanout')
+        atexit.register(self.stop)
+
+    def _group_by_shard(self, pdf_ids: List[int]) -> Dict[int, List[int]]:
+        groups = {}
+        for pdf_id in pdf_ids:
+            groups.setdefault(shard_for(pdf_id, self.shard_count), []).append(pdf_id)
+        return groups
+
+    def _search_shard(self, shard_id: int, query: np.ndarray, model: str, pdf_ids: List[int], k: int,
+                      rebuild: Callable[[int], bool] = None) -> List[Tuple[int, float]]:
+        try:
+            results, missing = self.shards[shard_id].request(('search', query, model, pdf_ids, k))
+            # Indices that were never saved (or lost) are built by the coordinator, which has the vectors
+            rebuilt = [pdf_id for pdf_id in missing if rebuild is not None and rebuild(pdf_id)]
+            if rebuilt:
+                more, _ = self.shards[shard_id].request(('search', query, model, rebuilt, k))
+                results = heapq.nlargest(k, results + more, key=lambda result: result[1])
+            return results
+        except Exception as e:
+            # A shard that cannot be restarted degrades recall but does not fail the question
+            print(f"Shard {shard_id} Error: {e}")
+            return []
+
+    def search(self, query_embedding: np.ndarray, pdf_ids: List[int], k: int, model: str = None,
+               rebuild: Callable[[int], bool] = None) -> List[Tuple[int, float]]:
+        """
+        Search the indices (of embedding model) of pdf_ids on their shards in parallel and merge by score
+        rebuild(pdf_id) saves a missing index and returns True if there is one now
+        Returns: List of (chunk_id, cosine_score) tuples, best first
+        """
+        model = model or config.EMBEDDING_MODEL
+        query = np.ascontiguousarray(query_embedding.reshape(1, -1), dtype='float32')
+        faiss.normalize_L2(query)
+        groups = self._group_by_shard(pdf_ids)
+
+        if len(groups) == 1:
+            # Per-PDF scope: one shard, no fan-out overhead
+            (shard_id, shard_pdf_ids), = groups.items()
+            return self._search_shard(shard_id, query, model, shard_pdf_ids, k, rebuild)
+
+        futures = [
+            self._executor.submit(self._search_shard, shard_id, query, model, shard_pdf_ids, k, rebuild)
+            for shard_id, shard_pdf_ids in groups.items()
+        ]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return heapq.nlargest(k, results, key=lambda result: result[1])
+
+    def invalidate(self, pdf_id: int):
+        """Drop a PDF's cached index on its shard (the shard also reloads on file change)"""
+        self.shards[shard_for(pdf_id, self.shard_count)].request(('invalidate', pdf_id))
+
+    def stop(self):
+        self._executor.shutdown(wait=False)
+        for shard in self.shards:
+            shard.stop()
+        shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+
+_searcher = None
+_searcher_lock = threading.Lock()
+
+
+def get_sharded_searcher() -> ShardedSearcher:
+    """Process-wide searcher, shards are started once (Streamlit re-creates services on every rerun)"""
+    global _searcher
+    with _searcher_lock:
+        if _searcher is None:
+            _searcher = ShardedSearcher()
+        return _searcher
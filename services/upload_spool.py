@@ -0,0 +1,145 @@
+import os
+import mmap
+import tempfile
+import threading
+from typing import Optional
+from database_dummy import db
+import config
+
+# Bytes copied per read while spooling
+SPOOL_BLOCK_SIZE = 1 << 20
+
+
+class UploadRejected(Exception):
+    """Upload refused before parsing (size cap or user quota), the message is shown to the user"""
+
+
+class MappedFile:
+    """Read-only file object over a memory map: the parser pages the PDF in on demand"""
+
+    def __init__(self, path: str):
+        self.name = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._map.read(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        self._map.seek(offset, whence)
+        return self._map.tell()
+
+    def tell(self) -> int:
+        return self._map.tell()
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SpooledUpload:
+    """An upload on local disk, counted against its user's quota until discarded"""
+
+    def __init__(self, spool: 'UploadSpool', path: str, user_id: int, size: int):
+        self.spool = spool
+        self.path = path
+        self.user_id = user_id
+        self.size = size
+
+    def open(self) -> MappedFile:
+        return MappedFile(self.path)
+
+    def discard(self):
+        """Delete the file and release its quota reservation"""
+        if self.path is None:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.path = None
+        self.spool.release(self.user_id, self.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.discard()
+
+
+class UploadSpool:
+    """
+    Copies uploads to a local temp directory in blocks before ingest, so queued and running
+    uploads are not held in memory. The per-file cap (MAX_UPLOAD_MB) and the per-user storage
+    quota (USER_QUOTA_MB: stored PDFs plus uploads in progress) are checked before parsing.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or config.UPLOAD_SPOOL_DIR or os.path.join(tempfile.gettempdir(), 'pdf_uploads')
+        os.makedirs(self.directory, exist_ok=True)
+        self._reserved = {}  # {user_id: bytes of spooled uploads not yet stored}
+        self._lock = threading.Lock()
+
+    def _check_size(self, size: int):
+        max_bytes = config.MAX_UPLOAD_MB * 1024 * 1024
+        if max_bytes and size > max_bytes:
+            raise UploadRejected(f"Datei zu groß (maximal {config.MAX_UPLOAD_MB:g} MB)")
+
+    def _check_quota(self, user_id: int, size: int):
+        quota_bytes = config.USER_QUOTA_MB * 1024 * 1024
+        if not quota_bytes:
+            return
+        used = db.get_user_storage_bytes(user_id) + self._reserved.get(user_id, 0)
+        if used + size > quota_bytes:
+            raise UploadRejected(
+                f"Speicherkontingent überschritten ({used / 1024 / 1024:.1f} von {config.USER_QUOTA_MB:g} MB belegt)"
+            )
+
+    def spool(self, stream, user_id: int, size: Optional[int] = None) -> SpooledUpload:
+        """
+        Copy a readable stream to disk and reserve its size in the user's quota
+        A known size (Content-Length, UploadedFile.size) is checked before anything is copied
+        Raises: UploadRejected
+        """
+        if size is not None:
+            self._check_size(size)
+            with self._lock:
+                self._check_quota(user_id, size)
+
+        if hasattr(stream, 'seek'):
+            stream.seek(0)
+        fd, path = tempfile.mkstemp(suffix='.pdf', dir=self.directory)
+        written = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for block in iter(lambda: stream.read(SPOOL_BLOCK_SIZE), b''):
+                    written += len(block)
+                    # Stop copying as soon as the cap is exceeded, the declared size may be missing or wrong
+                    self._check_size(written)
+                    f.write(block)
+            if written == 0:
+                raise UploadRejected("Leere Datei")
+            with self._lock:
+                self._check_quota(user_id, written)
+                self._reserved[user_id] = self._reserved.get(user_id, 0) + written
+        except BaseException:
+            os.remove(path)
+            raise
+        return SpooledUpload(self, path, user_id, written)
+
+    def release(self, user_id: int, size: int):
+        with self._lock:
+            remaining = self._reserved.get(user_id, 0) - size
+            if remaining > 0:
+                self._reserved[user_id] = remaining
+            else:
+                self._reserved.pop(user_id, None)
+
+
+# Global instance
+upload_spool = UploadSpool()
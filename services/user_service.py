@@ -1,5 +1,9 @@
+import time
 import hashlib
+import secrets
+from typing import Optional
 from database_dummy import db
+import config
 
 class UserService:
     """Handles user authentication and management"""
@@ -10,10 +14,14 @@ class UserService:
         return hashlib.sha256(password.encode()).hexdigest()
     
     @staticmethod
-    def create_user(username: str, password: str) -> int:
-        """Create a new user"""
+    def create_user(username: str, password: str) -> Optional[int]:
+        """Create a new user, None if the username is taken"""
         password_hash = UserService.hash_password(password)
-        user_id = db.insert_user(username, password_hash)
+        with db.transaction():
+            # Checked under the lock, two registrations of one name must not both pass
+            if db.user_exists(username):
+                return None
+            user_id = db.insert_user(username, password_hash)
         return user_id
     
     @staticmethod
@@ -27,4 +35,23 @@ class UserService:
     def user_exists(username: str) -> bool:
         """Check if username already exists"""
         return db.user_exists(username)
-
+    
+    @staticmethod
+    def create_session(user_id: int) -> str:
+        """Issue an API session token for user_id, only its hash is stored"""
+        token = secrets.token_urlsafe(32)
+        expires_at = time.time() + config.API_SESSION_HOURS * 3600
+        with db.transaction():
+            db.insert_session(hashlib.sha256(token.encode()).hexdigest(), user_id, expires_at)
+        return token
+    
+    @staticmethod
+    def get_session_user(token: str) -> Optional[int]:
+        """user_id of a valid session token, None if unknown or expired"""
+        session = db.get_session(hashlib.sha256(token.encode()).hexdigest())
+        return session['user_id'] if session else None
+    
+    @staticmethod
+    def is_admin(username: str) -> bool:
+        """Only users listed in ADMIN_USERS are admins"""
+        return bool(username) and username in config.ADMIN_USERS